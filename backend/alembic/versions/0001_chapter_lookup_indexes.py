@@ -0,0 +1,42 @@
+"""Add composite indexes for chapter lookups and status aggregation
+
+Tables are created by init_db(); this revision brings databases created
+before the indexes were declared on the model up to date.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if not sa.inspect(op.get_bind()).has_table("chapters"):
+        # Fresh database: init_db() creates the table with its indexes
+        return
+
+    op.create_index(
+        "ix_chapters_book_id_chapter_number",
+        "chapters",
+        ["book_id", "chapter_number"],
+        unique=True,
+        if_not_exists=True,
+    )
+    op.create_index(
+        "ix_chapters_book_id_status",
+        "chapters",
+        ["book_id", "status"],
+        if_not_exists=True,
+    )
+
+
+def downgrade():
+    op.drop_index("ix_chapters_book_id_status", table_name="chapters", if_exists=True)
+    op.drop_index("ix_chapters_book_id_chapter_number", table_name="chapters", if_exists=True)
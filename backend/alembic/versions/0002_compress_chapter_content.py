@@ -0,0 +1,111 @@
+"""Store chapter content compressed at rest
+
+Rewrites existing chapters.content_markdown values with the CompressedText
+encoding. On SQLite the column keeps its declared type (affinity does not
+change stored BLOBs) and values are rewritten in place. Other databases
+cannot hold bytes in a text column, so the compressed values are written to
+a new binary column that then replaces the text one; converting the column
+first would leave the old rows as untagged bytes, which read back as if
+their first character were a codec tag.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+from app.core.types import compress_text, decompress_text
+
+# revision identifiers, used by Alembic.
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+
+
+
+def _rewrite(convert, column_type, source="content_markdown", target="content_markdown"):
+    """Write convert(source) into target in id-ordered batches"""
+    chapters = sa.table(
+        "chapters",
+        sa.column("id", sa.Integer),
+        sa.column(target, column_type),
+    )
+    bind = op.get_bind()
+
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.text(
+                f"SELECT id, {source} FROM chapters "
+                f"WHERE id > :last_id AND {source} IS NOT NULL "
+                "ORDER BY id LIMIT :limit"
+            ),
+            {"last_id": last_id, "limit": BATCH_SIZE},
+        ).all()
+        if not rows:
+            break
+
+        updates = [
+            {"row_id": row_id, "content": value}
+            for row_id, value in ((row_id, convert(raw)) for row_id, raw in rows)
+            if value is not None
+        ]
+        if updates:
+            bind.execute(
+                chapters.update()
+                .where(chapters.c.id == sa.bindparam("row_id"))
+                .values({target: sa.bindparam("content")}),
+                updates,
+            )
+        last_id = rows[-1][0]
+
+
+def _swap(convert, column_type):
+    """Replace content_markdown with a column of another type holding convert(value)"""
+    op.add_column("chapters", sa.Column("content_converted", column_type, nullable=True))
+    _rewrite(convert, column_type, source="content_markdown", target="content_converted")
+    op.drop_column("chapters", "content_markdown")
+    op.alter_column(
+        "chapters", "content_converted",
+        new_column_name="content_markdown", existing_type=column_type, existing_nullable=True,
+    )
+
+
+def _compress(raw):
+    # Skip rows already written by CompressedText
+    if isinstance(raw, (bytes, memoryview)):
+        return None
+    return compress_text(raw)
+
+
+def _content_type():
+    """Python type of the stored content_markdown column, None without a chapters table"""
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("chapters"):
+        return None
+    column = next(c for c in inspector.get_columns("chapters") if c["name"] == "content_markdown")
+    return column["type"].python_type
+
+
+def upgrade():
+    content_type = _content_type()
+    if content_type is None:
+        return
+    if op.get_bind().dialect.name == "sqlite":
+        _rewrite(_compress, sa.LargeBinary)
+    elif content_type is str:
+        # Tables created by init_db() already have the binary column
+        _swap(compress_text, sa.LargeBinary)
+
+
+def downgrade():
+    content_type = _content_type()
+    if content_type is None:
+        return
+    if op.get_bind().dialect.name == "sqlite":
+        _rewrite(decompress_text, sa.Text)
+    elif content_type is bytes:
+        _swap(decompress_text, sa.Text)
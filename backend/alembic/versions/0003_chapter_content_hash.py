@@ -0,0 +1,62 @@
+"""Add chapters.content_hash
+
+SHA-256 of the chapter markdown, used to key rendered-HTML caches without
+reading chapter bodies. Existing rows are backfilled.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+"""
+import hashlib
+from alembic import op
+import sqlalchemy as sa
+from app.core.types import decompress_text
+
+# revision identifiers, used by Alembic.
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+
+
+def upgrade():
+    bind = op.get_bind()
+    if not sa.inspect(bind).has_table("chapters"):
+        return
+    if "content_hash" not in {column["name"] for column in sa.inspect(bind).get_columns("chapters")}:
+        op.add_column("chapters", sa.Column("content_hash", sa.String(64), nullable=True))
+
+    chapters = sa.table("chapters", sa.column("id", sa.Integer), sa.column("content_hash", sa.String))
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.text(
+                "SELECT id, content_markdown FROM chapters "
+                "WHERE id > :last_id AND content_markdown IS NOT NULL "
+                "ORDER BY id LIMIT :limit"
+            ),
+            {"last_id": last_id, "limit": BATCH_SIZE},
+        ).all()
+        if not rows:
+            break
+
+        updates = []
+        for row_id, raw in rows:
+            text = decompress_text(raw)
+            if text:
+                updates.append({"row_id": row_id, "digest": hashlib.sha256(text.encode("utf-8")).hexdigest()})
+        if updates:
+            bind.execute(
+                chapters.update()
+                .where(chapters.c.id == sa.bindparam("row_id"))
+                .values(content_hash=sa.bindparam("digest")),
+                updates,
+            )
+        last_id = rows[-1][0]
+
+
+def downgrade():
+    with op.batch_alter_table("chapters") as batch_op:
+        batch_op.drop_column("content_hash")
@@ -0,0 +1,53 @@
+"""Add the chapter_memories table
+
+Summary, defined terms and stated facts of each completed chapter, packed
+into the prompts of later chapters. Tables are created by init_db(); this
+revision adds the table to databases created before the model existed.
+Memories of existing chapters are filled in as chapters are generated or
+edited.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("chapters") or inspector.has_table("chapter_memories"):
+        # Fresh database (init_db() creates every table) or already added
+        return
+
+    op.create_table(
+        "chapter_memories",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("book_id", sa.Integer, sa.ForeignKey("books.id"), nullable=False),
+        sa.Column("chapter_id", sa.Integer, sa.ForeignKey("chapters.id"), nullable=False, unique=True),
+        sa.Column("chapter_number", sa.Integer, nullable=False),
+        sa.Column("title", sa.String, nullable=True),
+        sa.Column("content_hash", sa.String(64), nullable=True),
+        sa.Column("summary", sa.Text, nullable=True),
+        sa.Column("terms", sa.JSON, nullable=True),
+        sa.Column("facts", sa.JSON, nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_chapter_memories_id", "chapter_memories", ["id"])
+    op.create_index(
+        "ix_chapter_memories_book_id_chapter_number",
+        "chapter_memories",
+        ["book_id", "chapter_number"],
+    )
+
+
+def downgrade():
+    op.drop_index("ix_chapter_memories_book_id_chapter_number", table_name="chapter_memories", if_exists=True)
+    op.drop_index("ix_chapter_memories_id", table_name="chapter_memories", if_exists=True)
+    op.drop_table("chapter_memories")
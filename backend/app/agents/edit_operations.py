@@ -0,0 +1,99 @@
+"""
+Edit Operations - Applies an editor's find/replace edits to a chapter
+"""
+import json
+import re
+from dataclasses import dataclass
+from typing import List
+
+# A JSON array, optionally wrapped in a ```json fence
+JSON_FENCE = re.compile(r"^\s*```(?:json)?\s*\n(.*?)\n\s*```\s*$", re.DOTALL)
+
+# Upper bound on edits per response; more than this is a rewrite in disguise
+MAX_EDIT_OPERATIONS = 200
+
+
+class EditOperationError(ValueError):
+    """Edits that cannot be parsed or applied unambiguously"""
+
+
+@dataclass
+class EditOperation:
+    """Replace the only occurrence of `find` with `replace`"""
+    find: str
+    replace: str
+
+
+def parse_edit_operations(response: str) -> List[EditOperation]:
+    """
+    Parse the editor's response
+    
+    Args:
+        response: JSON array of {"find": ..., "replace": ...} objects
+    
+    Returns:
+        Edit operations in response order
+    
+    Raises:
+        EditOperationError: If the response is not a valid list of edits
+    """
+    fenced = JSON_FENCE.match(response)
+    try:
+        data = json.loads(fenced.group(1) if fenced else response)
+    except json.JSONDecodeError as e:
+        raise EditOperationError(f"Edits are not valid JSON: {e}") from e
+    
+    if not isinstance(data, list):
+        raise EditOperationError("Edits must be a JSON array")
+    if len(data) > MAX_EDIT_OPERATIONS:
+        raise EditOperationError(f"{len(data)} edits, at most {MAX_EDIT_OPERATIONS} are accepted")
+    
+    operations = []
+    for index, item in enumerate(data):
+        if not isinstance(item, dict) or not isinstance(item.get("find"), str) \
+                or not isinstance(item.get("replace"), str):
+            raise EditOperationError(f"Edit {index} must have string 'find' and 'replace' fields")
+        if not item["find"]:
+            raise EditOperationError(f"Edit {index} has an empty 'find'")
+        operations.append(EditOperation(item["find"], item["replace"]))
+    return operations
+
+
+def apply_edit_operations(content: str, operations: List[EditOperation]) -> str:
+    """
+    Apply edits to the original text in one pass
+    
+    Every `find` must occur exactly once in `content`, and the located spans
+    must not overlap, so the result does not depend on the order edits are
+    applied in.
+    
+    Args:
+        content: Chapter text the edits were made against
+        operations: Edits from parse_edit_operations
+    
+    Returns:
+        Edited text
+    
+    Raises:
+        EditOperationError: If an edit is missing, ambiguous or overlaps another
+    """
+    spans = []
+    for index, operation in enumerate(operations):
+        start = content.find(operation.find)
+        if start < 0:
+            raise EditOperationError(f"Edit {index}: text to replace not found")
+        if content.find(operation.find, start + 1) >= 0:
+            raise EditOperationError(f"Edit {index}: text to replace occurs more than once")
+        spans.append((start, start + len(operation.find), operation.replace))
+    
+    spans.sort()
+    parts = []
+    position = 0
+    for start, end, replace in spans:
+        if start < position:
+            raise EditOperationError("Edits overlap")
+        parts.append(content[position:start])
+        parts.append(replace)
+        position = end
+    parts.append(content[position:])
+    return "".join(parts)
@@ -2,14 +2,37 @@
 Format Agent - Applies final formatting to content
 """
 import re
+from typing import List, Optional
+
+# Ordered or bullet list item at the start of a line
+LIST_ITEM = re.compile(r"(?:\d+[.)]|[-*+])(?:\s|$)")
+# Horizontal rule (---, ***, ___)
+THEMATIC_BREAK = re.compile(r"(?:-[ \t]*){3,}$|(?:\*[ \t]*){3,}$|(?:_[ \t]*){3,}$")
+# Opening or closing code fence, indented at most three spaces
+CODE_FENCE = re.compile(r" {0,3}(`{3,}|~{3,})")
 
 
 class FormatAgent:
     """
     Formatting specialist that processes markdown content
     No LLM needed - uses text processing
+    
+    Formatting is a single pass over lines. Text can be formatted in one
+    call (format_chapter) or as it arrives: feed() returns the formatted
+    text that is final so far and finish() returns the rest.
     """
     
+    def __init__(self):
+        self._reset()
+    
+    def _reset(self):
+        """Forget the text formatted so far"""
+        self._partial: List[str] = []
+        self._started = False
+        self._blank_lines = 0
+        self._in_list = False
+        self._fence: Optional[str] = None
+    
     @staticmethod
     def format_chapter(content: str) -> str:
         """
@@ -17,40 +40,95 @@ class FormatAgent:
         
         Args:
             content: Raw chapter content
-            
+        
         Returns:
             Formatted markdown content
         """
-        # Ensure headings are properly formatted
-        lines = content.split('\n')
-        formatted_lines = []
+        formatter = FormatAgent()
+        return formatter.feed(content) + formatter.finish()
+    
+    def feed(self, chunk: str) -> str:
+        """
+        Format the next piece of streamed text
         
+        Args:
+            chunk: Text as received (may end mid-line)
+        
+        Returns:
+            Formatted text for the lines completed so far
+        """
+        if '\n' not in chunk:
+            self._partial.append(chunk)
+            return ''
+        
+        lines = chunk.split('\n')
+        self._partial.append(lines[0])
+        lines[0] = ''.join(self._partial)
+        self._partial = [lines.pop()]
+        
+        out: List[str] = []
         for line in lines:
-            # Clean up multiple empty lines
-            if line.strip() == '':
-                if formatted_lines and formatted_lines[-1].strip() != '':
-                    formatted_lines.append(line)
-                continue
-            
-            # Ensure proper heading spacing
-            if line.startswith('#'):
-                if formatted_lines and formatted_lines[-1].strip() != '':
-                    formatted_lines.append('')  # Add space before heading
-                formatted_lines.append(line)
-            else:
-                formatted_lines.append(line)
-        
-        content = '\n'.join(formatted_lines)
-        
-        # Clean up trailing whitespace
-        content = re.sub(r' +\n', '\n', content)
-        
-        # Ensure proper list formatting
-        content = re.sub(r'\n(\d+\.)', r'\n\n\1', content)  # Numbered lists
-        content = re.sub(r'\n(-|\*)', r'\n\n\1', content)  # Bullet lists
-        
-        # Clean up multiple newlines
-        content = re.sub(r'\n{3,}', '\n\n', content)
-        
-        return content.strip()
-
+            self._format_line(line, out)
+        return ''.join(out)
+    
+    def finish(self) -> str:
+        """
+        Format the last line and reset for the next text
+        
+        Returns:
+            Remaining formatted text
+        """
+        out: List[str] = []
+        self._format_line(''.join(self._partial), out)
+        self._reset()
+        return ''.join(out)
+    
+    def _format_line(self, line: str, out: List[str]):
+        """
+        Append one formatted line to `out`
+        
+        Runs of blank lines become one blank line, trailing whitespace is
+        removed, and headings, horizontal rules, code fences and the first
+        item of a list get a blank line before them. Blank lines are held
+        until the next line, so leading and trailing ones are dropped.
+        Fenced code is kept as is.
+        """
+        if self._fence is not None:
+            if not line.strip():
+                self._blank_lines += 1
+                return
+            out.append('\n' * (self._blank_lines + 1) + line)
+            self._blank_lines = 0
+            fence = CODE_FENCE.match(line)
+            if fence and fence.group(1)[0] == self._fence[0] and len(fence.group(1)) >= len(self._fence) \
+                    and not line[fence.end():].strip():
+                self._fence = None
+            return
+        
+        line = line.rstrip()
+        if not line:
+            self._blank_lines += 1
+            return
+        
+        fence = CODE_FENCE.match(line)
+        list_item = LIST_ITEM.match(line) is not None
+        block_start = (
+            line.startswith('#') or fence is not None or THEMATIC_BREAK.match(line) is not None
+            or (list_item and not self._in_list)
+        )
+        
+        if list_item:
+            self._in_list = True
+        elif block_start or (self._blank_lines and not line[0].isspace()):
+            self._in_list = False
+        if fence:
+            self._fence = fence.group(1)
+        
+        if not self._started:
+            self._started = True
+            out.append(line.lstrip())
+        elif self._blank_lines or block_start:
+            out.append('\n\n' + line)
+        else:
+            out.append('\n' + line)
+        self._blank_lines = 0
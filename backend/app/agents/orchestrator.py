@@ -1,7 +1,10 @@
 """
 Book Generation Orchestrator - Coordinates all agents
 """
-from typing import Dict, List, Optional, Callable
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
 from autogen import GroupChat
 from autogen.agentchat import AssistantAgent
 from app.agents.ideation_agent import create_ideation_agent
@@ -10,8 +13,18 @@ from app.agents.outline_agent import create_outline_agent
 from app.agents.writing_agent import create_writing_agent
 from app.agents.content_agent import create_content_agent
 from app.agents.editor_agent import create_editor_agent
+from app.agents.edit_operations import EditOperationError, apply_edit_operations, parse_edit_operations
 from app.agents.format_agent import FormatAgent
+from app.agents.quality_gate import estimate_tokens, quality_gate
+from app.agents.terminology import unify_terminology
+from app.core.llm_config import llm_rate_limit
+from app.utils.markdown_sections import chunk_markdown
+from app.core.database import AsyncSessionLocal
 from app.services.rag_service import rag_service
+from app.services.book_memory import book_memory
+from app.services.context_packer import ContextSource, context_packer
+from app.services.prompt_cache import book_preamble, prompt_cache
+from app.services.generation_events import GenerationEventBus, StageFinished, StageSkipped, StageStarted, generation_events
 import google.generativeai as genai
 from app.core.config import settings
 import logging
@@ -22,14 +35,16 @@ logger = logging.getLogger(__name__)
 class BookGenerationOrchestrator:
     """Orchestrates multi-agent book generation"""
     
-    def __init__(self, websocket_callback: Optional[Callable] = None):
+    def __init__(self, event_bus: Optional[GenerationEventBus] = None):
         """
         Initialize orchestrator
         
         Args:
-            websocket_callback: Optional callback for sending WebSocket updates
+            event_bus: Bus receiving stage start/finish events; defaults to the
+                global bus, whose subscribers broadcast over WebSocket, record
+                metrics and write agent logs
         """
-        self.websocket_callback = websocket_callback
+        self.event_bus = event_bus or generation_events
         
         # Create agents
         self.ideation_agent = create_ideation_agent()
@@ -39,6 +54,10 @@ class BookGenerationOrchestrator:
         self.content_agent = create_content_agent()
         self.editor_agent = create_editor_agent()
         self.format_agent = FormatAgent()
+        self.quality_gate = quality_gate
+        self.context_packer = context_packer
+        self.prompt_cache = prompt_cache
+        self.book_memory = book_memory
         
         # Create group chat
         self.agents = [
@@ -50,18 +69,61 @@ class BookGenerationOrchestrator:
             self.editor_agent,
         ]
     
-    def _send_update(self, message_type: str, data: dict):
-        """Send WebSocket update if callback is available"""
-        if self.websocket_callback:
-            self.websocket_callback({'type': message_type, 'data': data})
+    @asynccontextmanager
+    async def _stage(
+        self,
+        book_id: Optional[int],
+        stage: str,
+        agent_name: str,
+        task: Optional[str] = None,
+        chapter_id: Optional[int] = None
+    ):
+        """
+        Emit StageStarted, run the block, then emit StageFinished with its duration
+        
+        The block receives a dict it can fill with measurements (mode, token
+        usage) that are sent along as StageFinished.details. Publishing never
+        waits for subscribers, so a slow subscriber cannot stall generation.
+        """
+        fields = dict(book_id=book_id, stage=stage, agent_name=agent_name, task=task, chapter_id=chapter_id)
+        self.event_bus.publish(StageStarted(**fields))
+        details: dict = {}
+        start = time.perf_counter()
+        try:
+            yield details
+        except Exception as e:
+            self.event_bus.publish(StageFinished(
+                **fields, duration=time.perf_counter() - start, error=str(e), details=details
+            ))
+            raise
+        self.event_bus.publish(StageFinished(**fields, duration=time.perf_counter() - start, details=details))
     
-    def _update_agent_status(self, agent_name: str, status: str, task: Optional[str] = None):
-        """Update agent status via WebSocket"""
-        self._send_update('agent_status', {
-            'agent_name': agent_name,
-            'status': status,
-            'current_task': task
-        })
+    def _skip_stage(
+        self,
+        book_id: Optional[int],
+        stage: str,
+        agent,
+        prompt: str,
+        content: str,
+        reason: str,
+        chapter_id: Optional[int] = None
+    ):
+        """
+        Emit StageSkipped for an LLM stage the quality gate found unnecessary
+        
+        The tokens saved are estimated as the prompt (with the agent's
+        system message) plus a response about as long as the draft it
+        would have rewritten.
+        """
+        system_message = getattr(agent, 'system_message', '') or ''
+        self.event_bus.publish(StageSkipped(
+            book_id=book_id,
+            stage=stage,
+            agent_name=agent.name,
+            chapter_id=chapter_id,
+            reason=reason,
+            tokens_saved=estimate_tokens(system_message) + estimate_tokens(prompt) + estimate_tokens(content)
+        ))
     
     async def ideate(self, book_config: dict) -> dict:
         """
@@ -69,12 +131,10 @@ class BookGenerationOrchestrator:
         
         Args:
             book_config: Book configuration
-            
+        
         Returns:
             Refined book concept
         """
-        self._update_agent_status('ideation_agent', 'active', 'Refining book concept')
-        
         prompt = f"""
         Refine and expand this book concept:
         
@@ -91,9 +151,8 @@ class BookGenerationOrchestrator:
         """
         
         # Use simple LLM call (GroupChat can be complex for single-agent tasks)
-        result = await self._simple_llm_call(self.ideation_agent, prompt)
-        
-        self._update_agent_status('ideation_agent', 'idle')
+        async with self._stage(book_config.get('book_id'), 'ideation', 'ideation_agent', 'Refining book concept'):
+            result = await self._simple_llm_call(self.ideation_agent, prompt)
         
         return result
     
@@ -104,16 +163,13 @@ class BookGenerationOrchestrator:
         Args:
             book_id: Book ID
             topic: Research topic
-            
+        
         Returns:
             Research summary
         """
-        self._update_agent_status('research_agent', 'active', f'Researching: {topic}')
-        
         # Perform web research
-        research_results = perform_research(book_id, topic)
-        
-        self._update_agent_status('research_agent', 'idle')
+        async with self._stage(book_id, 'research', 'research_agent', f'Researching: {topic}'):
+            research_results = perform_research(book_id, topic)
         
         return research_results
     
@@ -125,12 +181,10 @@ class BookGenerationOrchestrator:
             book_config: Book configuration
             chapters_count: Number of chapters
             refined_concept: Refined book concept
-            
+        
         Returns:
             List of chapter outlines
         """
-        self._update_agent_status('outline_agent', 'active', 'Creating book structure')
-        
         prompt = f"""
         Create a detailed outline for a book with {chapters_count} chapters.
         
@@ -148,9 +202,8 @@ class BookGenerationOrchestrator:
         Format as a numbered list.
         """
         
-        result = await self._simple_llm_call(self.outline_agent, prompt)
-        
-        self._update_agent_status('outline_agent', 'idle')
+        async with self._stage(book_config.get('book_id'), 'outline', 'outline_agent', 'Creating book structure'):
+            result = await self._simple_llm_call(self.outline_agent, prompt)
         
         return result
     
@@ -164,44 +217,74 @@ class BookGenerationOrchestrator:
         """
         Generate a single chapter through all agent stages
         
+        The writing prompt carries the memory of the chapters before this
+        one (see book_memory), and the finished chapter's memory is stored
+        for the chapters after it.
+        
         Args:
             book_id: Book ID
-            chapter_outline: Chapter outline dict
+            chapter_outline: Chapter outline dict (id, chapter_number, title, description)
             book_config: Book configuration
             context: Additional context from RAG
-            
+        
         Returns:
             Final formatted chapter content
         """
         chapter_title = chapter_outline.get('title', 'Untitled')
+        chapter_id = chapter_outline.get('id')
+        chapter_number = chapter_outline.get('chapter_number')
         word_count_goal = book_config.get('words_per_chapter', 2500)
         
-        # 1. Writing Agent
-        self._update_agent_status('writing_agent', 'active', f'Writing: {chapter_title}')
+        # What every stage needs to know about the book; sent once per book
+        # where the provider caches it. Reading the research is a blocking
+        # Chroma call, so it runs off the event loop
+        preamble = await asyncio.to_thread(
+            lambda: book_preamble(book_config, rag_service.book_documents(book_id))
+        )
+        
+        # What earlier chapters established
+        memory = ""
+        if chapter_number is not None:
+            async with AsyncSessionLocal() as db:
+                memory = await self.book_memory.context(db, book_id, chapter_number)
         
+        # 1. Writing Agent
+        packed = self.context_packer.pack('writing', [
+            ContextSource('memory', memory, priority=0, max_tokens=self.book_memory.max_tokens),
+            ContextSource('context', context or '', priority=1),
+        ])
         writing_prompt = f"""
         Write a comprehensive chapter for this book.
         
         Chapter Title: {chapter_title}
         Chapter Description: {chapter_outline.get('description', '')}
         Target Word Count: {word_count_goal}
-        Tone: {book_config.get('tone')}
-        Genre: {book_config.get('genre')}
         
         Use markdown format with headings, lists, and emphasis.
         Write engaging, informative content suitable for {book_config.get('target_audience', 'general readers')}.
         
         Additional Context:
-        {context or 'No additional context provided.'}
+        {packed.get('context', 'No additional context provided.')}
+        
+        Earlier chapters (stay consistent with them and do not repeat them):
+        {packed.get('memory', 'No earlier chapters written yet')}
         
         Begin writing the chapter now.
         """
         
-        draft_content = await self._simple_llm_call(self.writing_agent, writing_prompt)
+        async with self._stage(book_id, 'writing', 'writing_agent', f'Writing: {chapter_title}', chapter_id) as details:
+            details['context_tokens'] = packed.tokens
+            draft_content = await self._simple_llm_call(
+                self.writing_agent, writing_prompt, usage=details, book_id=book_id, preamble=preamble
+            )
         
-        # 2. Content Agent
-        self._update_agent_status('content_agent', 'active', f'Enhancing: {chapter_title}')
+        # 2. Quality gate: decide which of the remaining LLM passes the draft needs
+        report = None
+        if settings.quality_gate_enabled:
+            async with self._stage(book_id, 'quality_check', 'quality_gate', f'Checking: {chapter_title}', chapter_id):
+                report = self.quality_gate.analyze(draft_content, word_count_goal)
         
+        # 3. Content Agent
         content_prompt = f"""
         Enhance this chapter draft by adding:
         1. Concrete examples and case studies
@@ -216,31 +299,172 @@ class BookGenerationOrchestrator:
         Provide the enhanced version:
         """
         
-        enhanced_content = await self._simple_llm_call(self.content_agent, content_prompt)
+        if report is None or report.needs_content:
+            async with self._stage(book_id, 'content', 'content_agent', f'Enhancing: {chapter_title}', chapter_id) as details:
+                enhanced_content = await self._simple_llm_call(
+                    self.content_agent, content_prompt, usage=details, book_id=book_id, preamble=preamble
+                )
+            if report is not None:
+                report = self.quality_gate.analyze(enhanced_content, word_count_goal)
+        else:
+            enhanced_content = draft_content
+            self._skip_stage(
+                book_id, 'content', self.content_agent, content_prompt, draft_content,
+                'Draft meets length and structure targets', chapter_id
+            )
+        
+        # 4. Editor Agent
+        editor_prompt = self._editor_prompt(enhanced_content, book_config.get('tone'))
+        
+        if report is None or report.needs_editing:
+            async with self._stage(book_id, 'editing', 'editor_agent', f'Editing: {chapter_title}', chapter_id) as details:
+                edited_content = await self._edit_chapter(
+                    enhanced_content, book_config.get('tone'), details, book_id=book_id, preamble=preamble
+                )
+        else:
+            edited_content = enhanced_content
+            self._skip_stage(
+                book_id, 'editing', self.editor_agent, editor_prompt, enhanced_content,
+                'No readability, repetition or structure issues', chapter_id
+            )
+        
+        # 5. Format Agent
+        async with self._stage(book_id, 'formatting', 'format_agent', f'Formatting: {chapter_title}', chapter_id):
+            formatted_content = self.format_agent.format_chapter(edited_content)
+        
+        # Later chapters see this one through its memory; the chapter is
+        # done even if storing the memory fails
+        if chapter_id is not None and chapter_number is not None:
+            try:
+                await self.book_memory.update(book_id, chapter_id, chapter_number, chapter_title, formatted_content)
+            except Exception as e:
+                logger.error(f"Error updating book memory for chapter {chapter_id}: {e}", exc_info=True)
         
-        # 3. Editor Agent
-        self._update_agent_status('editor_agent', 'active', f'Editing: {chapter_title}')
-        
-        editor_prompt = f"""
+        return formatted_content
+    
+    def _editor_prompt(self, content: str, tone: Optional[str], part: str = "") -> str:
+        """Prompt asking the editor for the full edited text"""
+        return f"""
         Edit this chapter for grammar, clarity, style, and consistency.
-        Maintain the tone: {book_config.get('tone')}
-        
+        Maintain the tone: {tone}
+        {part}
         Chapter to edit:
-        {enhanced_content}
+        {content}
         
         Provide the edited version:
         """
+    
+    def _edit_operations_prompt(self, content: str, tone: Optional[str], part: str = "") -> str:
+        """Prompt asking the editor for find/replace edits only"""
+        return f"""
+        Edit this chapter for grammar, clarity, style, and consistency.
+        Maintain the tone: {tone}
+        {part}
+        Do not return the chapter. Return only a JSON array of edits:
+        [{{"find": "exact text from the chapter", "replace": "corrected text"}}]
+        Each "find" must be copied exactly from the chapter and occur only once in it
+        (include a few surrounding words if needed). Keep edits small and do not let
+        them overlap. Return [] if the chapter needs no edits.
         
-        edited_content = await self._simple_llm_call(self.editor_agent, editor_prompt)
+        Chapter to edit:
+        {content}
+        """
+    
+    async def _edit_chapter(
+        self,
+        content: str,
+        tone: Optional[str],
+        details: dict,
+        book_id: Optional[int] = None,
+        preamble: str = ""
+    ) -> str:
+        """
+        Run the editor pass in the configured mode
         
-        # 4. Format Agent
-        self._update_agent_status('format_agent', 'active', f'Formatting: {chapter_title}')
+        Chapters longer than `editor_section_words` are split on headings and
+        the parts are edited concurrently (under the shared LLM rate limit),
+        so editing takes about as long as the slowest part and no response
+        has to hold the whole chapter. Parts edited separately may spell
+        terms differently; a terminology pass settles on one spelling where
+        the parts disagree and reports hyphenation it cannot settle.
         
-        formatted_content = self.format_agent.format_chapter(edited_content)
+        Args:
+            content: Chapter to edit
+            tone: Book tone
+            details: Stage details; receives mode, token usage, the number of
+                edits and sections, and the reason for any fallback
+            book_id: Book the chapter belongs to
+            preamble: Book preamble sent with every editor call
         
-        self._update_agent_status('format_agent', 'idle')
+        Returns:
+            Edited chapter
+        """
+        max_words = settings.editor_section_words
+        parts = chunk_markdown(content, max_words) if max_words > 0 else [content]
+        if len(parts) == 1:
+            details['mode'] = settings.editor_mode
+            return await self._edit_part(content, tone, details, book_id=book_id, preamble=preamble)
+        
+        details['mode'] = f"{settings.editor_mode}-sections"
+        details['sections'] = len(parts)
+        part_details = [{} for _ in parts]
+        edited_parts = await asyncio.gather(*(
+            self._edit_part(
+                part, tone, part_detail,
+                f"This is part {index} of {len(parts)} of the chapter; edit only this part and keep its headings.\n",
+                book_id=book_id, preamble=preamble
+            )
+            for index, (part, part_detail) in enumerate(zip(parts, part_details), start=1)
+        ))
+        
+        for part_detail in part_details:
+            for key in ('prompt_tokens', 'cached_tokens', 'output_tokens', 'edits'):
+                if key in part_detail:
+                    details[key] = details.get(key, 0) + part_detail[key]
+            if 'fallback' in part_detail:
+                details['fallback'] = part_detail['fallback']
+                details['fallbacks'] = details.get('fallbacks', 0) + 1
+        
+        edited_parts, replacements, inconsistent = unify_terminology([part.strip() for part in edited_parts])
+        details['terminology_fixes'] = len(replacements)
+        if inconsistent:
+            details['terminology_flags'] = inconsistent
+        return "\n\n".join(edited_parts)
+    
+    async def _edit_part(
+        self,
+        content: str,
+        tone: Optional[str],
+        details: dict,
+        part: str = "",
+        book_id: Optional[int] = None,
+        preamble: str = ""
+    ) -> str:
+        """
+        Edit a chapter or part of one
         
-        return formatted_content
+        In "operations" mode the editor returns find/replace edits that are
+        applied locally, so it only generates the changed text. If the edits
+        cannot be parsed or applied, the text is rewritten in full.
+        """
+        if settings.editor_mode == 'operations':
+            response = await self._simple_llm_call(
+                self.editor_agent, self._edit_operations_prompt(content, tone, part),
+                usage=details, book_id=book_id, preamble=preamble
+            )
+            try:
+                operations = parse_edit_operations(response)
+                edited = apply_edit_operations(content, operations)
+                details['edits'] = len(operations)
+                return edited
+            except EditOperationError as e:
+                logger.warning(f"Editor edits could not be applied, rewriting instead: {e}")
+                details['fallback'] = str(e)
+        
+        return await self._simple_llm_call(
+            self.editor_agent, self._editor_prompt(content, tone, part),
+            usage=details, book_id=book_id, preamble=preamble
+        )
     
     async def handle_chat_request(self, book_id: int, user_message: str, context: dict) -> str:
         """
@@ -250,7 +474,7 @@ class BookGenerationOrchestrator:
             book_id: Book ID
             user_message: User's request
             context: Current book/chapter context
-            
+        
         Returns:
             Response from agents
         """
@@ -264,39 +488,69 @@ class BookGenerationOrchestrator:
         Provide a helpful response about what you'll do to address this request.
         """
         
-        self._update_agent_status('ideation_agent', 'active', 'Processing user request')
-        
-        response = await self._simple_llm_call(self.ideation_agent, prompt)
-        
-        self._update_agent_status('ideation_agent', 'idle')
+        async with self._stage(book_id, 'chat', 'ideation_agent', 'Processing user request'):
+            response = await self._simple_llm_call(self.ideation_agent, prompt)
         
         return response
     
-    async def _simple_llm_call(self, agent, prompt: str) -> str:
-        """Make a simple LLM call using Gemini API"""
+    async def _simple_llm_call(
+        self,
+        agent,
+        prompt: str,
+        usage: Optional[dict] = None,
+        book_id: Optional[int] = None,
+        preamble: str = ""
+    ) -> str:
+        """
+        Make a simple LLM call using Gemini API
+        
+        The agent's system message and the book preamble are sent as the
+        system instruction, separately from the prompt, so the provider can
+        cache them per book (see PromptCache).
+        
+        Args:
+            agent: Agent whose system message frames the prompt
+            prompt: User prompt
+            usage: Optional dict to which the call's prompt_tokens,
+                cached_tokens and output_tokens are added (estimated if the
+                API does not report them)
+            book_id: Book the call is for, scopes the preamble cache
+            preamble: Stable book context shared by every stage
+        
+        Returns:
+            Response text
+        """
         logger.info(f"Agent {agent.name} called with prompt: {prompt[:100]}...")
         
         try:
-            # Get the agent's system message for context
-            system_message = ""
-            if hasattr(agent, 'system_message'):
-                system_message = agent.system_message
-            
-            # Combine system message with user prompt
-            full_prompt = f"{system_message}\n\n{prompt}" if system_message else prompt
+            # Stable instruction first: the agent's system message, then the book
+            system_message = getattr(agent, 'system_message', '') or ''
+            instruction = "\n\n".join(part for part in (system_message, preamble) if part)
             
-            # Use direct Gemini API call (similar to books.py approach)
-            model = genai.GenerativeModel('gemini-2.0-flash')
-            response = model.generate_content(full_prompt)
+            # Use direct Gemini API call (similar to books.py approach), off the
+            # event loop and under the limit shared by every caller
+            model = await self.prompt_cache.model_for(book_id, instruction)
+            async with llm_rate_limit:
+                response = await asyncio.to_thread(model.generate_content, prompt)
             
             if response and response.text:
                 logger.info(f"Agent {agent.name} response received")
+                if usage is not None:
+                    metadata = getattr(response, 'usage_metadata', None)
+                    usage['prompt_tokens'] = usage.get('prompt_tokens', 0) + (
+                        getattr(metadata, 'prompt_token_count', None) or estimate_tokens(instruction + prompt)
+                    )
+                    usage['cached_tokens'] = usage.get('cached_tokens', 0) + (
+                        getattr(metadata, 'cached_content_token_count', None) or 0
+                    )
+                    usage['output_tokens'] = usage.get('output_tokens', 0) + (
+                        getattr(metadata, 'candidates_token_count', None) or estimate_tokens(response.text)
+                    )
                 return response.text
             else:
                 logger.warning(f"No response from agent {agent.name}")
                 return f"Error: No response from {agent.name}"
-                
+        
         except Exception as e:
             logger.error(f"Error in LLM call for {agent.name}: {e}", exc_info=True)
             raise
-
@@ -0,0 +1,238 @@
+"""
+Quality Gate - Decides which LLM passes a chapter draft needs
+"""
+import hashlib
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import List, Optional
+import numpy as np
+from app.core.config import settings
+
+HEADING = re.compile(r"(#{1,6})\s+\S")
+LIST_ITEM = re.compile(r"\s*(?:\d+[.)]|[-*+])\s")
+CODE_FENCE = re.compile(r" {0,3}(?:```|~~~)")
+WHITESPACE = re.compile(r"\s+")
+
+# Byte classes for the vectorized text statistics. Non-ASCII bytes count as
+# letters so accented words are not split apart.
+_LETTER = np.zeros(256, dtype=bool)
+_LETTER[[*b"abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'"]] = True
+_LETTER[128:] = True
+_VOWEL = np.zeros(256, dtype=bool)
+_VOWEL[[*b"aeiouyAEIOUY"]] = True
+_TERMINATOR = np.zeros(256, dtype=bool)
+_TERMINATOR[[*b".!?"]] = True
+
+# Paragraphs shorter than this are not checked for repetition
+MIN_REPEATED_PARAGRAPH_WORDS = 8
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough LLM token count (about four characters per token)"""
+    return (len(text) + 3) // 4
+
+
+@dataclass
+class TextStatistics:
+    """Word, sentence and syllable counts of a text"""
+    words: int
+    sentences: int
+    syllables: int
+    
+    @property
+    def words_per_sentence(self) -> float:
+        return self.words / max(self.sentences, 1)
+    
+    @property
+    def reading_ease(self) -> float:
+        """Flesch reading ease (higher is easier; 60-70 is plain English)"""
+        if not self.words:
+            return 0.0
+        return 206.835 - 1.015 * self.words_per_sentence - 84.6 * (self.syllables / self.words)
+
+
+def text_statistics(text: str) -> TextStatistics:
+    """
+    Count words, sentences and syllables in one vectorized pass
+    
+    Works on the UTF-8 bytes: a word starts at a letter not preceded by a
+    letter, a syllable at a vowel group inside a word (at least one per
+    word), a sentence at each run of terminal punctuation.
+    """
+    data = np.frombuffer(text.encode("utf-8"), dtype=np.uint8)
+    if not data.size:
+        return TextStatistics(0, 0, 0)
+    
+    letter = _LETTER[data]
+    vowel = _VOWEL[data] & letter
+    terminator = _TERMINATOR[data]
+    
+    word_start = letter.copy()
+    word_start[1:] &= ~letter[:-1]
+    vowel_start = vowel.copy()
+    vowel_start[1:] &= ~vowel[:-1]
+    sentence_end = terminator.copy()
+    sentence_end[1:] &= ~terminator[:-1]
+    
+    words = int(word_start.sum())
+    if not words:
+        return TextStatistics(0, 0, 0)
+    
+    # Vowel groups per word: index each letter by its word, then count
+    word_index = np.cumsum(word_start)
+    syllables = np.bincount(word_index[vowel_start], minlength=words + 1)[1:]
+    sentences = int(sentence_end.sum()) or 1
+    
+    return TextStatistics(words, sentences, int(np.maximum(syllables, 1).sum()))
+
+
+@dataclass
+class QualityReport:
+    """Measurements of a chapter draft and the passes they call for"""
+    words: int
+    target_words: int
+    reading_ease: float
+    words_per_sentence: float
+    headings: int
+    heading_issues: List[str]
+    repeated_paragraphs: int
+    list_density: float
+    content_issues: List[str] = field(default_factory=list)
+    editing_issues: List[str] = field(default_factory=list)
+    
+    @property
+    def word_ratio(self) -> float:
+        return self.words / self.target_words if self.target_words else 1.0
+    
+    @property
+    def needs_content(self) -> bool:
+        return bool(self.content_issues)
+    
+    @property
+    def needs_editing(self) -> bool:
+        return bool(self.editing_issues)
+
+
+class QualityGate:
+    """
+    CPU-only analysis of chapter drafts
+    No LLM needed - the content-enhancement and editor passes only run
+    when a draft falls short of the configured thresholds
+    """
+    
+    def __init__(
+        self,
+        min_word_ratio: float = 0.9,
+        min_sections: int = 3,
+        min_reading_ease: float = 30.0,
+        max_words_per_sentence: float = 30.0,
+        max_list_density: float = 0.5
+    ):
+        self.min_word_ratio = min_word_ratio
+        self.min_sections = min_sections
+        self.min_reading_ease = min_reading_ease
+        self.max_words_per_sentence = max_words_per_sentence
+        self.max_list_density = max_list_density
+    
+    def analyze(self, content: str, target_words: int) -> QualityReport:
+        """
+        Measure a draft and decide which passes it needs
+        
+        Args:
+            content: Chapter markdown
+            target_words: Words per chapter the book asks for
+        
+        Returns:
+            Report with content_issues / editing_issues explaining each pass
+            that should run (empty when it can be skipped)
+        """
+        lines = content.split("\n")
+        text_lines = [line for line in lines if line.strip()]
+        
+        heading_levels = []
+        list_items = 0
+        prose: List[str] = []
+        in_code = False
+        for line in text_lines:
+            # Code is neither prose nor outline
+            if CODE_FENCE.match(line):
+                in_code = not in_code
+                continue
+            if in_code:
+                continue
+            heading = HEADING.match(line)
+            if heading:
+                heading_levels.append(len(heading.group(1)))
+            elif LIST_ITEM.match(line):
+                list_items += 1
+            else:
+                prose.append(line)
+        
+        # Readability is measured on prose so headings and bullets do not
+        # count as short sentences
+        stats = text_statistics("\n".join(prose))
+        words = len(content.split())
+        
+        report = QualityReport(
+            words=words,
+            target_words=target_words,
+            reading_ease=round(stats.reading_ease, 1),
+            words_per_sentence=round(stats.words_per_sentence, 1),
+            headings=len(heading_levels),
+            heading_issues=self._heading_issues(heading_levels),
+            repeated_paragraphs=self._repeated_paragraphs(content),
+            list_density=round(list_items / len(text_lines), 3) if text_lines else 0.0,
+        )
+        
+        if report.word_ratio < self.min_word_ratio:
+            report.content_issues.append(f"{words} of {target_words} target words")
+        sections = sum(1 for level in heading_levels if level == 2)
+        if sections < self.min_sections:
+            report.content_issues.append(f"{sections} sections, expected at least {self.min_sections}")
+        
+        if report.repeated_paragraphs:
+            report.editing_issues.append(f"{report.repeated_paragraphs} repeated paragraphs")
+        if stats.words and report.reading_ease < self.min_reading_ease:
+            report.editing_issues.append(f"reading ease {report.reading_ease}")
+        if report.words_per_sentence > self.max_words_per_sentence:
+            report.editing_issues.append(f"{report.words_per_sentence} words per sentence")
+        if report.list_density > self.max_list_density:
+            report.editing_issues.append(f"{report.list_density:.0%} of lines are list items")
+        report.editing_issues.extend(report.heading_issues)
+        
+        return report
+    
+    @staticmethod
+    def _heading_issues(levels: List[int]) -> List[str]:
+        """Problems with the heading outline (levels in document order)"""
+        issues = []
+        if levels.count(1) > 1:
+            issues.append(f"{levels.count(1)} top-level headings")
+        previous: Optional[int] = None
+        for level in levels:
+            if previous is not None and level > previous + 1:
+                issues.append(f"heading level jumps from {previous} to {level}")
+                break
+            previous = level
+        return issues
+    
+    @staticmethod
+    def _repeated_paragraphs(content: str) -> int:
+        """Paragraphs that repeat an earlier one (ignoring case and spacing)"""
+        digests = Counter(
+            hashlib.blake2b(WHITESPACE.sub(" ", paragraph.strip().lower()).encode("utf-8"), digest_size=8).digest()
+            for paragraph in content.split("\n\n")
+            if len(paragraph.split()) >= MIN_REPEATED_PARAGRAPH_WORDS
+        )
+        return sum(count - 1 for count in digests.values())
+
+
+# Global instance
+quality_gate = QualityGate(
+    min_word_ratio=settings.quality_min_word_ratio,
+    min_sections=settings.quality_min_sections,
+    min_reading_ease=settings.quality_min_reading_ease,
+    max_words_per_sentence=settings.quality_max_words_per_sentence,
+    max_list_density=settings.quality_max_list_density,
+)
@@ -1,8 +1,11 @@
 """
 Research Agent - Gathers and organizes research materials
 """
+import asyncio
 from autogen import ConversableAgent
+from typing import Dict, List
 from app.core.llm_config import get_llm_config
+from app.core.config import settings
 from app.services.research_service import research_service
 from app.services.rag_service import rag_service
 
@@ -41,7 +44,7 @@ def perform_research(book_id: int, topic: str) -> dict:
     Args:
         book_id: Book ID
         topic: Research topic
-        
+    
     Returns:
         Summary of research findings
     """
@@ -58,16 +61,62 @@ def perform_research(book_id: int, topic: str) -> dict:
         metadata.append({
             'url': result.get('url', ''),
             'title': result.get('title', ''),
-            'source': 'web_search'
+            'source': 'web_search',
+            'chapter_id': 0
         })
         sources.append(result)
     
     # Add to RAG
     if documents:
-        rag_service.add_documents(book_id, documents, metadata)
+        rag_service.replace_chapter_documents(book_id, 0, documents, metadata)
     
     return {
         'sources_found': len(sources),
         'sources': sources
     }
 
+
+
+async def perform_chapter_research(book_id: int, topic: str, chapters: List[dict]) -> dict:
+    """
+    Perform research for every chapter concurrently and store in RAG
+    
+    Documents are tagged with the chapter ID so retrieval can be scoped
+    to the chapter being written.
+    
+    Args:
+        book_id: Book ID
+        topic: Book topic, used to keep chapter queries on topic
+        chapters: List of dicts with 'id', 'title' and 'outline'
+    
+    Returns:
+        Summary of research findings per chapter
+    """
+    chapter_results = await research_service.research_chapters(
+        topic, chapters, max_results=settings.chapter_research_results
+    )
+    
+    # Embedding and storing are blocking; keep them off the event loop
+    await asyncio.to_thread(_store_chapter_research, book_id, chapter_results)
+    
+    return {
+        'chapters_researched': len(chapter_results),
+        'sources_found': sum(len(results) for results in chapter_results.values())
+    }
+
+
+def _store_chapter_research(book_id: int, chapter_results: Dict[int, List[dict]]):
+    """Replace each chapter's documents in RAG with its search results"""
+    for chapter_id, results in chapter_results.items():
+        documents = [r.get('snippet', '') for r in results if r.get('snippet')]
+        metadata = [
+            {
+                'url': r.get('url', ''),
+                'title': r.get('title', ''),
+                'source': 'web_search',
+                'chapter_id': chapter_id
+            }
+            for r in results if r.get('snippet')
+        ]
+        if documents:
+            rag_service.replace_chapter_documents(book_id, chapter_id, documents, metadata)
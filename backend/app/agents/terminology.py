@@ -0,0 +1,157 @@
+"""
+Terminology - Harmonizes spelling variants of a term across separately edited parts
+"""
+import re
+from collections import Counter
+from typing import Dict, FrozenSet, List, Tuple
+
+# Words, including hyphenated compounds
+TERM = re.compile(r"[A-Za-z]+(?:-[A-Za-z]+)*")
+CODE_FENCE = re.compile(r" {0,3}(?:```|~~~)")
+# Inline text that is not prose: code spans, link and image targets,
+# autolinks and inline HTML, bare URLs and reference definitions
+PROTECTED = re.compile(
+    r"(?P<ticks>`+)(?:(?!\n[ \t]*\n).)+?(?<!`)(?P=ticks)(?!`)"
+    r"|\]\([^)]*\)"
+    r"|<[^>\n]+>"
+    r"|\b(?:https?|ftp)://[^\s)\]>]+"
+    r"|\bwww\.[^\s)\]>]+"
+    r"|^ {0,3}\[[^\]\n]+\]:[^\n]*",
+    re.MULTILINE | re.DOTALL,
+)
+
+# Shorter terms are left alone
+MIN_TERM_LENGTH = 4
+
+# Closed compounds whose hyphenated spelling means the same thing. Other
+# hyphenated / closed pairs are only reported (re-sign / resign, re-cover /
+# recover are different words).
+MERGEABLE_COMPOUNDS = frozenset({
+    "email", "ebook", "online", "offline", "website", "webpage", "realtime",
+    "dataset", "database", "startup", "smartphone", "wildlife", "healthcare",
+})
+
+
+def _term_form(token: str) -> str:
+    """
+    How a term is spelled, ignoring sentence capitalization
+    
+    Words with capitals after the first letter (JavaScript, GitHub) keep
+    their case; others are compared in lower case.
+    """
+    return token if any(c.isupper() for c in token[1:]) else token.lower()
+
+
+def _term_key(token: str) -> str:
+    """Spellings of the same term share a key (e-mail, email, Email)"""
+    return token.replace("-", "").lower()
+
+
+def _prose_segments(text: str):
+    """Yield (segment, is_prose) pieces of text; code and link targets are not prose"""
+    block = []
+    in_code = False
+    for line in text.splitlines(keepends=True):
+        if CODE_FENCE.match(line) and not in_code:
+            if block:
+                yield from _inline_segments("".join(block))
+            block, in_code = [line], True
+        elif CODE_FENCE.match(line) and in_code:
+            block.append(line)
+            yield "".join(block), False
+            block, in_code = [], False
+        else:
+            block.append(line)
+    if block:
+        if in_code:
+            yield "".join(block), False
+        else:
+            yield from _inline_segments("".join(block))
+
+
+def _inline_segments(text: str):
+    """Split prose outside fenced code around its protected inline spans"""
+    position = 0
+    for match in PROTECTED.finditer(text):
+        if match.start() > position:
+            yield text[position:match.start()], True
+        yield match.group(0), False
+        position = match.end()
+    if position < len(text):
+        yield text[position:], True
+
+
+def _part_forms(part: str) -> Dict[str, Counter]:
+    """Spellings used in one part, per term key"""
+    forms: Dict[str, Counter] = {}
+    for segment, is_prose in _prose_segments(part):
+        if not is_prose:
+            continue
+        for token in TERM.findall(segment):
+            key = _term_key(token)
+            # All-caps words are emphasis or acronyms, not spelling choices
+            if len(key) >= MIN_TERM_LENGTH and not token.isupper():
+                forms.setdefault(key, Counter())[_term_form(token)] += 1
+    return forms
+
+
+def unify_terminology(
+    parts: List[str],
+    compounds: FrozenSet[str] = MERGEABLE_COMPOUNDS
+) -> Tuple[List[str], Dict[str, str], List[str]]:
+    """
+    Use one spelling per term where separately edited parts disagree
+    
+    Parts of a chapter edited independently can disagree on the case of
+    names (Javascript / JavaScript) or on hyphenation (e-mail / email).
+    Only terms whose preferred spelling differs between parts are touched;
+    the spelling used most often (first seen on a tie) wins. Hyphenated
+    and closed forms are merged only for `compounds`, other such pairs are
+    reported instead. Code, link targets and URLs are never changed.
+    
+    Args:
+        parts: Edited parts of a chapter, in order
+        compounds: Closed compounds whose hyphenated form may be merged
+    
+    Returns:
+        (parts with variants replaced, {variant: chosen spelling},
+        hyphenation differences left for the author as "a / b")
+    """
+    part_forms = [_part_forms(part) for part in parts]
+    totals: Dict[str, Counter] = {}
+    preferred: Dict[str, set] = {}
+    for forms in part_forms:
+        for key, counts in forms.items():
+            totals.setdefault(key, Counter()).update(counts)
+            preferred.setdefault(key, set()).add(counts.most_common(1)[0][0])
+    
+    canonical: Dict[str, str] = {}
+    flagged: List[str] = []
+    for key, spellings in preferred.items():
+        if len(spellings) < 2:
+            continue
+        counts = totals[key]
+        if len({form.lower() for form in counts}) > 1 and key not in compounds:
+            flagged.append(" / ".join(sorted(counts, key=str.lower)))
+            continue
+        canonical[key] = counts.most_common(1)[0][0]
+    if not canonical:
+        return list(parts), {}, flagged
+    
+    replacements: Dict[str, str] = {}
+    
+    def replace(match: re.Match) -> str:
+        token = match.group(0)
+        chosen = canonical.get(_term_key(token))
+        if chosen is None or token.isupper() or _term_form(token) == chosen:
+            return token
+        replacements[_term_form(token)] = chosen
+        if chosen.islower() and token[0].isupper():
+            return chosen[0].upper() + chosen[1:]
+        return chosen
+    
+    unified = [
+        "".join(TERM.sub(replace, segment) if is_prose else segment for segment, is_prose in _prose_segments(part))
+        for part in parts
+    ]
+    return unified, replacements, flagged
@@ -1,3 +1,3 @@
 # Route handlers
-from . import books, chapters, chat, websocket, export, ideas
+from . import books, chapters, chat, websocket, events, export, ideas
 
@@ -2,16 +2,27 @@
 Book management API routes
 """
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
-from app.core.database import get_db
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload, load_only
+from typing import List, Optional
+from app.core.database import get_async_db
 from app.models.book import Book
 from app.models.chapter import Chapter
 from app.schemas.book_schema import BookConfig, BookCreate, BookResponse
 from app.schemas.generation_schema import GenerationStatus, AgentStatus, AgentStatusEnum, ChapterStatusEnum
+from app.agents.research_agent import perform_chapter_research
 from app.services.research_service import research_service
 from app.services.rag_service import rag_service
+from app.services.event_log import event_log
+from app.services.artifact_store import artifact_store
+from app.services.book_export import export_prebuilder
+from app.services.generation_subscribers import skip_metrics
+from app.services.book_memory import book_memory, pack_book_memory
+from app.services.context_packer import ContextSource, context_packer, count_tokens
+from app.services.prompt_cache import prompt_cache
 from app.core.llm_config import get_llm_config
+from app.core.config import settings
 import google.generativeai as genai
 import logging
 
@@ -35,8 +46,23 @@ def convert_book_config(config: BookConfig) -> dict:
     }
 
 
+async def load_book_with_chapters(db: AsyncSession, book_id: int) -> Optional[Book]:
+    """Load a book with its chapter previews, without chapter bodies"""
+    result = await db.execute(
+        select(Book)
+        .options(
+            selectinload(Book.chapters).load_only(
+                Chapter.chapter_number, Chapter.title, Chapter.status
+            )
+        )
+        .where(Book.id == book_id)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalar_one_or_none()
+
+
 @router.post("/api/books", response_model=BookResponse)
-async def create_book(book_config: BookConfig, db: Session = Depends(get_db)):
+async def create_book(book_config: BookConfig, db: AsyncSession = Depends(get_async_db)):
     """Create a new book from configuration"""
     
     # Convert config
@@ -45,8 +71,8 @@ async def create_book(book_config: BookConfig, db: Session = Depends(get_db)):
     # Create book
     book = Book(**book_data)
     db.add(book)
-    db.commit()
-    db.refresh(book)
+    await db.commit()
+    await db.refresh(book)
     
     logger.info(f"Created book {book.id}: {book.book_idea}")
     
@@ -55,8 +81,6 @@ async def create_book(book_config: BookConfig, db: Session = Depends(get_db)):
     introduction = ""
     
     try:
-        from app.core.config import settings
-        
         # Check if Gemini API key is configured
         if not settings.gemini_api_key or settings.gemini_api_key == "":
             logger.error("GEMINI_API_KEY not configured in environment variables")
@@ -88,11 +112,12 @@ async def create_book(book_config: BookConfig, db: Session = Depends(get_db)):
             refined_concept = response.text if response and response.text else f"Book concept: {book.book_idea}"
             
             # Step 2: Create an engaging introduction
+            intro_concept = context_packer.pack("introduction", [ContextSource("concept", refined_concept)])
             intro_prompt = f"""
             Write a compelling introduction (2-3 paragraphs) for this book:
             
             Title: {book.book_idea}
-            Refined Concept: {refined_concept[:500]}
+            Refined Concept: {intro_concept.get("concept")}
             Genre: {book.genre}
             Target Audience: {book.target_audience}
             
@@ -109,7 +134,7 @@ async def create_book(book_config: BookConfig, db: Session = Depends(get_db)):
             introduction = intro_response.text if intro_response and intro_response.text else f"Welcome to {book.book_idea}!"
             
             logger.info("Ideation phase completed successfully")
-        
+    
     except Exception as e:
         logger.error(f"Error in ideation: {e}", exc_info=True)
         refined_concept = f"Book concept: {book.book_idea}"
@@ -122,13 +147,13 @@ async def create_book(book_config: BookConfig, db: Session = Depends(get_db)):
         # Store in RAG
         documents = [r.get('snippet', '') for r in research_results if r.get('snippet')]
         metadata = [
-            {'url': r.get('url', ''), 'title': r.get('title', ''), 'source': 'web_search'}
-            for r in research_results
+            {'url': r.get('url', ''), 'title': r.get('title', ''), 'source': 'web_search', 'chapter_id': 0}
+            for r in research_results if r.get('snippet')
         ]
         
         if documents:
-            rag_service.add_documents(book.id, documents, metadata)
-            
+            rag_service.replace_chapter_documents(book.id, 0, documents, metadata)
+    
     except Exception as e:
         logger.error(f"Error in research: {e}")
     
@@ -139,6 +164,7 @@ async def create_book(book_config: BookConfig, db: Session = Depends(get_db)):
             book_id=book.id,
             chapter_number=i,
             title=f"Chapter {i}: To Be Determined",
+            outline=None,
             status="pending"
         )
         chapters.append(chapter)
@@ -146,11 +172,12 @@ async def create_book(book_config: BookConfig, db: Session = Depends(get_db)):
     
     # Generate detailed outline with AI agent
     try:
+        outline_concept = context_packer.pack("outline", [ContextSource("concept", refined_concept)])
         outline_prompt = f"""
         You are an expert at structuring non-fiction books. Create a compelling chapter outline for this book:
         
         Title: {book.book_idea}
-        Refined Concept: {refined_concept[:300]}
+        Refined Concept: {outline_concept.get("concept")}
         Genre: {book.genre}
         Target Audience: {book.target_audience}
         Tone: {book.tone}
@@ -186,7 +213,7 @@ async def create_book(book_config: BookConfig, db: Session = Depends(get_db)):
                 line = line.strip()
                 if not line:
                     continue
-                    
+                
                 # Check if it's a chapter number line
                 if ':' in line and (line.startswith(('1', '2', '3', '4', '5', '6', '7', '8', '9', '10', '11', '12', '13', '14', '15'))):
                     # Save previous chapter if exists
@@ -199,7 +226,7 @@ async def create_book(book_config: BookConfig, db: Session = Depends(get_db)):
                     current_chapter_idx = int(parts[0].strip()) - 1
                     current_title = parts[1].strip() if len(parts) > 1 else ""
                     current_desc = []
-                    
+                
                 elif line.lower().startswith('description:'):
                     desc_text = line.replace('Description:', '').strip()
                     if desc_text:
@@ -214,7 +241,7 @@ async def create_book(book_config: BookConfig, db: Session = Depends(get_db)):
                 chapters[current_chapter_idx].outline = ' '.join(current_desc)
             
             logger.info("Outline generated successfully")
-            
+    
     except Exception as e:
         logger.error(f"Error creating outline: {e}")
     
@@ -227,24 +254,35 @@ async def create_book(book_config: BookConfig, db: Session = Depends(get_db)):
             enhanced_description += f"## Introduction\n{introduction}\n\n"
         book.description = enhanced_description.strip()
     
-    db.commit()
-    db.refresh(book)
+    await db.commit()
+    
+    # Run per-chapter research so each chapter retrieves from its own sources
+    try:
+        research = await perform_chapter_research(
+            book.id,
+            book.book_idea,
+            [{'id': c.id, 'title': c.title, 'outline': c.outline} for c in chapters]
+        )
+        logger.info(f"Chapter research completed for {research['chapters_researched']} chapters")
+    
+    except Exception as e:
+        logger.error(f"Error in chapter research: {e}")
     
     # Update book status
     book.status = "initialized"
-    db.commit()
-    db.refresh(book)
+    await db.commit()
     
     logger.info(f"Book {book.id} initialized with outline and AI-generated content")
     
+    book = await load_book_with_chapters(db, book.id)
     return BookResponse.from_orm(book)
 
 
 @router.get("/api/books/{book_id}", response_model=BookResponse)
-async def get_book(book_id: int, db: Session = Depends(get_db)):
+async def get_book(book_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get book details with chapters"""
     
-    book = db.query(Book).filter(Book.id == book_id).first()
+    book = await load_book_with_chapters(db, book_id)
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
     
@@ -252,18 +290,22 @@ async def get_book(book_id: int, db: Session = Depends(get_db)):
 
 
 @router.get("/api/books/{book_id}/status", response_model=GenerationStatus)
-async def get_book_status(book_id: int, db: Session = Depends(get_db)):
+async def get_book_status(book_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get generation status"""
     
-    book = db.query(Book).filter(Book.id == book_id).first()
+    book = (await db.execute(select(Book.id, Book.status).where(Book.id == book_id))).first()
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
     
-    chapters = db.query(Chapter).filter(Chapter.book_id == book_id).all()
-    
-    # Calculate completion status
-    total = len(chapters)
-    complete = sum(1 for c in chapters if c.status == "complete")
+    # Calculate completion status in SQL (served from ix_chapters_book_id_status)
+    result = await db.execute(
+        select(Chapter.status, func.count())
+        .where(Chapter.book_id == book_id)
+        .group_by(Chapter.status)
+    )
+    status_counts = dict(result.all())
+    total = sum(status_counts.values())
+    complete = status_counts.get("complete", 0)
     
     # Default agent statuses (idle)
     agents = [
@@ -286,11 +328,49 @@ async def get_book_status(book_id: int, db: Session = Depends(get_db)):
     )
 
 
+@router.get("/api/books/{book_id}/quality-gate")
+async def get_quality_gate_stats(book_id: int, db: AsyncSession = Depends(get_async_db)):
+    """How often the quality gate skipped the content and editor passes, and the tokens saved"""
+    
+    book = await db.get(Book, book_id)
+    if not book:
+        raise HTTPException(status_code=404, detail="Book not found")
+    
+    return skip_metrics.snapshot(book_id)
+
+
+@router.get("/api/books/{book_id}/memory")
+async def get_book_memory(book_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Per-chapter memory of a book and the context the next chapter would get"""
+    
+    book = await db.get(Book, book_id)
+    if not book:
+        raise HTTPException(status_code=404, detail="Book not found")
+    
+    memories = await book_memory.load(db, book_id)
+    context = pack_book_memory(memories, book_memory.max_tokens)
+    return {
+        "chapters": [
+            {
+                "chapter_number": memory.chapter_number,
+                "title": memory.title,
+                "summary": memory.summary,
+                "terms": memory.terms or [],
+                "facts": memory.facts or [],
+            }
+            for memory in memories
+        ],
+        "context": context,
+        "context_tokens": count_tokens(context),
+        "max_tokens": book_memory.max_tokens,
+    }
+
+
 @router.delete("/api/books/{book_id}")
-async def delete_book(book_id: int, db: Session = Depends(get_db)):
+async def delete_book(book_id: int, db: AsyncSession = Depends(get_async_db)):
     """Delete book and cleanup resources"""
     
-    book = db.query(Book).filter(Book.id == book_id).first()
+    book = await db.get(Book, book_id)
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
     
@@ -301,8 +381,14 @@ async def delete_book(book_id: int, db: Session = Depends(get_db)):
         logger.error(f"Error deleting RAG data: {e}")
     
     # Delete book (cascades to chapters, sources, logs)
-    db.delete(book)
-    db.commit()
+    await db.delete(book)
+    await db.commit()
+    
+    event_log.forget(book_id)
+    export_prebuilder.cancel(book_id)
+    skip_metrics.forget(book_id)
+    artifact_store.remove(book_id)
+    await prompt_cache.release(book_id)
     
     return {"message": "Book deleted successfully"}
 
@@ -1,16 +1,30 @@
 """
 Chapter API routes
 """
+import asyncio
+import time
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
-from sqlalchemy.orm import Session
-from typing import List
-from app.core.database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, undefer, undefer_group
+from typing import List, Optional
+from app.core.database import get_async_db, AsyncSessionLocal
+from app.core.db_writer import db_writer
 from app.models.book import Book
 from app.models.chapter import Chapter
-from app.schemas.chapter_schema import ChapterResponse, ChapterUpdate, TOCItem
+from app.agents.format_agent import FormatAgent
+from app.schemas.chapter_schema import (
+    ChapterResponse, ChapterUpdate, SectionRegenerate, SectionRegenerateResponse, TOCItem
+)
 from app.services.rag_service import rag_service
-from app.core.llm_config import get_llm_config
-import google.generativeai as genai
+from app.services.markdown_renderer import content_hash, html_cache
+from app.services.book_export import export_prebuilder
+from app.services.book_memory import book_memory
+from app.services.context_packer import ContextSource, context_packer, count_tokens
+from app.services.generation_events import StageFinished, StageStarted, generation_events
+from app.services.prompt_cache import book_preamble, prompt_cache
+from app.core.llm_config import get_llm_config, llm_rate_limit
+from app.utils.markdown_sections import split_sections
 import logging
 
 logger = logging.getLogger(__name__)
@@ -18,11 +32,29 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
+async def get_chapter_by_number(db: AsyncSession, book_id: int, chapter_number: int, include_body: bool = False):
+    """Look up a chapter by its position in a book"""
+    query = select(Chapter).where(
+        Chapter.chapter_number == chapter_number,
+        Chapter.book_id == book_id
+    )
+    if include_body:
+        query = query.options(undefer_group("body"))
+    result = await db.execute(query)
+    return result.scalars().first()
+
+
 @router.get("/api/books/{book_id}/chapters", response_model=List[TOCItem])
-async def get_chapters(book_id: int, db: Session = Depends(get_db)):
+async def get_chapters(book_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get all chapters for a book"""
     
-    chapters = db.query(Chapter).filter(Chapter.book_id == book_id).order_by(Chapter.chapter_number).all()
+    # Project only the TOC columns so chapter bodies are never read
+    result = await db.execute(
+        select(Chapter.chapter_number, Chapter.title, Chapter.status, Chapter.outline)
+        .where(Chapter.book_id == book_id)
+        .order_by(Chapter.chapter_number)
+    )
+    chapters = result.all()
     
     if not chapters:
         raise HTTPException(status_code=404, detail="Book not found or no chapters")
@@ -41,13 +73,10 @@ async def get_chapters(book_id: int, db: Session = Depends(get_db)):
 
 
 @router.get("/api/books/{book_id}/chapters/{chapter_number}", response_model=ChapterResponse)
-async def get_chapter(book_id: int, chapter_number: int, db: Session = Depends(get_db)):
+async def get_chapter(book_id: int, chapter_number: int, db: AsyncSession = Depends(get_async_db)):
     """Get a single chapter by chapter number"""
     
-    chapter = db.query(Chapter).filter(
-        Chapter.chapter_number == chapter_number,
-        Chapter.book_id == book_id
-    ).first()
+    chapter = await get_chapter_by_number(db, book_id, chapter_number, include_body=True)
     
     if not chapter:
         raise HTTPException(status_code=404, detail="Chapter not found")
@@ -55,23 +84,23 @@ async def get_chapter(book_id: int, chapter_number: int, db: Session = Depends(g
     return ChapterResponse.from_orm(chapter)
 
 
-async def generate_chapter_content(book_id: int, chapter_id: int, db: Session):
+async def generate_chapter_content(book_id: int, chapter_id: int):
     """Background task to generate chapter content"""
     
     # Import here to avoid circular dependency
     from app.api.routes.websocket import broadcast_to_book
     
-    chapter = db.query(Chapter).filter(
-        Chapter.id == chapter_id,
-        Chapter.book_id == book_id
-    ).first()
-    
-    if not chapter:
-        return
+    # Background tasks outlive the request, so read through a session of our own
+    async with AsyncSessionLocal() as db:
+        chapter = await db.get(Chapter, chapter_id, options=[undefer(Chapter.outline)])
+        book = await db.get(Book, book_id)
+        if not chapter or chapter.book_id != book_id or not book:
+            return
+        # What the chapters before this one established, within a fixed budget
+        memory = await book_memory.context(db, book_id, chapter.chapter_number)
     
     # Update status to generating
-    chapter.status = "generating"
-    db.commit()
+    await db_writer.update(Chapter, chapter.id, status="generating")
     
     # Broadcast agent status update
     await broadcast_to_book(book_id, 'agent_status', {
@@ -81,41 +110,56 @@ async def generate_chapter_content(book_id: int, chapter_id: int, db: Session):
     })
     
     try:
-        book = db.query(Book).filter(Book.id == book_id).first()
-        
         # Get RAG context
-        context_chunks = rag_service.search_relevant_context(book_id, chapter.outline or chapter.title or "", top_k=5)
-        context = "\n\n".join([chunk.get('text', '') for chunk in context_chunks])
+        context_chunks = rag_service.search_relevant_context(
+            book_id, chapter.outline or chapter.title or "", top_k=5, chapter_id=chapter.id
+        )
+        # Fill the context budget: outline first, then what earlier chapters
+        # established, then research hits by relevance
+        packed = context_packer.pack("chapter", [
+            ContextSource("outline", chapter.outline or "", priority=0, max_tokens=300),
+            ContextSource("memory", memory, priority=1, max_tokens=book_memory.max_tokens),
+            ContextSource("research", "\n\n".join(chunk.get('text', '') for chunk in context_chunks), priority=2),
+        ])
         
-        # Generate content with Gemini
+        # Generate content with Gemini; the book brief is the same for every
+        # chapter, so it goes in the (per book cached) system instruction
         llm_config = get_llm_config()
-        model = genai.GenerativeModel('gemini-2.0-flash')
+        model = await prompt_cache.model_for(book_id, await _book_preamble(book))
         
         prompt = f"""
         Write a comprehensive chapter for this book.
         
         Chapter Title: {chapter.title}
-        Chapter Description/Outline: {chapter.outline}
+        Chapter Description/Outline: {packed.get("outline", chapter.title or "")}
         Target Word Count: {book.words_per_chapter}
-        Tone: {book.tone}
-        Genre: {book.genre}
-        Target Audience: {book.target_audience}
         
         Context from research:
-        {context[:1000] if context else "No additional context available"}
+        {packed.get("research", "No additional context available")}
+        
+        Earlier chapters (stay consistent with them and do not repeat them):
+        {packed.get("memory", "No earlier chapters written yet")}
         
         Write the chapter in markdown format with proper headings, lists, and emphasis.
         Make it engaging, informative, and suitable for {book.target_audience or 'general readers'}.
         """
         
-        response = model.generate_content(prompt)
+        async with llm_rate_limit:
+            response = await asyncio.to_thread(model.generate_content, prompt)
         content = response.text if response else ""
         
         # Update chapter
-        chapter.content_markdown = content
-        chapter.word_count = len(content.split()) if content else 0
-        chapter.status = "complete"
-        db.commit()
+        await db_writer.update(
+            Chapter,
+            chapter.id,
+            content_markdown=content,
+            content_hash=content_hash(content),
+            word_count=len(content.split()) if content else 0,
+            status="complete"
+        )
+        html_cache.invalidate(chapter.id)
+        export_prebuilder.schedule(book_id)
+        await _remember_chapter(book_id, chapter, content)
         
         # Broadcast agent idle status
         await broadcast_to_book(book_id, 'agent_status', {
@@ -132,11 +176,11 @@ async def generate_chapter_content(book_id: int, chapter_id: int, db: Session):
         })
         
         logger.info(f"Generated chapter {chapter.chapter_number} for book {book_id}")
-        
+    
     except Exception as e:
         logger.error(f"Error generating chapter: {e}", exc_info=True)
-        chapter.status = "failed"  # Set to failed instead of pending to indicate error
-        db.commit()
+        # Set to failed instead of pending to indicate error
+        await db_writer.update(Chapter, chapter.id, status="failed")
         
         # Broadcast error status
         await broadcast_to_book(book_id, 'agent_status', {
@@ -151,14 +195,11 @@ async def generate_chapter_endpoint(
     book_id: int, 
     chapter_number: int, 
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Generate a single chapter"""
     
-    chapter = db.query(Chapter).filter(
-        Chapter.chapter_number == chapter_number,
-        Chapter.book_id == book_id
-    ).first()
+    chapter = await get_chapter_by_number(db, book_id, chapter_number)
     
     if not chapter:
         raise HTTPException(status_code=404, detail="Chapter not found")
@@ -167,7 +208,7 @@ async def generate_chapter_endpoint(
         raise HTTPException(status_code=400, detail="Chapter already generated")
     
     # Start background task
-    background_tasks.add_task(generate_chapter_content, book_id, chapter.id, db)
+    background_tasks.add_task(generate_chapter_content, book_id, chapter.id)
     
     return {"message": "Chapter generation started", "chapter_number": chapter_number}
 
@@ -176,22 +217,24 @@ async def generate_chapter_endpoint(
 async def generate_all_chapters(
     book_id: int,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Generate all pending chapters"""
     
-    book = db.query(Book).filter(Book.id == book_id).first()
+    book = await db.get(Book, book_id)
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
     
-    chapters = db.query(Chapter).filter(
-        Chapter.book_id == book_id,
-        Chapter.status == "pending"
-    ).order_by(Chapter.chapter_number).all()
+    result = await db.execute(
+        select(Chapter)
+        .where(Chapter.book_id == book_id, Chapter.status == "pending")
+        .order_by(Chapter.chapter_number)
+    )
+    chapters = result.scalars().all()
     
     # Start generation for each chapter
     for chapter in chapters:
-        background_tasks.add_task(generate_chapter_content, book_id, chapter.id, db)
+        background_tasks.add_task(generate_chapter_content, book_id, chapter.id)
     
     return {"message": f"Generation started for {len(chapters)} chapters", "chapters": len(chapters)}
 
@@ -201,14 +244,13 @@ async def update_chapter(
     book_id: int,
     chapter_id: int,
     chapter_update: ChapterUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update chapter content manually"""
     
-    chapter = db.query(Chapter).filter(
-        Chapter.id == chapter_id,
-        Chapter.book_id == book_id
-    ).first()
+    chapter = await db.get(Chapter, chapter_id)
+    if chapter and chapter.book_id != book_id:
+        chapter = None
     
     if not chapter:
         raise HTTPException(status_code=404, detail="Chapter not found")
@@ -217,11 +259,201 @@ async def update_chapter(
         chapter.title = chapter_update.title
     if chapter_update.content_markdown:
         chapter.content_markdown = chapter_update.content_markdown
+        chapter.content_hash = content_hash(chapter_update.content_markdown)
         chapter.word_count = len(chapter_update.content_markdown.split())
     if chapter_update.outline:
         chapter.outline = chapter_update.outline
     
-    db.commit()
+    await db.commit()
+    
+    if chapter_update.content_markdown:
+        html_cache.invalidate(chapter.id)
+    if chapter_update.title or chapter_update.content_markdown:
+        export_prebuilder.schedule(book_id)
+        # Later chapters are written against this chapter's memory
+        content = chapter_update.content_markdown
+        if not content:
+            await db.refresh(chapter, ["content_markdown"])
+            content = chapter.content_markdown
+        if content:
+            await _remember_chapter(book_id, chapter, content)
     
     return {"message": "Chapter updated"}
 
+
+
+@router.post(
+    "/api/books/{book_id}/chapters/{chapter_number}/sections/regenerate",
+    response_model=SectionRegenerateResponse
+)
+async def regenerate_section(
+    book_id: int,
+    chapter_number: int,
+    request: SectionRegenerate,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Rewrite one heading-delimited section of a chapter in place
+    
+    Only the section is generated, with its neighbouring sections as
+    context, and spliced back into the chapter; the rest of the chapter is
+    left byte for byte as it was.
+    """
+    
+    chapter = await get_chapter_by_number(db, book_id, chapter_number, include_body=True)
+    if not chapter:
+        raise HTTPException(status_code=404, detail="Chapter not found")
+    if not chapter.content_markdown:
+        raise HTTPException(status_code=400, detail="Chapter has no content yet")
+    book = await db.get(Book, book_id)
+    
+    sections = split_sections(chapter.content_markdown)
+    if request.heading is not None:
+        wanted = request.heading.strip().lstrip('#').strip().lower()
+        matches = [i for i, section in enumerate(sections) if (section.title or '').lower() == wanted]
+        if not matches:
+            raise HTTPException(status_code=404, detail="Section not found")
+        index = matches[0]
+    elif request.section is not None:
+        if request.section >= len(sections):
+            raise HTTPException(status_code=404, detail="Section not found")
+        index = request.section
+    else:
+        raise HTTPException(status_code=400, detail="Give a section number or heading")
+    target = sections[index]
+    
+    # Neighbours first (they must still read on from and into the new text), then the outline
+    packed = context_packer.pack("section", [
+        ContextSource("previous", sections[index - 1].text if index > 0 else "", priority=0),
+        ContextSource("next", sections[index + 1].text if index + 1 < len(sections) else "", priority=0),
+        ContextSource("outline", chapter.outline or "", priority=1, max_tokens=300),
+    ])
+    
+    prompt = f"""
+        Rewrite one section of the chapter "{chapter.title}".
+        
+        Change requested: {request.instructions}
+        
+        Section before it (do not repeat it):
+        {packed.get("previous", "None - this is the start of the chapter")}
+        
+        Section after it (lead into it, do not repeat it):
+        {packed.get("next", "None - this is the end of the chapter")}
+        
+        Chapter outline:
+        {packed.get("outline", "Not available")}
+        
+        Section to rewrite:
+        {target.text.strip()}
+        
+        Return only the rewritten section in markdown, starting with its heading line
+        unchanged. Do not write any other section.
+        """
+    
+    started = StageStarted(
+        book_id=book_id, stage='section_regeneration', agent_name='writing_agent',
+        task=f'Rewriting {target.title or "opening"}', chapter_id=chapter.id
+    )
+    generation_events.publish(started)
+    start = time.perf_counter()
+    details = {}
+    try:
+        model = await prompt_cache.model_for(book_id, await _book_preamble(book))
+        async with llm_rate_limit:
+            response = await asyncio.to_thread(model.generate_content, prompt)
+        text = response.text if response else ""
+        if not text.strip():
+            raise ValueError("Empty response")
+        
+        metadata = getattr(response, 'usage_metadata', None)
+        details['prompt_tokens'] = getattr(metadata, 'prompt_token_count', None) or count_tokens(prompt)
+        details['output_tokens'] = getattr(metadata, 'candidates_token_count', None) or count_tokens(text)
+        
+        new_section = FormatAgent.format_chapter(text)
+        heading_line = target.text.split("\n", 1)[0]
+        if target.title is not None and not new_section.startswith('#'):
+            new_section = f"{heading_line}\n\n{new_section}"
+        # Keep the blank lines that separated the section from the next one
+        trailing = target.text[len(target.text.rstrip()):]
+        new_section = new_section.rstrip() + (trailing or ("\n\n" if index + 1 < len(sections) else "\n"))
+        
+        content = "".join(s.text if i != index else new_section for i, s in enumerate(sections))
+        section_words = len(new_section.split())
+        word_count = (chapter.word_count or 0) - target.words + section_words
+        updated = await db_writer.submit(
+            _replace_content, chapter.id, chapter.content_hash,
+            dict(content_markdown=content, content_hash=content_hash(content), word_count=word_count)
+        )
+        if not updated:
+            raise HTTPException(status_code=409, detail="Chapter changed while the section was regenerated")
+    except Exception as e:
+        generation_events.publish(StageFinished(
+            **_event_fields(started), duration=time.perf_counter() - start, error=str(e), details=details
+        ))
+        if isinstance(e, HTTPException):
+            raise
+        logger.error(f"Error regenerating section: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Error regenerating section")
+    
+    generation_events.publish(StageFinished(
+        **_event_fields(started), duration=time.perf_counter() - start, details=details
+    ))
+    html_cache.invalidate(chapter.id)
+    export_prebuilder.schedule(book_id)
+    await _remember_chapter(book_id, chapter, content)
+    
+    return SectionRegenerateResponse(
+        chapter_number=chapter_number,
+        section=index,
+        heading=target.title,
+        section_words=section_words,
+        word_count=word_count,
+        prompt_tokens=details['prompt_tokens'],
+        output_tokens=details['output_tokens'],
+    )
+
+
+async def _book_preamble(book: Book) -> str:
+    """
+    The book's system instruction: brief, and research digest when it can be cached
+    
+    Reading the book's research is a blocking Chroma call, so the preamble
+    is built in a worker thread.
+    """
+    book_config = {
+        'book_idea': book.book_idea,
+        'description': book.description,
+        'genre': book.genre,
+        'tone': book.tone,
+        'target_audience': book.target_audience,
+    }
+    book_id = book.id
+    return await asyncio.to_thread(lambda: book_preamble(book_config, rag_service.book_documents(book_id)))
+
+
+async def _remember_chapter(book_id: int, chapter: Chapter, content: str):
+    """
+    Store a chapter's memory for the chapters written after it
+    
+    The chapter itself is already saved, so a failure here is logged
+    rather than reported as a failed generation or edit.
+    """
+    try:
+        await book_memory.update(book_id, chapter.id, chapter.chapter_number, chapter.title, content)
+    except Exception as e:
+        logger.error(f"Error updating book memory for chapter {chapter.id}: {e}", exc_info=True)
+
+
+def _event_fields(event: StageStarted) -> dict:
+    """Fields a StageFinished shares with its StageStarted"""
+    return dict(
+        book_id=event.book_id, stage=event.stage, agent_name=event.agent_name,
+        task=event.task, chapter_id=event.chapter_id
+    )
+
+
+def _replace_content(session: Session, chapter_id: int, expected_hash: Optional[str], values: dict) -> int:
+    """Update a chapter's content only if it is still the text the edit was based on"""
+    return session.query(Chapter).filter(
+        Chapter.id == chapter_id, Chapter.content_hash == expected_hash
+    ).update(values, synchronize_session=False)
@@ -0,0 +1,67 @@
+"""
+Server-Sent Events routes for clients that cannot use WebSockets
+"""
+from fastapi import APIRouter, Header, Query
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from app.api.routes.websocket import build_catch_up
+from app.core.config import settings
+from app.services.connection_manager import EventStreamSocket, connection_manager
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Delay before EventSource reconnects after a dropped stream
+SSE_RETRY_MS = 3000
+
+
+@router.get("/api/books/{book_id}/events")
+async def stream_book_events(
+    book_id: int,
+    since: Optional[int] = Query(None),
+    last_event_id: Optional[str] = Header(None)
+):
+    """
+    Stream the book's events as Server-Sent Events
+    
+    Sends the same messages as `/ws/books/{book_id}`, each as a `data:`
+    line with the event's `seq` as its id. EventSource sends the last id
+    back in the Last-Event-ID header when it reconnects, so missed events
+    are replayed; `?since=<seq>` does the same for the first connection.
+    """
+    if last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+    
+    socket = EventStreamSocket(keepalive=settings.sse_keepalive_interval)
+    connection = connection_manager.connect(socket, book_id, start=False, encoding="sse")
+    
+    try:
+        messages, min_seq = await build_catch_up(book_id, since)
+    except Exception:
+        await connection_manager.disconnect(connection)
+        raise
+    connection.prime(messages, min_seq)
+    connection.start()
+    
+    logger.info(f"Event stream opened for book {book_id}")
+    
+    async def stream():
+        try:
+            yield f"retry: {SSE_RETRY_MS}\n\n"
+            async for frame in socket.frames():
+                yield frame
+        finally:
+            await connection_manager.disconnect(connection)
+            logger.info(f"Event stream closed for book {book_id}")
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # Stop nginx-style proxies from buffering the stream
+            "X-Accel-Buffering": "no",
+        }
+    )
@@ -1,120 +1,147 @@
 """
 Export API routes
 """
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import FileResponse, Response
-from sqlalchemy.orm import Session
-from app.core.database import get_db
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Sequence, Tuple
+from app.core.database import get_async_db
 from app.models.book import Book
-from app.models.chapter import Chapter
-import tempfile
-import os
+from app.services.artifact_store import artifact_store
+from app.core.config import settings
+from app.schemas.export_schema import BulkExportProgress, BulkExportRequest
+from app.services.book_export import EXPORT_FORMATS, export_filename, export_version, load_export_chapters
+from app.services.bulk_export import bulk_exports
 
 router = APIRouter()
 
 
-@router.get("/api/books/{book_id}/export/markdown")
-async def export_markdown(book_id: int, db: Session = Depends(get_db)):
-    """Export book as markdown file"""
+async def get_exportable_book(db: AsyncSession, book_id: int) -> Tuple[Book, list]:
+    """
+    Load a book and its completed chapters' metadata for export
     
-    book = db.query(Book).filter(Book.id == book_id).first()
+    Rejects missing books and books with nothing to export.
+    """
+    book = await db.get(Book, book_id)
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
     
-    chapters = db.query(Chapter).filter(
-        Chapter.book_id == book_id,
-        Chapter.status == "complete"
-    ).order_by(Chapter.chapter_number).all()
-    
+    chapters = await load_export_chapters(db, book_id)
     if not chapters:
         raise HTTPException(status_code=400, detail="No completed chapters to export")
     
-    # Build markdown content
-    markdown = f"# {book.title or book.book_idea}\n\n"
-    markdown += f"**Genre:** {book.genre}\n\n"
-    markdown += f"**Description:** {book.description or ''}\n\n"
-    markdown += "---\n\n"
+    return book, chapters
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches an ETag"""
+    if not if_none_match:
+        return False
+    candidates: List[str] = [value.strip() for value in if_none_match.split(",")]
+    return "*" in candidates or any(value.removeprefix("W/") == etag for value in candidates)
+
+
+def attachment_headers(filename: str) -> dict:
+    """Content-Disposition header for a downloaded export"""
+    return {"Content-Disposition": f'attachment; filename="{filename}"'}
+
+
+def serve_export(book: Book, chapters: Sequence, fmt: str, if_none_match: Optional[str]) -> Response:
+    """
+    Respond with the current version of an export
+    
+    Clients revalidating with If-None-Match get 304. A stored file is
+    sent as is; otherwise the export is streamed while being stored, so
+    memory use does not grow with the size of the book and the next
+    download is served from disk.
+    """
+    export = EXPORT_FORMATS[fmt]
+    version = export_version(book, chapters, fmt)
+    etag = f'"{version}"'
     
-    for chapter in chapters:
-        markdown += f"## {chapter.title}\n\n"
-        if chapter.content_markdown:
-            markdown += f"{chapter.content_markdown}\n\n"
-        markdown += "---\n\n"
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
     
-    # Return as file response
-    return Response(
-        content=markdown,
-        media_type="text/markdown",
-        headers={
-            "Content-Disposition": f'attachment; filename="{book.book_idea.replace(" ", "_")}.md"'
-        }
+    headers = {**attachment_headers(export_filename(book, fmt)), "ETag": etag}
+    
+    path = artifact_store.get(book.id, export.extension, version)
+    if path:
+        return FileResponse(path, media_type=export.media_type, headers=headers)
+    
+    return StreamingResponse(
+        artifact_store.tee(book.id, export.extension, version, export.render(book, chapters)),
+        media_type=export.media_type,
+        headers=headers
     )
 
 
+@router.get("/api/books/{book_id}/export/markdown")
+async def export_markdown(
+    book_id: int,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Export book as markdown file"""
+    
+    book, chapters = await get_exportable_book(db, book_id)
+    return serve_export(book, chapters, "markdown", if_none_match)
+
+
 @router.get("/api/books/{book_id}/export/html")
-async def export_html(book_id: int, db: Session = Depends(get_db)):
+async def export_html(
+    book_id: int,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
     """Export book as HTML file"""
     
-    book = db.query(Book).filter(Book.id == book_id).first()
-    if not book:
-        raise HTTPException(status_code=404, detail="Book not found")
-    
-    chapters = db.query(Chapter).filter(
-        Chapter.book_id == book_id,
-        Chapter.status == "complete"
-    ).order_by(Chapter.chapter_number).all()
-    
-    if not chapters:
-        raise HTTPException(status_code=400, detail="No completed chapters to export")
+    book, chapters = await get_exportable_book(db, book_id)
+    return serve_export(book, chapters, "html", if_none_match)
+
+
+@router.get("/api/books/{book_id}/export/epub")
+async def export_epub(
+    book_id: int,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Export book as EPUB 3"""
     
-    # Build HTML content
-    html = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="UTF-8">
-        <title>{book.book_idea}</title>
-        <style>
-            body {{
-                font-family: Arial, sans-serif;
-                max-width: 800px;
-                margin: 0 auto;
-                padding: 20px;
-                line-height: 1.6;
-            }}
-            h1 {{
-                color: #2c3e50;
-                border-bottom: 3px solid #3498db;
-                padding-bottom: 10px;
-            }}
-            h2 {{
-                color: #34495e;
-                margin-top: 30px;
-            }}
-        </style>
-    </head>
-    <body>
-        <h1>{book.book_idea}</h1>
-        <p><strong>Genre:</strong> {book.genre}</p>
-        <p>{book.description or ''}</p>
-        <hr>
+    book, chapters = await get_exportable_book(db, book_id)
+    return serve_export(book, chapters, "epub", if_none_match)
+
+
+@router.post("/api/exports/bulk")
+async def export_bulk(request: BulkExportRequest):
     """
+    Export several books as one zip archive
     
-    for chapter in chapters:
-        html += f"<h2>{chapter.title}</h2>\n"
-        if chapter.content_markdown:
-            # Simple markdown to HTML conversion
-            content = chapter.content_markdown.replace('\n', '<br>\n')
-            html += f"<div>{content}</div>\n"
-        html += "<hr>\n"
-    
-    html += "</body></html>"
+    Each book gets a folder with one file per requested format, followed
+    by a manifest.json listing the files and any skipped books. The
+    archive is streamed; poll the X-Export-Id for progress.
+    """
+    book_ids = list(dict.fromkeys(request.book_ids))
+    if len(book_ids) > settings.bulk_export_max_books:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.bulk_export_max_books} books can be exported at once"
+        )
+    formats = list(dict.fromkeys(fmt.value for fmt in request.formats))
     
-    return Response(
-        content=html,
-        media_type="text/html",
-        headers={
-            "Content-Disposition": f'attachment; filename="{book.book_idea.replace(" ", "_")}.html"'
-        }
+    export = bulk_exports.create(book_ids, formats)
+    return StreamingResponse(
+        export.stream(),
+        media_type="application/zip",
+        headers={**attachment_headers(f"books-{export.export_id[:8]}.zip"), "X-Export-Id": export.export_id}
     )
 
+
+@router.get("/api/exports/bulk/{export_id}", response_model=BulkExportProgress)
+async def get_bulk_export_progress(export_id: str):
+    """Progress of a bulk export"""
+    
+    export = bulk_exports.get(export_id)
+    if not export:
+        raise HTTPException(status_code=404, detail="Export not found")
+    
+    return export.snapshot()
@@ -2,74 +2,174 @@
 WebSocket routes for real-time updates
 """
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from typing import Dict
-import json
+from sqlalchemy import select
+from typing import List, Optional, Tuple
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.book import Book
+from app.models.chapter import Chapter
+from app.services.connection_manager import connection_manager, negotiate_encoding
+from app.services.event_bus import BookEvent, event_bus
+from app.services.event_coalescer import EventCoalescer, coalesce_events
+from app.services.event_log import event_log
+from app.services.generation_events import GenerationEvent, StageFinished, StageSkipped, generation_events
 import logging
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# Store active connections - maps book_id to list of WebSockets
-active_connections: Dict[int, list] = {}
-
 
 @router.websocket("/ws/books/{book_id}")
-async def websocket_endpoint(websocket: WebSocket, book_id: int):
-    """WebSocket endpoint for real-time book generation updates"""
+async def websocket_endpoint(websocket: WebSocket, book_id: int, since: Optional[int] = None):
+    """
+    WebSocket endpoint for real-time book generation updates
+    
+    Every book event carries a `seq`. Clients reconnecting with
+    `?since=<seq>` receive the events they missed; clients connecting
+    without it (or too far behind) receive a `snapshot` message first.
+    
+    Messages are JSON text unless the client offers the `bookforge.msgpack`
+    subprotocol, in which case they are binary msgpack frames.
+    """
     
-    await websocket.accept()
+    encoding, subprotocol = negotiate_encoding(websocket.scope.get('subprotocols', []))
+    await websocket.accept(subprotocol=subprotocol)
     
-    # Store connection
-    if book_id not in active_connections:
-        active_connections[book_id] = []
-    active_connections[book_id].append(websocket)
+    # Store connection; live events are buffered until the catch-up is queued
+    connection = connection_manager.connect(websocket, book_id, start=False, encoding=encoding)
     
     logger.info(f"WebSocket connected for book {book_id}")
     
     try:
+        messages, min_seq = await build_catch_up(book_id, since)
+        connection.prime(messages, min_seq)
+        connection.start()
+        
         while True:
             data = await websocket.receive_text()
-            # Echo back for now
-            await websocket.send_text(f"Echo: {data}")
-            
+            # Echo back for now (through the queue so sends never interleave)
+            connection.enqueue('echo', f"Echo: {data}")
+    
     except WebSocketDisconnect:
         logger.info(f"WebSocket disconnected for book {book_id}")
-        # Cleanup connection
-        if book_id in active_connections:
-            if websocket in active_connections[book_id]:
-                active_connections[book_id].remove(websocket)
-            # Remove entry if no connections left
-            if not active_connections[book_id]:
-                del active_connections[book_id]
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
+    finally:
         # Cleanup connection
-        if book_id in active_connections:
-            if websocket in active_connections[book_id]:
-                active_connections[book_id].remove(websocket)
-            # Remove entry if no connections left
-            if not active_connections[book_id]:
-                del active_connections[book_id]
+        await connection_manager.disconnect(connection)
+
+
+async def build_catch_up(book_id: int, since: Optional[int]) -> Tuple[List[Tuple[str, dict, Optional[int]]], int]:
+    """
+    Build the messages a newly connected client needs before live events
+    
+    Args:
+        book_id: Book ID
+        since: Last sequence number the client has seen, if resuming
+    
+    Returns:
+        Queue items and the sequence number they bring the client up to
+    """
+    if since is not None:
+        events = event_log.since(book_id, since)
+        if events is None:
+            events = await event_bus.replay(book_id, since)
+        if events is not None:
+            messages = [(event.type, event.to_message(), event.seq) for event in coalesce_events(events)]
+            return messages, max([since] + [e.seq for e in events])
+    
+    seq = event_log.last_seq(book_id)
+    snapshot = await build_book_snapshot(book_id)
+    return [('snapshot', {'type': 'snapshot', 'data': snapshot, 'seq': seq}, None)], seq
+
+
+async def build_book_snapshot(book_id: int) -> dict:
+    """Compact current state of a book: status, chapter statuses and agent statuses"""
+    
+    async with AsyncSessionLocal() as db:
+        book_status = (await db.execute(select(Book.status).where(Book.id == book_id))).scalar_one_or_none()
+        result = await db.execute(
+            select(Chapter.chapter_number, Chapter.title, Chapter.status)
+            .where(Chapter.book_id == book_id)
+            .order_by(Chapter.chapter_number)
+        )
+        chapters = [
+            {'chapter_number': number, 'title': title, 'status': status}
+            for number, title, status in result.all()
+        ]
+    
+    return {
+        'book_id': book_id,
+        'book_status': book_status,
+        'chapters': chapters,
+        'agents': event_log.agent_statuses(book_id),
+    }
 
 
 async def broadcast_to_book(book_id: int, message_type: str, data: dict):
-    """Broadcast message to all WebSocket connections for a book"""
+    """Broadcast message to all WebSocket connections for a book, in every worker"""
     
-    if book_id in active_connections:
-        message = {
-            'type': message_type,
-            'data': data
-        }
-        
-        disconnected = []
-        for websocket in active_connections[book_id]:
-            try:
-                await websocket.send_text(json.dumps(message))
-            except:
-                disconnected.append(websocket)
-        
-        # Remove disconnected sockets
-        for ws in disconnected:
-            active_connections[book_id].remove(ws)
+    await event_bus.publish(book_id, message_type, data)
+
+
+def send_to_connections(event: BookEvent):
+    """Send an event to this worker's WebSocket connections"""
+    
+    # Serialized once per encoding and enqueued; slow sockets are drained by their own writers
+    connection_manager.broadcast(event.book_id, event.type, event.to_message(), event.seq)
+
+
+# Merges bursts of agent_status / chapter_progress updates per book
+event_coalescer = EventCoalescer(send_to_connections, window=settings.ws_coalesce_window)
+
+
+def deliver_to_connections(event: BookEvent):
+    """Event bus handler: pass events for watched books through the coalescer"""
+    
+    if event.book_id in connection_manager.connections:
+        event_coalescer.push(event)
+
+
+event_bus.subscribe(deliver_to_connections)
+
+
+async def broadcast_generation_event(event: GenerationEvent):
+    """Generation event subscriber: turn stage events into agent status updates"""
+    
+    if event.book_id is None:
+        return
+    
+    if isinstance(event, StageSkipped):
+        await broadcast_to_book(event.book_id, 'stage_skipped', {
+            'stage': event.stage,
+            'agent_name': event.agent_name,
+            'chapter_id': event.chapter_id,
+            'reason': event.reason
+        })
+        return
+    
+    if not isinstance(event, StageFinished):
+        status, task = 'active', event.task
+    elif event.ok:
+        status, task = 'idle', None
+    else:
+        status, task = 'error', f"{event.task or event.stage} failed"
+    
+    await broadcast_to_book(event.book_id, 'agent_status', {
+        'agent_name': event.agent_name,
+        'status': status,
+        'current_task': task
+    })
+    
+    if isinstance(event, StageFinished):
+        await broadcast_to_book(event.book_id, 'stage_complete', {
+            'stage': event.stage,
+            'agent_name': event.agent_name,
+            'chapter_id': event.chapter_id,
+            'duration_ms': round(event.duration * 1000, 1),
+            'error': event.error
+        })
+
 
+generation_events.subscribe(broadcast_generation_event)
@@ -2,7 +2,7 @@
 Application configuration settings
 """
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, Optional
 
 
 class Settings(BaseSettings):
@@ -13,6 +13,13 @@ class Settings(BaseSettings):
     
     # Database
     database_url: str = "sqlite:///./bookforge.db"
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout: int = 30  # seconds
+    sqlite_busy_timeout: int = 5000  # milliseconds
+    sqlite_mmap_size: int = 268435456  # bytes (256 MB)
+    sqlite_cache_size: int = -65536  # negative = KiB (64 MB)
+    content_compression: str = "zstd"  # zstd, zlib or none; zstd falls back to zlib if unavailable
     
     # Server
     backend_url: str = "http://localhost:8000"
@@ -25,6 +32,62 @@ class Settings(BaseSettings):
     max_iterations: int = 5
     agent_timeout: int = 300  # seconds
     
+    # WebSocket
+    ws_send_queue_size: int = 100  # outbound messages buffered per connection
+    ws_send_timeout: float = 10.0  # seconds before a stuck send marks the client as dead
+    ws_coalesce_window: float = 0.05  # seconds to merge superseded status updates per book (0 disables)
+    sse_keepalive_interval: float = 15.0  # seconds between keep-alive comments on idle event streams
+    
+    # Event bus ("memory" for a single worker, "sqlite" to share events across --workers N)
+    event_bus_backend: str = "memory"
+    event_bus_path: str = "./bookforge_events.db"
+    event_bus_poll_interval: float = 0.1  # seconds
+    event_bus_retention: float = 3600.0  # seconds
+    event_log_size: int = 500  # recent events kept per book for reconnecting clients
+    
+    # Export
+    html_cache_max_bytes: int = 67108864  # rendered chapter HTML kept in memory (64 MB)
+    export_cache_path: str = "./export_cache"  # generated export files (markdown, HTML, EPUB)
+    export_prebuild_delay: float = 2.0  # seconds of quiet before stored exports are rebuilt; negative disables
+    bulk_export_max_books: int = 100  # books per bulk export request
+    bulk_export_history: int = 100  # bulk exports whose progress can still be polled
+    
+    # Quality gate (skips the content and editor LLM passes for drafts that do not need them)
+    quality_gate_enabled: bool = True
+    quality_min_word_ratio: float = 0.9  # share of words_per_chapter below which content is enhanced
+    quality_min_sections: int = 3  # ## sections below which content is enhanced
+    quality_min_reading_ease: float = 30.0  # Flesch reading ease below which the editor runs
+    quality_max_words_per_sentence: float = 30.0
+    quality_max_list_density: float = 0.5  # share of lines that are list items
+    
+    # Editor pass: "operations" (find/replace edits applied locally, full rewrite as fallback) or "rewrite"
+    editor_mode: str = "operations"
+    editor_section_words: int = 1200  # longer chapters are edited in parallel parts of about this size; 0 disables
+    llm_concurrency: int = 4  # concurrent LLM requests across all generations
+    
+    # Book memory (summaries, terms and facts of earlier chapters in chapter prompts)
+    book_memory_tokens: int = 800  # budget for the earlier-chapters context, flat however long the book is
+    book_memory_summary_tokens: int = 120  # summary kept per chapter
+    
+    # Context packing: token budget for the context in each prompt (outline, book memory, research, concept)
+    context_budgets: Dict[str, int] = {
+        "chapter": 1500,  # chapter generation
+        "writing": 1500,  # orchestrator writing stage
+        "introduction": 200,  # refined concept in the introduction prompt
+        "outline": 120,  # refined concept in the outline prompt
+        "preamble": 6000,  # book concept (up to 2000) and research digest in the book preamble shared by every chapter prompt
+        "section": 1200,  # neighbouring sections and outline when regenerating one section
+    }
+    
+    # Book preambles are sent as a system instruction, cached by Gemini when long enough
+    prompt_cache_enabled: bool = True
+    prompt_cache_ttl: int = 600  # seconds a cached preamble lives; it is recreated on the next call after that
+    prompt_cache_min_tokens: int = 4096  # shorter preambles are sent inline (Gemini's caching minimum); books need a few thousand tokens of research to reach it
+    
+    # Research
+    research_concurrency: int = 4  # parallel web searches across all chapters
+    chapter_research_results: int = 5  # results per chapter query
+    
     class Config:
         env_file = ".env"
         case_sensitive = False
@@ -1,19 +1,155 @@
 """
 Database configuration and session management
 """
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.core.config import settings
 
-# Create database engine
-engine = create_engine(
-    settings.database_url,
-    connect_args={"check_same_thread": False}  # Needed for SQLite
-)
 
-# Create session factory
+def is_sqlite_url(database_url: str) -> bool:
+    """Check whether a database URL points at SQLite"""
+    return database_url.startswith("sqlite")
+
+
+def is_sqlite_memory_url(database_url: str) -> bool:
+    """Check whether a database URL points at an in-memory SQLite database"""
+    return database_url in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in database_url
+
+
+def _reject_sqlite_memory_url(database_url: str):
+    """
+    Refuse in-memory SQLite URLs
+
+    Each connection to an in-memory database gets its own empty database,
+    so the background writer thread, request threads and the aiosqlite
+    engine would never see each other's data.
+
+    Raises:
+        ValueError: If the URL points at an in-memory database
+    """
+    if is_sqlite_memory_url(database_url):
+        raise ValueError(
+            f"In-memory SQLite databases are not supported ({database_url}); "
+            "use a file path such as sqlite:///./bookforge.db"
+        )
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """Apply performance pragmas to every new SQLite connection"""
+    cursor = dbapi_connection.cursor()
+    try:
+        # WAL lets readers proceed while a writer is active
+        cursor.execute("PRAGMA journal_mode=WAL")
+        # NORMAL is durable across application crashes in WAL mode
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout)}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+        cursor.execute(f"PRAGMA cache_size={int(settings.sqlite_cache_size)}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+    finally:
+        cursor.close()
+
+
+def create_db_engine(database_url: str = settings.database_url) -> Engine:
+    """
+    Create a database engine tuned for concurrent readers and writers
+
+    SQLite file databases get WAL mode, relaxed fsync, a busy timeout and
+    larger page/mmap caches on every connection, plus a sized connection pool.
+
+    Args:
+        database_url: SQLAlchemy database URL
+
+    Returns:
+        Configured SQLAlchemy engine
+
+    Raises:
+        ValueError: If the URL points at an in-memory SQLite database
+    """
+    if not is_sqlite_url(database_url):
+        return create_engine(
+            database_url,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+            pool_pre_ping=True,
+        )
+
+    _reject_sqlite_memory_url(database_url)
+
+    sqlite_engine = create_engine(
+        database_url,
+        connect_args={
+            "check_same_thread": False,  # Needed for SQLite
+            "timeout": settings.sqlite_busy_timeout / 1000,
+        },
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+    )
+    event.listen(sqlite_engine, "connect", _apply_sqlite_pragmas)
+    return sqlite_engine
+
+
+def to_async_url(database_url: str) -> str:
+    """Map a sync database URL to its async driver equivalent"""
+    if database_url.startswith("sqlite:"):
+        return database_url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    if database_url.startswith("postgresql:"):
+        return database_url.replace("postgresql:", "postgresql+asyncpg:", 1)
+    return database_url
+
+
+def create_async_db_engine(database_url: str = settings.database_url) -> AsyncEngine:
+    """
+    Create an async database engine with the same tuning as create_db_engine
+
+    Args:
+        database_url: Sync SQLAlchemy database URL; the async driver is chosen from it
+
+    Returns:
+        Configured async SQLAlchemy engine
+
+    Raises:
+        ValueError: If the URL points at an in-memory SQLite database
+    """
+    async_url = to_async_url(database_url)
+
+    if not is_sqlite_url(database_url):
+        return create_async_engine(
+            async_url,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+            pool_pre_ping=True,
+        )
+
+    _reject_sqlite_memory_url(database_url)
+
+    sqlite_engine = create_async_engine(
+        async_url,
+        connect_args={"timeout": settings.sqlite_busy_timeout / 1000},
+        # aiosqlite defaults to NullPool; keep connections (and their pragmas) warm
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+    )
+    event.listen(sqlite_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+    return sqlite_engine
+
+
+# Create database engines
+engine = create_db_engine(settings.database_url)
+async_engine = create_async_db_engine(settings.database_url)
+
+# Create session factories
 SessionLocal = sessionmaker(autocommit=False, autoflush=True, bind=engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=True, expire_on_commit=False)
 
 # Base class for models
 Base = declarative_base()
@@ -30,9 +166,16 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    """
+    Dependency for getting an async database session
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 def init_db():
     """
     Initialize database tables
     """
     Base.metadata.create_all(bind=engine)
-
@@ -0,0 +1,129 @@
+"""
+Single-writer queue for serialized database updates
+"""
+import asyncio
+import logging
+import queue
+import threading
+from typing import Any, Callable, Optional
+from sqlalchemy.orm import Session
+from app.core.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseWriter:
+    """
+    Runs database writes one at a time on a dedicated thread
+
+    SQLite allows a single writer at a time. Funnelling frequent status and
+    content updates from background generation tasks through one connection
+    avoids "database is locked" errors and keeps request handlers free to read.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal):
+        self._session_factory = session_factory
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the writer thread if it is not running"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Flush pending writes and stop the writer thread"""
+        with self._lock:
+            if not self._thread:
+                return
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+    async def submit(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Queue a write and wait for it to be committed
+
+        Args:
+            fn: Callable taking a Session as first argument
+            *args: Extra positional arguments for fn
+            **kwargs: Extra keyword arguments for fn
+
+        Returns:
+            Return value of fn
+        """
+        self.start()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.put((fn, args, kwargs, loop, future))
+        return await future
+
+    async def update(self, model, row_id: int, **values) -> int:
+        """
+        Queue an UPDATE of a single row by primary key
+
+        Args:
+            model: SQLAlchemy model class
+            row_id: Primary key of the row
+            **values: Column values to set
+
+        Returns:
+            Number of rows updated
+        """
+        return await self.submit(_update_by_id, model, row_id, values)
+
+    def _run(self):
+        """Writer loop: apply queued writes in order, one commit per write"""
+        session = self._session_factory()
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+
+                fn, args, kwargs, loop, future = item
+                try:
+                    result = fn(session, *args, **kwargs)
+                    session.commit()
+                except Exception as e:
+                    session.rollback()
+                    logger.error(f"Queued database write failed: {e}", exc_info=True)
+                    _resolve(loop, future, exception=e)
+                else:
+                    _resolve(loop, future, result=result)
+                finally:
+                    # Do not hand stale identity-map state to the next write
+                    session.expunge_all()
+        finally:
+            session.close()
+
+
+def _update_by_id(session: Session, model, row_id: int, values: dict) -> int:
+    """Update a single row without loading it"""
+    return session.query(model).filter(model.id == row_id).update(values, synchronize_session=False)
+
+
+def _resolve(loop: asyncio.AbstractEventLoop, future: asyncio.Future, result: Any = None, exception: Optional[Exception] = None):
+    """Complete an asyncio future from the writer thread"""
+
+    def _set():
+        if future.done():
+            return
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+
+    try:
+        loop.call_soon_threadsafe(_set)
+    except RuntimeError:
+        # The submitting event loop has already closed
+        pass
+
+
+# Global instance
+db_writer = DatabaseWriter()
@@ -1,6 +1,7 @@
 """
 LLM configuration for AutoGen agents
 """
+import asyncio
 import google.generativeai as genai
 from app.core.config import settings
 import logging
@@ -10,6 +11,9 @@ logger = logging.getLogger(__name__)
 # Configure Gemini API
 genai.configure(api_key=settings.gemini_api_key)
 
+# Shared limit for concurrent LLM requests across every caller
+llm_rate_limit = asyncio.Semaphore(settings.llm_concurrency)
+
 # Create LLM configuration for AutoGen
 def get_llm_config(model_name: str = "gemini-2.0-flash"):
     """
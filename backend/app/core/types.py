@@ -0,0 +1,95 @@
+"""
+Custom SQLAlchemy column types
+"""
+import zlib
+from typing import Optional
+from sqlalchemy.types import LargeBinary, TypeDecorator
+from app.core.config import settings
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+# One-byte codec tag stored in front of every value
+CODEC_RAW = b"r"
+CODEC_ZLIB = b"z"
+CODEC_ZSTD = b"s"
+
+# Values shorter than this are stored uncompressed
+MIN_COMPRESS_BYTES = 256
+
+
+def compress_text(value: str, codec: Optional[str] = None) -> bytes:
+    """
+    Encode text with a codec tag, compressing it when worthwhile
+
+    Args:
+        value: Text to store
+        codec: "zstd", "zlib" or "none"; defaults to settings.content_compression
+
+    Returns:
+        Tagged bytes
+    """
+    codec = codec or settings.content_compression
+    data = value.encode("utf-8")
+
+    if len(data) < MIN_COMPRESS_BYTES or codec == "none":
+        return CODEC_RAW + data
+    if codec == "zstd" and zstandard is not None:
+        return CODEC_ZSTD + zstandard.ZstdCompressor(level=3).compress(data)
+    return CODEC_ZLIB + zlib.compress(data, 6)
+
+
+def decompress_text(value) -> str:
+    """
+    Decode a value written by compress_text
+
+    Plain strings (rows written before compression was enabled) are
+    returned unchanged.
+
+    Args:
+        value: Tagged bytes or legacy text
+
+    Returns:
+        Original text
+    """
+    if isinstance(value, str):
+        return value
+
+    value = bytes(value)
+    tag, payload = value[:1], value[1:]
+    if tag == CODEC_RAW:
+        return payload.decode("utf-8")
+    if tag == CODEC_ZLIB:
+        return zlib.decompress(payload).decode("utf-8")
+    if tag == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd-compressed content")
+        return zstandard.ZstdDecompressor().decompress(payload).decode("utf-8")
+
+    # Untagged bytes: legacy text stored in a BLOB column
+    return value.decode("utf-8")
+
+
+class CompressedText(TypeDecorator):
+    """
+    Text column stored compressed at rest
+
+    Values are compressed with zstd (or zlib when zstandard is not
+    installed) on write and decompressed on read. Combine with deferred()
+    so the cost is only paid when the column is actually loaded.
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return compress_text(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return decompress_text(value)
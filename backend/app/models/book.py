@@ -29,4 +29,5 @@ class Book(Base):
     chapters = relationship("Chapter", back_populates="book", cascade="all, delete-orphan")
     sources = relationship("Source", back_populates="book", cascade="all, delete-orphan")
     agent_logs = relationship("AgentLog", back_populates="book", cascade="all, delete-orphan")
+    memories = relationship("ChapterMemory", back_populates="book", cascade="all, delete-orphan")
 
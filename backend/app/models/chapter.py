@@ -1,21 +1,30 @@
 """
 Chapter model
 """
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy.sql import func
 from app.core.database import Base
+from app.core.types import CompressedText
 
 
 class Chapter(Base):
     __tablename__ = "chapters"
+    __table_args__ = (
+        # Chapter lookups by position and status aggregation per book
+        Index("ix_chapters_book_id_chapter_number", "book_id", "chapter_number", unique=True),
+        Index("ix_chapters_book_id_status", "book_id", "status"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     book_id = Column(Integer, ForeignKey("books.id"), nullable=False)
     chapter_number = Column(Integer, nullable=False)
     title = Column(String, nullable=True)
-    outline = Column(Text, nullable=True)
-    content_markdown = Column(Text, nullable=True)
+    # Large text columns are only loaded on request (undefer_group("body"))
+    outline = deferred(Column(Text, nullable=True), group="body")
+    content_markdown = deferred(Column(CompressedText, nullable=True), group="body")
+    # SHA-256 of content_markdown, keys rendered-HTML caches without reading the body
+    content_hash = Column(String(64), nullable=True)
     status = Column(String, default="pending")  # pending, generating, complete, failed
     word_count = Column(Integer, default=0)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -25,4 +34,5 @@ class Chapter(Base):
     book = relationship("Book", back_populates="chapters")
     sources = relationship("Source", back_populates="chapter")
     agent_logs = relationship("AgentLog", back_populates="chapter")
+    memory = relationship("ChapterMemory", back_populates="chapter", uselist=False, cascade="all, delete-orphan")
 
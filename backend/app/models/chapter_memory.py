@@ -0,0 +1,31 @@
+"""
+Chapter memory model: what later chapters need to know about a chapter
+"""
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON, Index
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class ChapterMemory(Base):
+    __tablename__ = "chapter_memories"
+    __table_args__ = (
+        # Memories of the chapters before a given one, in book order
+        Index("ix_chapter_memories_book_id_chapter_number", "book_id", "chapter_number"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    book_id = Column(Integer, ForeignKey("books.id"), nullable=False)
+    chapter_id = Column(Integer, ForeignKey("chapters.id"), nullable=False, unique=True)
+    chapter_number = Column(Integer, nullable=False)
+    title = Column(String, nullable=True)
+    # content_hash of the chapter text this memory was extracted from
+    content_hash = Column(String(64), nullable=True)
+    summary = Column(Text, nullable=True)
+    terms = Column(JSON, nullable=True)  # [{"term": ..., "definition": ...}]
+    facts = Column(JSON, nullable=True)  # ["sentence", ...]
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    # Relationships
+    book = relationship("Book", back_populates="memories")
+    chapter = relationship("Chapter", back_populates="memory")
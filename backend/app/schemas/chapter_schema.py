@@ -1,7 +1,7 @@
 """
 Pydantic schemas for Chapter model
 """
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List
 from datetime import datetime
 
@@ -37,3 +37,23 @@ class ChapterUpdate(BaseModel):
     content_markdown: Optional[str] = None
     outline: Optional[str] = None
 
+
+
+class SectionRegenerate(BaseModel):
+    """Schema for regenerating one heading-delimited section of a chapter"""
+    # Position among the chapter's sections (0 is any text before the first heading) ...
+    section: Optional[int] = Field(None, ge=0)
+    # ... or the section's heading text
+    heading: Optional[str] = None
+    instructions: str = Field(..., min_length=1)
+
+
+class SectionRegenerateResponse(BaseModel):
+    """Schema for a regenerated section"""
+    chapter_number: int
+    section: int
+    heading: Optional[str]
+    section_words: int
+    word_count: int
+    prompt_tokens: int
+    output_tokens: int
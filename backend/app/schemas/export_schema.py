@@ -0,0 +1,31 @@
+"""
+Pydantic schemas for exports
+"""
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
+from enum import Enum
+
+
+class ExportFormatEnum(str, Enum):
+    """Export formats"""
+    MARKDOWN = "markdown"
+    HTML = "html"
+    EPUB = "epub"
+
+
+class BulkExportRequest(BaseModel):
+    """Books and formats to export as one archive"""
+    book_ids: List[int] = Field(..., min_length=1, description="Books to export, in archive order")
+    formats: List[ExportFormatEnum] = Field(default=[ExportFormatEnum.MARKDOWN], min_length=1, description="Formats per book")
+
+
+class BulkExportProgress(BaseModel):
+    """Progress of a bulk export"""
+    export_id: str
+    status: str  # running, complete, failed
+    total: int
+    completed: int
+    bytes_sent: int
+    current_book_id: Optional[int] = None
+    skipped: Dict[int, str] = {}
+    error: Optional[str] = None
@@ -0,0 +1,96 @@
+"""
+On-disk store of generated export files
+"""
+import asyncio
+import os
+import shutil
+import uuid
+from typing import AsyncIterator, Optional, Set, Union
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ArtifactStore:
+    """
+    Export files keyed by book, format and content version
+    
+    A file is only visible once completely written, so readers never see
+    a partial artifact; older versions of the same book and format are
+    removed when a new one lands.
+    """
+    
+    def __init__(self, root: str):
+        self.root = root
+    
+    def path(self, book_id: int, fmt: str, version: str) -> str:
+        """Location of an artifact"""
+        return os.path.join(self.root, f"book-{book_id}", f"{version}.{fmt}")
+    
+    def get(self, book_id: int, fmt: str, version: str) -> Optional[str]:
+        """Path of a stored artifact, or None if this version was not stored"""
+        path = self.path(book_id, fmt, version)
+        return path if os.path.isfile(path) else None
+    
+    def extensions(self, book_id: int) -> Set[str]:
+        """Formats (file extensions) stored for a book"""
+        directory = os.path.join(self.root, f"book-{book_id}")
+        if not os.path.isdir(directory):
+            return set()
+        return {
+            name.rsplit(".", 1)[-1] for name in os.listdir(directory)
+            if "." in name and not name.endswith(".tmp")
+        }
+    
+    def remove(self, book_id: int):
+        """Delete every artifact of a book"""
+        shutil.rmtree(os.path.join(self.root, f"book-{book_id}"), ignore_errors=True)
+    
+    async def tee(
+        self,
+        book_id: int,
+        fmt: str,
+        version: str,
+        chunks: AsyncIterator[Union[str, bytes]]
+    ) -> AsyncIterator[bytes]:
+        """
+        Pass chunks through while saving them as an artifact
+        
+        The artifact is kept only if the stream completes; an interrupted
+        download leaves nothing behind.
+        """
+        path = self.path(book_id, fmt, version)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        complete = False
+        
+        with open(temp_path, "wb") as file:
+            try:
+                async for chunk in chunks:
+                    data = chunk.encode("utf-8") if isinstance(chunk, str) else chunk
+                    await asyncio.to_thread(file.write, data)
+                    yield data
+                complete = True
+            finally:
+                file.close()
+                if complete:
+                    os.replace(temp_path, path)
+                    self._remove_stale(book_id, fmt, keep=path)
+                else:
+                    os.remove(temp_path)
+    
+    def _remove_stale(self, book_id: int, fmt: str, keep: str):
+        """Delete other versions of an artifact"""
+        directory = os.path.dirname(keep)
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if name.endswith(f".{fmt}") and path != keep:
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    logger.warning(f"Could not remove stale artifact {path}: {e}")
+
+
+# Global instance
+artifact_store = ArtifactStore(settings.export_cache_path)
@@ -0,0 +1,434 @@
+"""
+Book export rendering (markdown, HTML, EPUB) and background prebuilding
+"""
+import asyncio
+import hashlib
+import json
+import re
+from typing import AsyncIterator, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.book import Book
+from app.models.chapter import Chapter
+from app.services.artifact_store import artifact_store
+from app.services.epub_builder import (
+    CONTAINER_XML, EPUB_MEDIA_TYPE, STYLESHEET, EpubChapter,
+    chapter_xhtml, nav_xhtml, package_opf, toc_ncx
+)
+from app.services.markdown_renderer import html_cache
+from app.utils.streaming_zip import StreamingZip
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Chapters fetched per round trip while streaming an export
+EXPORT_BATCH_SIZE = 4
+
+# Bump when the EPUB layout changes so stored files are not reused
+EPUB_LAYOUT_VERSION = 1
+
+# Characters kept in download and archive entry names
+UNSAFE_FILENAME_CHARS = re.compile(r"[^\w.-]+")
+DOT_RUN = re.compile(r"\.{2,}")
+MAX_FILENAME_LENGTH = 100
+
+HTML_HEADER = """
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <meta charset="UTF-8">
+        <title>{title}</title>
+        <style>
+            body {{
+                font-family: Arial, sans-serif;
+                max-width: 800px;
+                margin: 0 auto;
+                padding: 20px;
+                line-height: 1.6;
+            }}
+            h1 {{
+                color: #2c3e50;
+                border-bottom: 3px solid #3498db;
+                padding-bottom: 10px;
+            }}
+            h2 {{
+                color: #34495e;
+                margin-top: 30px;
+            }}
+            table {{
+                border-collapse: collapse;
+            }}
+            th, td {{
+                border: 1px solid #ddd;
+                padding: 6px 10px;
+            }}
+            pre {{
+                background: #f6f8fa;
+                padding: 12px;
+                overflow-x: auto;
+            }}
+        </style>
+    </head>
+    <body>
+        <h1>{title}</h1>
+        <p><strong>Genre:</strong> {genre}</p>
+        <p>{description}</p>
+        <hr>
+    """
+
+
+async def load_export_chapters(db: AsyncSession, book_id: int) -> list:
+    """
+    Metadata of a book's completed chapters, in reading order
+    
+    Rows carry id, chapter_number, title, content_hash and timestamps;
+    bodies are streamed later.
+    """
+    result = await db.execute(
+        select(Chapter.id, Chapter.chapter_number, Chapter.title, Chapter.content_hash,
+               Chapter.created_at, Chapter.updated_at)
+        .where(Chapter.book_id == book_id, Chapter.status == "complete")
+        .order_by(Chapter.chapter_number)
+    )
+    return result.all()
+
+
+async def load_export_batch(db: AsyncSession, book_ids: Sequence[int]) -> Tuple[Dict[int, Book], Dict[int, list]]:
+    """
+    Books and their completed chapters' metadata for several books at once
+    
+    Two queries regardless of the number of books.
+    
+    Returns:
+        (books by id, chapter rows by book id in reading order)
+    """
+    result = await db.execute(select(Book).where(Book.id.in_(book_ids)))
+    books = {book.id: book for book in result.scalars()}
+    
+    result = await db.execute(
+        select(Chapter.book_id, Chapter.id, Chapter.chapter_number, Chapter.title, Chapter.content_hash,
+               Chapter.created_at, Chapter.updated_at)
+        .where(Chapter.book_id.in_(book_ids), Chapter.status == "complete")
+        .order_by(Chapter.book_id, Chapter.chapter_number)
+    )
+    chapters: Dict[int, list] = {}
+    for row in result.all():
+        chapters.setdefault(row.book_id, []).append(row)
+    return books, chapters
+
+
+class ExportChangedError(RuntimeError):
+    """Chapters changed after the export's version was computed"""
+
+
+async def iter_chapter_contents(chapters: Sequence, batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[Tuple[object, Optional[str]]]:
+    """
+    Stream the bodies of exactly the given chapters, in their order
+    
+    One query for the listed chapter ids, fetched `batch_size` rows at a
+    time so only a few bodies are in memory at once. Each row's content
+    hash must still be the one the export version was computed from, so
+    what is streamed (and stored under that version) is what the version
+    describes. Uses its own session because the response body is produced
+    after the request's session has been closed.
+    
+    Args:
+        chapters: Rows from load_export_chapters
+    
+    Returns:
+        (chapter row, content markdown)
+    
+    Raises:
+        ExportChangedError: A chapter was edited, regenerated or deleted
+            since `chapters` was read
+    """
+    if not chapters:
+        return
+    
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(
+            select(Chapter.id, Chapter.content_hash, Chapter.content_markdown)
+            .where(Chapter.id.in_([chapter.id for chapter in chapters]), Chapter.status == "complete")
+            .order_by(Chapter.chapter_number)
+            .execution_options(yield_per=batch_size)
+        )
+        try:
+            rows = aiter(result)
+            for chapter in chapters:
+                row = await anext(rows, None)
+                if row is None or row.id != chapter.id or row.content_hash != chapter.content_hash:
+                    raise ExportChangedError(f"Chapter {chapter.id} changed while exporting")
+                yield chapter, row.content_markdown
+        finally:
+            await result.close()
+
+
+async def iter_chapter_fragments(chapters: Sequence) -> AsyncIterator[Tuple[object, Optional[str]]]:
+    """
+    Rendered HTML of each chapter, in order
+    
+    Chapters whose rendered HTML is cached for their content hash are
+    emitted without reading their text; only the others are loaded (see
+    iter_chapter_contents) and rendered, which also fills the cache.
+    
+    Args:
+        chapters: Rows from load_export_chapters
+    
+    Returns:
+        (chapter row, HTML fragment or None if the chapter has no content)
+    
+    Raises:
+        ExportChangedError: A chapter that had to be rendered changed since
+            `chapters` was read
+    """
+    fragments = [html_cache.get(chapter.id, chapter.content_hash) for chapter in chapters]
+    missing = [chapter for chapter, fragment in zip(chapters, fragments) if fragment is None]
+    contents = iter_chapter_contents(missing)
+    
+    try:
+        for chapter, fragment in zip(chapters, fragments):
+            if fragment is None:
+                _, content = await anext(contents)
+                if content:
+                    # Rendering is CPU-bound; keep it off the event loop. The
+                    # fragment is cached under the hash of the text rendered.
+                    fragment = await asyncio.to_thread(html_cache.render, chapter.id, content)
+            yield chapter, fragment
+    finally:
+        await contents.aclose()
+
+
+async def render_markdown(book: Book, chapters: Sequence) -> AsyncIterator[str]:
+    """Markdown export, one chunk per chapter"""
+    yield (
+        f"# {book.title or book.book_idea}\n\n"
+        f"**Genre:** {book.genre}\n\n"
+        f"**Description:** {book.description or ''}\n\n"
+        "---\n\n"
+    )
+    
+    async for chapter, content in iter_chapter_contents(chapters):
+        if content:
+            yield f"## {chapter.title}\n\n{content}\n\n---\n\n"
+        else:
+            yield f"## {chapter.title}\n\n---\n\n"
+
+
+async def render_html(book: Book, chapters: Sequence) -> AsyncIterator[str]:
+    """HTML export, one chunk per chapter"""
+    yield HTML_HEADER.format(title=book.book_idea, genre=book.genre, description=book.description or '')
+    
+    async for chapter, fragment in iter_chapter_fragments(chapters):
+        chunk = f"<h2>{chapter.title}</h2>\n"
+        if fragment:
+            chunk += f"<div>{fragment}</div>\n"
+        yield chunk + "<hr>\n"
+    
+    yield "</body></html>"
+
+
+async def render_epub(book: Book, chapters: Sequence) -> AsyncIterator[bytes]:
+    """
+    EPUB 3 export as a zip stream, one chunk per archive entry
+    
+    Package documents go first (they only need chapter titles); chapter
+    files follow as they are rendered, so at most one chapter is held in
+    memory.
+    """
+    title = book.title or book.book_idea
+    entries = [
+        EpubChapter(chapter.chapter_number, chapter.title or f"Chapter {chapter.chapter_number}")
+        for chapter in chapters
+    ]
+    timestamps = [book.updated_at, book.created_at] + [c.updated_at or c.created_at for c in chapters]
+    modified = max((t for t in timestamps if t is not None), default=None)
+    
+    archive = StreamingZip()
+    # The mimetype entry must come first and be stored uncompressed
+    yield archive.write("mimetype", EPUB_MEDIA_TYPE, compress=False)
+    yield archive.write("META-INF/container.xml", CONTAINER_XML)
+    yield archive.write("OEBPS/content.opf", package_opf(
+        book.id, title, entries, modified=modified, description=book.description, subject=book.genre
+    ))
+    yield archive.write("OEBPS/nav.xhtml", nav_xhtml(title, entries))
+    yield archive.write("OEBPS/toc.ncx", toc_ncx(book.id, title, entries))
+    yield archive.write("OEBPS/style.css", STYLESHEET)
+    
+    index = 0
+    async for _, fragment in iter_chapter_fragments(chapters):
+        entry = entries[index]
+        index += 1
+        yield archive.write(f"OEBPS/{entry.href}", chapter_xhtml(entry, fragment))
+    
+    yield archive.close()
+
+
+class ExportFormat(NamedTuple):
+    """How one export format is rendered, stored and served"""
+    extension: str
+    media_type: str
+    render: Callable[[Book, Sequence], AsyncIterator]
+    layout_version: int = 0
+
+
+EXPORT_FORMATS: Dict[str, ExportFormat] = {
+    "markdown": ExportFormat("md", "text/markdown", render_markdown),
+    "html": ExportFormat("html", "text/html", render_html),
+    "epub": ExportFormat("epub", EPUB_MEDIA_TYPE, render_epub, EPUB_LAYOUT_VERSION),
+}
+
+
+def export_version(book: Book, chapters: Sequence, fmt: str) -> str:
+    """
+    Content version of an export, used as its ETag and artifact key
+    
+    Derived from the book fields and each chapter's title and content
+    hash, so it changes exactly when the exported content would.
+    """
+    key = json.dumps([
+        fmt, EXPORT_FORMATS[fmt].layout_version, book.id, book.title, book.book_idea, book.genre,
+        book.description, [(c.id, c.chapter_number, c.title, c.content_hash) for c in chapters]
+    ], default=str)
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+
+def safe_filename(name: str, default: str = "book") -> str:
+    """
+    A plain file name derived from user text
+    
+    Keeps letters, digits, "_", "-" and single dots, so the result cannot
+    name a directory, a parent directory or a hidden file (book titles end
+    up in zip entry names and Content-Disposition headers).
+    """
+    name = DOT_RUN.sub(".", UNSAFE_FILENAME_CHARS.sub("_", name or ""))
+    return name.strip("._-")[:MAX_FILENAME_LENGTH].rstrip("._-") or default
+
+
+def export_filename(book: Book, fmt: str) -> str:
+    """File name of a downloaded export"""
+    return f'{safe_filename(book.book_idea)}.{EXPORT_FORMATS[fmt].extension}'
+
+
+async def iter_export(book: Book, chapters: Sequence, fmt: str, chunk_size: int = 65536) -> AsyncIterator[bytes]:
+    """
+    Bytes of the current version of an export
+    
+    Read from the artifact store when stored, otherwise rendered and
+    stored on the way through.
+    """
+    export = EXPORT_FORMATS[fmt]
+    version = export_version(book, chapters, fmt)
+    path = artifact_store.get(book.id, export.extension, version)
+    if path is None:
+        async for chunk in artifact_store.tee(book.id, export.extension, version, export.render(book, chapters)):
+            yield chunk
+        return
+    
+    with open(path, "rb") as file:
+        while True:
+            chunk = await asyncio.to_thread(file.read, chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+async def build_export(book: Book, chapters: Sequence, fmt: str) -> Optional[str]:
+    """
+    Store the current version of an export unless it is already stored
+    
+    Returns:
+        Path of the stored artifact
+    """
+    export = EXPORT_FORMATS[fmt]
+    version = export_version(book, chapters, fmt)
+    path = artifact_store.get(book.id, export.extension, version)
+    if path:
+        return path
+    
+    async for _ in artifact_store.tee(book.id, export.extension, version, export.render(book, chapters)):
+        pass
+    return artifact_store.get(book.id, export.extension, version)
+
+
+class ExportPrebuilder:
+    """
+    Rebuilds a book's stored exports in the background after its chapters
+    change
+    
+    Changes are debounced per book, so a burst of chapter edits (or a
+    generate-all run) causes one rebuild. Only formats that have been
+    downloaded before are rebuilt; the others are built on first request.
+    """
+    
+    def __init__(self, delay: float = 2.0):
+        self.delay = delay
+        self._tasks: Dict[int, asyncio.Task] = {}
+    
+    def schedule(self, book_id: int):
+        """Rebuild a book's exports once it has been quiet for `delay` seconds"""
+        if self.delay < 0:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        
+        task = self._tasks.get(book_id)
+        if task is not None and not task.done():
+            task.cancel()
+        self._tasks[book_id] = loop.create_task(self._rebuild_later(book_id))
+    
+    def cancel(self, book_id: int):
+        """Drop a pending rebuild, e.g. when the book is deleted"""
+        task = self._tasks.pop(book_id, None)
+        if task is not None and not task.done():
+            task.cancel()
+    
+    async def _rebuild_later(self, book_id: int):
+        try:
+            await asyncio.sleep(self.delay)
+            await self.rebuild(book_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error prebuilding exports for book {book_id}: {e}", exc_info=True)
+        finally:
+            if self._tasks.get(book_id) is asyncio.current_task():
+                del self._tasks[book_id]
+    
+    async def rebuild(self, book_id: int) -> List[str]:
+        """
+        Store the current version of every previously stored format
+        
+        Returns:
+            Formats that were checked
+        """
+        stored = artifact_store.extensions(book_id)
+        formats = [fmt for fmt, export in EXPORT_FORMATS.items() if export.extension in stored]
+        if not formats:
+            return []
+        
+        async with AsyncSessionLocal() as db:
+            book = await db.get(Book, book_id)
+            chapters = await load_export_chapters(db, book_id) if book else []
+        if not chapters:
+            return []
+        
+        for fmt in formats:
+            await build_export(book, chapters, fmt)
+        logger.info(f"Prebuilt exports {formats} for book {book_id}")
+        return formats
+    
+    async def stop(self):
+        """Cancel pending rebuilds"""
+        tasks = [task for task in self._tasks.values() if not task.done()]
+        self._tasks.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# Global instance
+export_prebuilder = ExportPrebuilder(delay=settings.export_prebuild_delay)
@@ -0,0 +1,297 @@
+"""
+Book memory - what later chapters need to know about earlier ones
+
+Each completed chapter is reduced to a short summary, the terms it defines
+and the facts it states. Chapter prompts get a packed view of the memories
+of the chapters before them, bounded by a token budget, so prompt size
+stays flat however long the book grows. No LLM needed - extraction is
+text processing over the chapter markdown.
+"""
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.db_writer import db_writer
+from app.models.chapter_memory import ChapterMemory
+from app.services.context_packer import count_tokens, split_sentences
+from app.services.markdown_renderer import content_hash
+from app.utils.markdown_sections import split_sections
+
+logger = logging.getLogger(__name__)
+
+CODE_FENCE = re.compile(r" {0,3}(?:```|~~~)")
+HEADING = re.compile(r"#{1,6}\s")
+LIST_MARKER = re.compile(r"\s*(?:\d+[.)]|[-*+])\s+")
+BOLD_TERM = re.compile(r"\*\*([^*\n]{2,60}?)\*\*")
+LINK = re.compile(r"!?\[([^\]]*)\]\([^)]*\)")
+EMPHASIS = re.compile(r"(\*\*|__|\*|_|`)")
+NUMBER = re.compile(r"\b\d")
+
+# Per chapter limits on what is kept
+MAX_TERMS_PER_CHAPTER = 12
+MAX_FACTS_PER_CHAPTER = 8
+MAX_DEFINITION_WORDS = 40
+MIN_FACT_WORDS = 6
+MAX_FACT_WORDS = 40
+
+# Share of the context budget the glossary and facts may use; summaries
+# get the rest (and whatever those two leave unused)
+GLOSSARY_SHARE = 0.3
+FACTS_SHARE = 0.2
+
+
+@dataclass
+class ChapterDigest:
+    """Summary, defined terms and stated facts of one chapter"""
+    summary: str
+    terms: List[Dict[str, str]] = field(default_factory=list)
+    facts: List[str] = field(default_factory=list)
+
+
+def plain_text(markdown_text: str) -> str:
+    """Markdown inline text without links, emphasis or list markers"""
+    text = LINK.sub(r"\1", markdown_text)
+    marker = LIST_MARKER.match(text)
+    if marker:
+        text = text[marker.end():]
+    return " ".join(EMPHASIS.sub("", text).split())
+
+
+def _prose_paragraphs(text: str) -> List[str]:
+    """Paragraphs of a section (markdown kept), without headings or fenced code"""
+    paragraphs: List[str] = []
+    current: List[str] = []
+    in_code = False
+    for line in text.split("\n"):
+        if CODE_FENCE.match(line):
+            in_code = not in_code
+            continue
+        if in_code or HEADING.match(line):
+            continue
+        if not line.strip() or LIST_MARKER.match(line):
+            if current:
+                paragraphs.append(" ".join(current))
+            current = [line.strip()] if line.strip() else []
+        else:
+            current.append(line.strip())
+    if current:
+        paragraphs.append(" ".join(current))
+    return paragraphs
+
+
+def truncate_sentences(text: str, max_tokens: int) -> str:
+    """The leading whole sentences of `text` that fit in `max_tokens` (at least one word)"""
+    if count_tokens(text) <= max_tokens:
+        return text
+    kept: List[str] = []
+    used = 0
+    for sentence in split_sentences(text):
+        tokens = count_tokens(sentence) + 1
+        if used + tokens > max_tokens:
+            break
+        kept.append(sentence)
+        used += tokens
+    return " ".join(kept)
+
+
+def extract_chapter_memory(content: str, summary_tokens: int = 120) -> ChapterDigest:
+    """
+    Reduce a chapter to what later chapters need to stay consistent with it
+    
+    The summary is the first sentence under each section heading; terms are
+    bold phrases with the sentence that introduces them; facts are sentences
+    stating numbers (dates, amounts, measurements).
+    
+    Args:
+        content: Chapter markdown
+        summary_tokens: Budget for the summary, cut at sentence boundaries
+    
+    Returns:
+        Chapter digest
+    """
+    summary_sentences: List[str] = []
+    terms: Dict[str, Dict[str, str]] = {}
+    facts: List[str] = []
+    seen_facts = set()
+    
+    for section in split_sections(content):
+        paragraphs = _prose_paragraphs(section.text)
+        first = True
+        for paragraph in paragraphs:
+            sentences = split_sentences(paragraph)
+            if first and sentences and not LIST_MARKER.match(paragraph):
+                lead = plain_text(sentences[0])
+                if section.level >= 2 and section.title:
+                    lead = f"{plain_text(section.title)}: {lead}"
+                summary_sentences.append(lead)
+                first = False
+            
+            for sentence in sentences:
+                for match in BOLD_TERM.finditer(sentence):
+                    term = plain_text(match.group(1)).strip(" :.,")
+                    key = term.lower()
+                    if term and key not in terms and len(terms) < MAX_TERMS_PER_CHAPTER:
+                        definition = " ".join(plain_text(sentence).split()[:MAX_DEFINITION_WORDS])
+                        terms[key] = {"term": term, "definition": definition}
+                
+                fact = plain_text(sentence)
+                words = len(fact.split())
+                if NUMBER.search(fact) and MIN_FACT_WORDS <= words <= MAX_FACT_WORDS \
+                        and fact.lower() not in seen_facts and len(facts) < MAX_FACTS_PER_CHAPTER:
+                    seen_facts.add(fact.lower())
+                    facts.append(fact)
+    
+    summary = truncate_sentences(" ".join(summary_sentences), summary_tokens)
+    return ChapterDigest(summary=summary, terms=list(terms.values()), facts=facts)
+
+
+def _fill(lines: List[str], max_tokens: int) -> List[str]:
+    """The leading lines that fit in `max_tokens`"""
+    kept: List[str] = []
+    used = 0
+    for line in lines:
+        tokens = count_tokens(line) + 1
+        if used + tokens > max_tokens:
+            break
+        kept.append(line)
+        used += tokens
+    return kept
+
+
+def pack_book_memory(memories: List[ChapterMemory], max_tokens: int) -> str:
+    """
+    Build the earlier-chapters context for a chapter prompt
+    
+    The glossary keeps the first definition of each term (later chapters
+    must agree with it), facts favour the most recent chapters, and chapter
+    summaries are filled from the latest chapter backwards - older chapters
+    drop to their title, then out, once the budget is used.
+    
+    Args:
+        memories: Memories of the earlier chapters, in chapter order
+        max_tokens: Token budget for the whole context
+    
+    Returns:
+        Context text, empty when there is nothing to remember
+    """
+    glossary: Dict[str, str] = {}
+    for memory in memories:
+        for entry in memory.terms or []:
+            glossary.setdefault(entry["term"].lower(), f"- {entry['term']}: {entry['definition']}")
+    glossary_lines = _fill(list(glossary.values()), int(max_tokens * GLOSSARY_SHARE))
+    
+    seen_facts = set()
+    fact_lines: List[str] = []
+    for memory in reversed(memories):
+        for fact in memory.facts or []:
+            if fact.lower() not in seen_facts:
+                seen_facts.add(fact.lower())
+                fact_lines.append(f"- {fact}")
+    fact_lines = _fill(fact_lines, int(max_tokens * FACTS_SHARE))
+    
+    remaining = max_tokens - sum(count_tokens(line) + 1 for line in glossary_lines + fact_lines) - 20
+    summary_lines: List[str] = []
+    for memory in reversed(memories):
+        heading = f"- {memory.title or f'Chapter {memory.chapter_number}'}"
+        full = f"{heading} - {memory.summary}" if memory.summary else heading
+        for line in (full, heading):
+            tokens = count_tokens(line) + 1
+            if tokens <= remaining:
+                summary_lines.append(line)
+                remaining -= tokens
+                break
+        else:
+            break
+    summary_lines.reverse()
+    
+    parts = []
+    if summary_lines:
+        parts.append("Earlier chapters:\n" + "\n".join(summary_lines))
+    if glossary_lines:
+        parts.append("Terms already defined:\n" + "\n".join(glossary_lines))
+    if fact_lines:
+        parts.append("Facts already stated:\n" + "\n".join(fact_lines))
+    return "\n\n".join(parts)
+
+
+class BookMemory:
+    """
+    Stores chapter memories and packs them into chapter prompts
+    
+    Memories are updated incrementally: only the chapter that was just
+    generated or edited is re-read.
+    """
+    
+    def __init__(self, max_tokens: int = 800, summary_tokens: int = 120):
+        self.max_tokens = max_tokens
+        self.summary_tokens = summary_tokens
+    
+    async def update(self, book_id: int, chapter_id: int, chapter_number: int, title: Optional[str], content: str) -> ChapterDigest:
+        """
+        Re-extract a chapter's memory after it was generated or edited
+        
+        Args:
+            book_id: Book ID
+            chapter_id: Chapter ID
+            chapter_number: Position of the chapter in the book
+            title: Chapter title
+            content: Chapter markdown
+        
+        Returns:
+            The stored digest
+        """
+        digest = extract_chapter_memory(content or "", self.summary_tokens)
+        await db_writer.submit(_store_memory, dict(
+            book_id=book_id,
+            chapter_id=chapter_id,
+            chapter_number=chapter_number,
+            title=title,
+            content_hash=content_hash(content),
+            summary=digest.summary,
+            terms=digest.terms,
+            facts=digest.facts,
+        ))
+        return digest
+    
+    async def load(self, db: AsyncSession, book_id: int, before_chapter: Optional[int] = None) -> List[ChapterMemory]:
+        """Memories of a book's chapters (those before `before_chapter` if given), in chapter order"""
+        query = select(ChapterMemory).where(ChapterMemory.book_id == book_id)
+        if before_chapter is not None:
+            query = query.where(ChapterMemory.chapter_number < before_chapter)
+        result = await db.execute(query.order_by(ChapterMemory.chapter_number))
+        return list(result.scalars().all())
+    
+    async def context(self, db: AsyncSession, book_id: int, chapter_number: int) -> str:
+        """
+        Packed memory of the chapters before `chapter_number`
+        
+        Args:
+            db: Database session
+            book_id: Book ID
+            chapter_number: Chapter about to be written
+        
+        Returns:
+            Context of at most `max_tokens` tokens, empty if no earlier chapter is done
+        """
+        return pack_book_memory(await self.load(db, book_id, chapter_number), self.max_tokens)
+
+
+def _store_memory(session: Session, values: dict):
+    """Insert or replace a chapter's memory"""
+    memory = session.query(ChapterMemory).filter(ChapterMemory.chapter_id == values["chapter_id"]).first()
+    if memory is None:
+        session.add(ChapterMemory(**values))
+    else:
+        for key, value in values.items():
+            setattr(memory, key, value)
+
+
+# Global instance
+book_memory = BookMemory(
+    max_tokens=settings.book_memory_tokens,
+    summary_tokens=settings.book_memory_summary_tokens,
+)
@@ -0,0 +1,144 @@
+"""
+Multi-book exports streamed as one zip archive
+"""
+import asyncio
+import json
+import time
+import uuid
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, List, Optional
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.services.book_export import export_filename, iter_export, load_export_batch
+from app.utils.streaming_zip import StreamingZip
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Books whose metadata is loaded per round trip
+BULK_EXPORT_BATCH_SIZE = 20
+
+
+class BulkExport:
+    """State and progress of one bulk export"""
+    
+    def __init__(self, book_ids: List[int], formats: List[str]):
+        self.export_id = uuid.uuid4().hex
+        self.book_ids = book_ids
+        self.formats = formats
+        self.status = "running"
+        self.total = len(book_ids) * len(formats)
+        self.completed = 0
+        self.bytes_sent = 0
+        self.current_book_id: Optional[int] = None
+        self.skipped: Dict[int, str] = {}
+        self.files: List[str] = []
+        self.error: Optional[str] = None
+        self.started_at = time.time()
+    
+    def skip(self, book_id: int, reason: str):
+        """Leave a book out of the archive"""
+        self.skipped[book_id] = reason
+        self.completed += len(self.formats)
+    
+    def snapshot(self) -> dict:
+        """Progress as reported to clients"""
+        return {
+            "export_id": self.export_id,
+            "status": self.status,
+            "total": self.total,
+            "completed": self.completed,
+            "bytes_sent": self.bytes_sent,
+            "current_book_id": self.current_book_id,
+            "skipped": self.skipped,
+            "error": self.error,
+        }
+    
+    def manifest(self) -> str:
+        """manifest.json written at the end of the archive"""
+        return json.dumps({
+            "book_ids": self.book_ids,
+            "formats": self.formats,
+            "files": self.files,
+            "skipped": {str(book_id): reason for book_id, reason in self.skipped.items()},
+        }, indent=2)
+    
+    async def stream(self, batch_size: int = BULK_EXPORT_BATCH_SIZE) -> AsyncIterator[bytes]:
+        """
+        The archive, produced incrementally
+        
+        Book and chapter metadata is loaded for `batch_size` books at a
+        time; each export is copied from the artifact store when stored,
+        otherwise rendered (and stored). Entries are written in pieces, so
+        memory use stays bounded by the chunk size rather than the size of
+        the books.
+        """
+        archive = StreamingZip(streamed=True)
+        try:
+            for start in range(0, len(self.book_ids), batch_size):
+                batch = self.book_ids[start:start + batch_size]
+                async with AsyncSessionLocal() as db:
+                    books, chapters = await load_export_batch(db, batch)
+                
+                for book_id in batch:
+                    book = books.get(book_id)
+                    if book is None:
+                        self.skip(book_id, "Book not found")
+                        continue
+                    if not chapters.get(book_id):
+                        self.skip(book_id, "No completed chapters to export")
+                        continue
+                    
+                    self.current_book_id = book_id
+                    for fmt in self.formats:
+                        name = f"book-{book_id}/{export_filename(book, fmt)}"
+                        # EPUB files are zip archives already
+                        entry = archive.open(name, compress=fmt != "epub")
+                        async for chunk in iter_export(book, chapters[book_id], fmt):
+                            data = entry.write(chunk)
+                            if data:
+                                self.bytes_sent += len(data)
+                                yield data
+                        data = entry.close()
+                        self.bytes_sent += len(data)
+                        yield data
+                        self.files.append(name)
+                        self.completed += 1
+            
+            self.current_book_id = None
+            for data in (archive.write("manifest.json", self.manifest()), archive.close()):
+                self.bytes_sent += len(data)
+                yield data
+            self.status = "complete"
+        except (GeneratorExit, asyncio.CancelledError):
+            self.status = "failed"
+            self.error = "Download interrupted"
+            raise
+        except Exception as e:
+            self.status = "failed"
+            self.error = str(e)
+            logger.error(f"Bulk export {self.export_id} failed: {e}", exc_info=True)
+            raise
+
+
+class BulkExportRegistry:
+    """Recent bulk exports, so their progress can be polled"""
+    
+    def __init__(self, max_exports: int = 100):
+        self.max_exports = max_exports
+        self._exports: "OrderedDict[str, BulkExport]" = OrderedDict()
+    
+    def create(self, book_ids: List[int], formats: List[str]) -> BulkExport:
+        """Register a new export, forgetting the oldest beyond `max_exports`"""
+        export = BulkExport(book_ids, formats)
+        self._exports[export.export_id] = export
+        while len(self._exports) > self.max_exports:
+            self._exports.popitem(last=False)
+        return export
+    
+    def get(self, export_id: str) -> Optional[BulkExport]:
+        return self._exports.get(export_id)
+
+
+# Global instance
+bulk_exports = BulkExportRegistry(max_exports=settings.bulk_export_history)
@@ -0,0 +1,294 @@
+"""
+WebSocket (and Server-Sent Events) connection manager with per-connection send queues
+"""
+import asyncio
+import json
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Sequence, Set, Tuple, Union
+from fastapi import WebSocket
+from app.core.config import settings
+import logging
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+# Subprotocol a client offers to receive binary msgpack frames instead of JSON text
+MSGPACK_SUBPROTOCOL = "bookforge.msgpack"
+
+# Message types that are superseded by later ones and may be dropped under pressure
+DROPPABLE_MESSAGE_TYPES = {'agent_status'}
+
+# Close code sent to evicted slow consumers ("Try Again Later")
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+Payload = Union[str, bytes]
+
+
+def negotiate_encoding(subprotocols: Sequence[str]) -> Tuple[str, Optional[str]]:
+    """
+    Pick the message encoding for a connecting client
+    
+    Args:
+        subprotocols: Subprotocols offered by the client
+    
+    Returns:
+        Encoding ("json" or "msgpack") and the subprotocol to accept, if any
+    """
+    if MSGPACK_SUBPROTOCOL in subprotocols and msgpack is not None:
+        return "msgpack", MSGPACK_SUBPROTOCOL
+    return "json", None
+
+
+def encode_message(message: dict, encoding: str = "json") -> Payload:
+    """Serialize a message for the wire: JSON text, msgpack bytes or an SSE frame"""
+    if encoding == "msgpack":
+        return msgpack.packb(message, use_bin_type=True)
+    if encoding == "sse":
+        # The event id lets EventSource resume with Last-Event-ID
+        event_id = f"id: {message['seq']}\n" if message.get('seq') is not None else ""
+        return f"{event_id}data: {json.dumps(message)}\n\n"
+    return json.dumps(message)
+
+
+class EventStreamSocket:
+    """
+    WebSocket stand-in that feeds a Server-Sent Events response
+    
+    Lets SSE clients share BookConnection's queueing, overflow and eviction
+    logic: send_text() waits until the response has taken the previous
+    frame, so a client that stops reading times out like a stalled socket.
+    """
+    
+    def __init__(self, keepalive: float = 15.0):
+        self.keepalive = keepalive
+        self._frames: asyncio.Queue = asyncio.Queue(maxsize=1)
+        self.close_code: Optional[int] = None
+    
+    async def send_text(self, payload: str):
+        await self._frames.put(payload)
+    
+    async def close(self, code: int = 1000):
+        self.close_code = code
+        while not self._frames.empty():
+            self._frames.get_nowait()
+        self._frames.put_nowait(None)
+    
+    async def frames(self) -> AsyncIterator[str]:
+        """Frames for a StreamingResponse, with keep-alive comments while idle"""
+        while True:
+            try:
+                frame = await asyncio.wait_for(self._frames.get(), self.keepalive)
+            except asyncio.TimeoutError:
+                # Keeps proxies from closing an idle stream
+                yield ": keepalive\n\n"
+                continue
+            if frame is None:
+                return
+            yield frame
+
+
+class BookConnection:
+    """A WebSocket with a bounded outbound queue drained by its own writer task"""
+    
+    def __init__(
+        self,
+        websocket: WebSocket,
+        book_id: int,
+        max_queue_size: int,
+        send_timeout: float,
+        on_failure: Optional[Callable[["BookConnection"], Awaitable[None]]] = None,
+        encoding: str = "json"
+    ):
+        self.websocket = websocket
+        self.book_id = book_id
+        self.encoding = encoding
+        self.max_queue_size = max_queue_size
+        self.send_timeout = send_timeout
+        self._on_failure = on_failure
+        self._pending: Deque[Tuple[str, Payload, Optional[int]]] = deque()
+        # Events up to this sequence number were already sent by prime()
+        self.min_seq = 0
+        self._ready = asyncio.Event()
+        self._writer_task = None
+        self.closed = False
+    
+    def start(self):
+        """Start the writer task"""
+        self._writer_task = asyncio.create_task(self._writer())
+    
+    async def stop(self):
+        """Stop the writer task"""
+        self.closed = True
+        if self._writer_task:
+            self._writer_task.cancel()
+            try:
+                await self._writer_task
+            except (asyncio.CancelledError, Exception):
+                pass
+    
+    def prime(self, messages: List[Tuple[str, dict, Optional[int]]], min_seq: int):
+        """
+        Put catch-up messages (replay or snapshot) ahead of queued live ones
+        
+        Live messages already covered by the catch-up are discarded.
+        
+        Args:
+            messages: (message_type, message, seq) tuples in send order
+            min_seq: Sequence number the catch-up brings the client up to
+        """
+        self.min_seq = min_seq
+        live = [item for item in self._pending if item[2] is None or item[2] > min_seq]
+        catch_up = [
+            (message_type, encode_message(message, self.encoding), seq)
+            for message_type, message, seq in messages
+        ]
+        self._pending = deque(catch_up + live)
+        if self._pending:
+            self._ready.set()
+    
+    def enqueue(self, message_type: str, payload: Payload, seq: Optional[int] = None) -> bool:
+        """
+        Queue a pre-serialized message without blocking
+        
+        When the queue is full, queued status messages are dropped first
+        (later ones supersede them), then a new status message is dropped.
+        
+        Args:
+            message_type: Message type, used by the overflow policy
+            payload: Message already serialized in this connection's encoding
+            seq: Event sequence number, if the message is a book event
+        
+        Returns:
+            False if the connection is too far behind and should be evicted
+        """
+        if self.closed:
+            return False
+        
+        if seq is not None and seq <= self.min_seq:
+            return True
+        
+        if len(self._pending) >= self.max_queue_size:
+            self._drop_status_messages()
+        
+        if len(self._pending) >= self.max_queue_size:
+            if message_type in DROPPABLE_MESSAGE_TYPES:
+                return True
+            return False
+        
+        self._pending.append((message_type, payload, seq))
+        self._ready.set()
+        return True
+    
+    def _drop_status_messages(self):
+        """Remove queued droppable messages, keeping everything else in order"""
+        kept = deque(item for item in self._pending if item[0] not in DROPPABLE_MESSAGE_TYPES)
+        dropped = len(self._pending) - len(kept)
+        if dropped:
+            logger.debug(f"Dropped {dropped} status messages for slow client on book {self.book_id}")
+        self._pending = kept
+    
+    async def _writer(self):
+        """Send queued messages one at a time"""
+        try:
+            while True:
+                while not self._pending:
+                    self._ready.clear()
+                    await self._ready.wait()
+                _, payload, _ = self._pending.popleft()
+                if isinstance(payload, bytes):
+                    send = self.websocket.send_bytes(payload)
+                else:
+                    send = self.websocket.send_text(payload)
+                await asyncio.wait_for(send, self.send_timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.info(f"WebSocket send failed for book {self.book_id}: {e!r}")
+            self.closed = True
+            if self._on_failure:
+                asyncio.create_task(self._on_failure(self))
+
+
+class ConnectionManager:
+    """Tracks WebSocket connections per book and fans messages out to them"""
+    
+    def __init__(self, max_queue_size: int = 100, send_timeout: float = 10.0):
+        self.max_queue_size = max_queue_size
+        self.send_timeout = send_timeout
+        self.connections: Dict[int, Set[BookConnection]] = {}
+    
+    def connect(
+        self,
+        websocket: WebSocket,
+        book_id: int,
+        start: bool = True,
+        encoding: str = "json"
+    ) -> BookConnection:
+        """
+        Register an accepted WebSocket
+        
+        Args:
+            websocket: Accepted WebSocket
+            book_id: Book the client watches
+            start: Start the writer now; pass False to buffer live messages
+                until catch-up messages have been primed
+            encoding: Message encoding ("json", "msgpack" or "sse")
+        """
+        connection = BookConnection(
+            websocket, book_id, self.max_queue_size, self.send_timeout,
+            on_failure=self._evict, encoding=encoding
+        )
+        if start:
+            connection.start()
+        self.connections.setdefault(book_id, set()).add(connection)
+        return connection
+    
+    async def disconnect(self, connection: BookConnection):
+        """Unregister a connection and stop its writer"""
+        book_connections = self.connections.get(connection.book_id)
+        if book_connections is not None:
+            book_connections.discard(connection)
+            # Remove entry if no connections left
+            if not book_connections:
+                del self.connections[connection.book_id]
+        await connection.stop()
+    
+    def broadcast(self, book_id: int, message_type: str, message: dict, seq: Optional[int] = None):
+        """
+        Queue a message for every connection of a book
+        
+        The message is serialized once per encoding in use, not once per
+        socket. Never awaits a socket, so one slow client cannot delay the
+        others or the caller. A connection that falls too far behind is
+        closed once; it gets nothing more while its eviction is pending.
+        """
+        payloads: Dict[str, Payload] = {}
+        for connection in list(self.connections.get(book_id, ())):
+            if connection.closed:
+                continue
+            payload = payloads.get(connection.encoding)
+            if payload is None:
+                payload = payloads[connection.encoding] = encode_message(message, connection.encoding)
+            if not connection.enqueue(message_type, payload, seq):
+                logger.warning(f"Evicting slow WebSocket consumer for book {book_id}")
+                connection.closed = True
+                asyncio.create_task(self._evict(connection))
+    
+    async def _evict(self, connection: BookConnection):
+        """Disconnect a connection that cannot keep up"""
+        await self.disconnect(connection)
+        try:
+            await connection.websocket.close(code=SLOW_CONSUMER_CLOSE_CODE)
+        except Exception:
+            pass
+
+
+# Global instance
+connection_manager = ConnectionManager(
+    max_queue_size=settings.ws_send_queue_size,
+    send_timeout=settings.ws_send_timeout
+)
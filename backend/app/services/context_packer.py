@@ -0,0 +1,203 @@
+"""
+Context packer - fills a prompt's context budget from several sources
+"""
+import hashlib
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Word pieces as a subword tokenizer sees them: words, digit groups, symbols
+TOKEN_PIECE = re.compile(r"[^\W\d_]+|\d{1,3}|\S")
+# Characters per subword token in longer words
+CHARS_PER_WORD_TOKEN = 6
+NORMALIZE = re.compile(r"[\W_]+")
+SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+(?=[\"'(*_\[A-Z0-9])")
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count subword tokens the way an LLM tokenizer splits text
+    
+    Common words are one token, longer words one per few characters,
+    numbers one per three digits and punctuation one per symbol. Closer to
+    the provider's count than characters / 4, which undercounts code,
+    numbers and punctuation-heavy text.
+    """
+    return sum(
+        1 + (len(piece) - 1) // CHARS_PER_WORD_TOKEN if piece[0].isalpha() else 1
+        for piece in TOKEN_PIECE.findall(text)
+    )
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split text after sentence-ending punctuation"""
+    return [sentence for sentence in SENTENCE_BREAK.split(text.strip()) if sentence]
+
+
+@dataclass
+class ContextSource:
+    """
+    One kind of context offered to a prompt
+    
+    Sources are filled in priority order (lower first), each up to its own
+    cap and the stage budget. Text is split into paragraphs (or lines) and
+    paragraphs into sentences; a sentence already taken from an earlier
+    source or paragraph is not repeated.
+    """
+    name: str
+    text: str
+    priority: int = 0
+    max_tokens: Optional[int] = None
+
+
+@dataclass
+class PackedContext:
+    """Packed text per source and how much was left out"""
+    parts: Dict[str, str]
+    tokens: int
+    budget: int
+    offered_tokens: int
+    duplicates: int = 0
+    cuts: int = 0
+    
+    def get(self, name: str, default: str = "") -> str:
+        return self.parts.get(name) or default
+
+
+@dataclass
+class _SourceResult:
+    paragraphs: List[str] = field(default_factory=list)
+    tokens: int = 0
+
+
+def _paragraphs(text: str) -> List[List[str]]:
+    """Paragraphs of text; line-based paragraphs (lists, headed blocks) as their lines"""
+    paragraphs = []
+    for paragraph in re.split(r"\n\s*\n", text.strip()):
+        lines = [line.strip() for line in paragraph.split("\n") if line.strip()]
+        if len(lines) > 1 and any(line.startswith(("- ", "* ", "#")) or line.endswith(":") for line in lines):
+            paragraphs.append(lines)
+        elif lines:
+            paragraphs.append([" ".join(lines)])
+    return paragraphs
+
+
+def _sentence_key(sentence: str) -> str:
+    normalized = NORMALIZE.sub(" ", sentence.lower()).strip()
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).hexdigest()
+
+
+class ContextPacker:
+    """
+    Builds prompt context within a token budget per stage
+    
+    Keeps running statistics per stage (tokens packed and offered, sentences
+    de-duplicated, sources cut short) so prompt size can be watched and
+    budgets tuned.
+    """
+    
+    def __init__(self, budgets: Dict[str, int]):
+        self.budgets = budgets
+        self._stats: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+    
+    def pack(self, stage: str, sources: List[ContextSource], budget: Optional[int] = None) -> PackedContext:
+        """
+        Fill the stage's budget from the sources
+        
+        Args:
+            stage: Prompt the context is for, selects the budget in settings
+            sources: Context on offer
+            budget: Override for the stage budget in tokens
+        
+        Returns:
+            Packed context; parts[name] holds the text taken from each source
+            (cut at sentence boundaries), empty if nothing fit
+        """
+        if budget is None:
+            budget = self.budgets.get(stage, self.budgets.get("default", 1000))
+        remaining = budget
+        seen = set()
+        results: Dict[str, _SourceResult] = {}
+        duplicates = 0
+        cuts = 0
+        offered = 0
+        
+        for source in sorted(sources, key=lambda s: s.priority):
+            result = results.setdefault(source.name, _SourceResult())
+            offered += count_tokens(source.text or "")
+            allowance = min(remaining, source.max_tokens) if source.max_tokens is not None else remaining
+            cut = False
+            for paragraph in _paragraphs(source.text or ""):
+                lines = []
+                for unit in paragraph:
+                    kept = []
+                    for sentence in split_sentences(unit):
+                        key = _sentence_key(sentence)
+                        if key in seen:
+                            duplicates += 1
+                            continue
+                        tokens = count_tokens(sentence)
+                        if result.tokens + tokens > allowance:
+                            cut = True
+                            break
+                        seen.add(key)
+                        kept.append(sentence)
+                        result.tokens += tokens
+                    if kept:
+                        lines.append(" ".join(kept))
+                    if cut:
+                        break
+                if lines:
+                    result.paragraphs.append("\n".join(lines))
+                if cut:
+                    break
+            cuts += cut
+            remaining -= result.tokens
+        
+        packed = PackedContext(
+            parts={name: "\n\n".join(result.paragraphs) for name, result in results.items()},
+            tokens=budget - remaining,
+            budget=budget,
+            offered_tokens=offered,
+            duplicates=duplicates,
+            cuts=cuts,
+        )
+        self._record(stage, packed)
+        return packed
+    
+    def _record(self, stage: str, packed: PackedContext):
+        with self._lock:
+            stats = self._stats.setdefault(stage, {
+                'count': 0, 'tokens': 0, 'offered_tokens': 0, 'max_tokens': 0, 'duplicates': 0, 'cuts': 0
+            })
+            stats['count'] += 1
+            stats['tokens'] += packed.tokens
+            stats['offered_tokens'] += packed.offered_tokens
+            stats['max_tokens'] = max(stats['max_tokens'], packed.tokens)
+            stats['duplicates'] += packed.duplicates
+            stats['cuts'] += packed.cuts
+            stats['budget'] = packed.budget
+    
+    def snapshot(self) -> Dict[str, dict]:
+        """
+        Statistics per stage since startup
+        
+        Returns:
+            Per stage: count, total/avg/max packed tokens, tokens offered,
+            the budget, de-duplicated sentences and sources cut short
+        """
+        with self._lock:
+            return {
+                stage: {**stats, 'avg_tokens': round(stats['tokens'] / stats['count'], 1)}
+                for stage, stats in self._stats.items()
+            }
+
+
+# Global instance
+context_packer = ContextPacker(settings.context_budgets)
@@ -0,0 +1,204 @@
+"""
+EPUB 3 package documents (container, OPF, navigation, chapters)
+"""
+import re
+import uuid
+import xml.etree.ElementTree as ElementTree
+from datetime import datetime, timezone
+from html import escape, unescape
+from typing import List, Optional, Sequence
+
+EPUB_MEDIA_TYPE = "application/epub+zip"
+
+# HTML void elements, which XHTML requires to be self-closed
+VOID_TAG = re.compile(r"<(br|hr|img|input|meta|link|col|area|source|wbr)(\s[^<>]*?)?\s*/?>", re.IGNORECASE)
+# Named entities other than the five XML predefines
+NAMED_ENTITY = re.compile(r"&(?!(?:amp|lt|gt|quot|apos);)[a-zA-Z][a-zA-Z0-9]*;")
+
+CONTAINER_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles>
+    <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
+  </rootfiles>
+</container>
+"""
+
+STYLESHEET = """body { font-family: serif; line-height: 1.5; margin: 0 5%; }
+h1, h2, h3 { font-family: sans-serif; line-height: 1.2; }
+pre { white-space: pre-wrap; font-size: 0.85em; }
+table { border-collapse: collapse; }
+th, td { border: 1px solid #999; padding: 0.2em 0.5em; }
+"""
+
+XHTML_PAGE = """<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE html>
+<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops" lang="{language}" xml:lang="{language}">
+<head>
+  <meta charset="UTF-8"/>
+  <title>{title}</title>
+  <link rel="stylesheet" type="text/css" href="style.css"/>
+</head>
+<body>
+{body}
+</body>
+</html>
+"""
+
+
+class EpubChapter:
+    """A chapter entry in the package: file name and title"""
+    
+    def __init__(self, number: int, title: str):
+        self.number = number
+        self.title = title
+        self.id = f"chapter-{number:03d}"
+        self.href = f"{self.id}.xhtml"
+
+
+def book_identifier(book_id: int) -> str:
+    """Stable dc:identifier for a book"""
+    return f"urn:uuid:{uuid.uuid5(uuid.NAMESPACE_URL, f'bookforge:book:{book_id}')}"
+
+
+def package_opf(
+    book_id: int,
+    title: str,
+    chapters: Sequence[EpubChapter],
+    modified: Optional[datetime] = None,
+    description: Optional[str] = None,
+    subject: Optional[str] = None,
+    language: str = "en"
+) -> str:
+    """
+    Package document: metadata, manifest and reading order
+    
+    Args:
+        book_id: Book ID, used for the identifier
+        title: Book title
+        chapters: Chapters in reading order
+        modified: Last modification time (dcterms:modified)
+        description: Optional description
+        subject: Optional subject (genre)
+        language: BCP 47 language tag
+    
+    Returns:
+        content.opf XML
+    """
+    modified = (modified or datetime.now(timezone.utc)).astimezone(timezone.utc)
+    metadata = [
+        f'    <dc:identifier id="book-id">{book_identifier(book_id)}</dc:identifier>',
+        f"    <dc:title>{escape(title)}</dc:title>",
+        f"    <dc:language>{language}</dc:language>",
+    ]
+    if description:
+        metadata.append(f"    <dc:description>{escape(description)}</dc:description>")
+    if subject:
+        metadata.append(f"    <dc:subject>{escape(subject)}</dc:subject>")
+    metadata.append(f'    <meta property="dcterms:modified">{modified.strftime("%Y-%m-%dT%H:%M:%SZ")}</meta>')
+    
+    manifest = [
+        '    <item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>',
+        '    <item id="ncx" href="toc.ncx" media-type="application/x-dtbncx+xml"/>',
+        '    <item id="css" href="style.css" media-type="text/css"/>',
+    ] + [
+        f'    <item id="{chapter.id}" href="{chapter.href}" media-type="application/xhtml+xml"/>'
+        for chapter in chapters
+    ]
+    spine = [f'    <itemref idref="{chapter.id}"/>' for chapter in chapters]
+    
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="book-id" xml:lang="{language}">\n'
+        '  <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">\n'
+        + "\n".join(metadata) + "\n"
+        "  </metadata>\n"
+        "  <manifest>\n"
+        + "\n".join(manifest) + "\n"
+        "  </manifest>\n"
+        '  <spine toc="ncx">\n'
+        + "\n".join(spine) + "\n"
+        "  </spine>\n"
+        "</package>\n"
+    )
+
+
+def nav_xhtml(title: str, chapters: Sequence[EpubChapter], language: str = "en") -> str:
+    """EPUB 3 navigation document (table of contents)"""
+    items = "\n".join(
+        f'      <li><a href="{chapter.href}">{escape(chapter.title)}</a></li>' for chapter in chapters
+    )
+    body = (
+        '<nav epub:type="toc" id="toc">\n'
+        f"  <h1>{escape(title)}</h1>\n"
+        "  <ol>\n"
+        f"{items}\n"
+        "  </ol>\n"
+        "</nav>"
+    )
+    return XHTML_PAGE.format(language=language, title="Contents", body=body)
+
+
+def toc_ncx(book_id: int, title: str, chapters: Sequence[EpubChapter]) -> str:
+    """NCX table of contents for EPUB 2 reading systems"""
+    points = "\n".join(
+        f'    <navPoint id="nav-{index}" playOrder="{index}">'
+        f"<navLabel><text>{escape(chapter.title)}</text></navLabel>"
+        f'<content src="{chapter.href}"/></navPoint>'
+        for index, chapter in enumerate(chapters, start=1)
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<ncx xmlns="http://www.daisy.org/z3986/2005/ncx/" version="2005-1">\n'
+        f'  <head><meta name="dtb:uid" content="{book_identifier(book_id)}"/></head>\n'
+        f"  <docTitle><text>{escape(title)}</text></docTitle>\n"
+        "  <navMap>\n"
+        f"{points}\n"
+        "  </navMap>\n"
+        "</ncx>\n"
+    )
+
+
+def chapter_xhtml(chapter: EpubChapter, fragment: Optional[str], language: str = "en") -> str:
+    """
+    XHTML document for one chapter
+    
+    Args:
+        chapter: Chapter entry
+        fragment: Rendered HTML of the chapter body
+        language: BCP 47 language tag
+    
+    Returns:
+        Chapter XHTML
+    """
+    body = ensure_xhtml(fragment) if fragment else ""
+    return XHTML_PAGE.format(
+        language=language,
+        title=escape(chapter.title),
+        body=f'<section epub:type="chapter">\n<h1>{escape(chapter.title)}</h1>\n{body}\n</section>'
+    )
+
+
+def ensure_xhtml(fragment: str) -> str:
+    """
+    Make a fragment well-formed XML
+    
+    Markdown may carry raw HTML (void tags, named entities) that browsers
+    accept but EPUB reading systems reject. Those are repaired; anything
+    still malformed is reduced to its text as paragraphs.
+    """
+    for candidate in (fragment, _repair_xhtml(fragment)):
+        try:
+            ElementTree.fromstring(f"<div>{candidate}</div>")
+            return candidate
+        except ElementTree.ParseError:
+            continue
+    
+    text = unescape(re.sub(r"<[^>]*>", "", fragment))
+    paragraphs: List[str] = [p.strip() for p in text.split("\n\n") if p.strip()]
+    return "\n".join(f"<p>{escape(paragraph, quote=False)}</p>" for paragraph in paragraphs)
+
+
+def _repair_xhtml(fragment: str) -> str:
+    """Self-close void elements and replace named entities with characters"""
+    fragment = VOID_TAG.sub(lambda m: f"<{m.group(1)}{m.group(2) or ''} />", fragment)
+    return NAMED_ENTITY.sub(lambda m: unescape(m.group(0)), fragment)
@@ -0,0 +1,264 @@
+"""
+Book event bus for delivering generation events to every worker process
+"""
+import abc
+import asyncio
+import json
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BookEvent:
+    """
+    A published book event
+    
+    seq is monotonically increasing per book. Clients should treat it as
+    opaque: it is not contiguous and may start from an arbitrary value.
+    """
+    book_id: int
+    seq: int
+    type: str
+    data: dict
+    
+    def to_message(self) -> dict:
+        """Wire format sent to clients"""
+        return {'type': self.type, 'data': self.data, 'seq': self.seq}
+
+
+EventHandler = Callable[[BookEvent], None]
+
+
+class BookEventBus(abc.ABC):
+    """
+    Publishes book events and delivers them to local subscribers
+    
+    Backends decide how far an event travels: the in-process backend only
+    reaches subscribers in this process, the SQLite backend reaches every
+    worker sharing the same events file.
+    """
+    
+    def __init__(self):
+        self._handlers: List[EventHandler] = []
+    
+    def subscribe(self, handler: EventHandler):
+        """Register a handler called for every event delivered to this process"""
+        self._handlers.append(handler)
+    
+    async def start(self):
+        """Start background delivery, if the backend needs it"""
+    
+    async def stop(self):
+        """Stop background delivery"""
+    
+    @abc.abstractmethod
+    async def publish(self, book_id: int, message_type: str, data: dict) -> BookEvent:
+        """Publish an event for a book and return it with its sequence number"""
+    
+    async def replay(self, book_id: int, since: int) -> Optional[List[BookEvent]]:
+        """
+        Return events for a book after `since` from durable storage
+        
+        Returns:
+            Events in order, or None if this backend cannot tell whether
+            events after `since` are still available
+        """
+        return None
+    
+    def _dispatch(self, event: BookEvent):
+        """Deliver an event to local handlers; a failing handler does not affect others"""
+        for handler in self._handlers:
+            try:
+                handler(event)
+            except Exception as e:
+                logger.error(f"Event handler {handler} failed: {e}", exc_info=True)
+
+
+class InProcessEventBus(BookEventBus):
+    """Delivers events to subscribers in the current process only"""
+    
+    def __init__(self):
+        super().__init__()
+        # Counters start from the start time so sequence numbers stay
+        # increasing across restarts and stale client cursors are detectable
+        self._epoch = int(time.time() * 1000)
+        self._seq: Dict[int, int] = {}
+    
+    async def publish(self, book_id: int, message_type: str, data: dict) -> BookEvent:
+        seq = self._seq.get(book_id, self._epoch) + 1
+        self._seq[book_id] = seq
+        event = BookEvent(book_id, seq, message_type, data)
+        self._dispatch(event)
+        return event
+
+
+class SQLiteEventBus(BookEventBus):
+    """
+    Shares events between worker processes through a SQLite file
+    
+    Published events are appended to the events table, whose row id is
+    the event's sequence number, and delivered locally right away; every
+    other worker polls the table and delivers rows it did not write itself.
+    Old rows are pruned periodically.
+    """
+    
+    def __init__(self, path: str, poll_interval: float = 0.1, retention: float = 3600.0):
+        super().__init__()
+        self.path = path
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.origin = uuid.uuid4().hex
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self._last_id = 0
+        self._poll_task = None
+    
+    async def start(self):
+        # One thread owns the connection so SQLite calls never overlap
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="event-bus")
+        self._last_id = await self._run(self._open)
+        self._poll_task = asyncio.create_task(self._poll_loop())
+    
+    async def stop(self):
+        if self._poll_task:
+            self._poll_task.cancel()
+            try:
+                await self._poll_task
+            except asyncio.CancelledError:
+                pass
+            self._poll_task = None
+        if self._conn is not None:
+            await self._run(self._conn.close)
+            self._conn = None
+        if self._executor:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+    
+    async def publish(self, book_id: int, message_type: str, data: dict) -> BookEvent:
+        if self._conn is None:
+            # Not started (e.g. scripts): local delivery only
+            self._last_id += 1
+            seq = self._last_id
+        else:
+            seq = await self._run(self._insert, book_id, message_type, json.dumps(data))
+        
+        event = BookEvent(book_id, seq, message_type, data)
+        self._dispatch(event)
+        return event
+    
+    async def replay(self, book_id: int, since: int) -> Optional[List[BookEvent]]:
+        if self._conn is None:
+            return None
+        
+        oldest, newest, rows = await self._run(self._fetch_book, book_id, since)
+        if oldest is None or oldest > since + 1:
+            # Events after `since` may already have been pruned
+            return None
+        if since > newest:
+            # Cursor from another events file (reset, or a different deployment)
+            return None
+        return [BookEvent(book_id, row_id, message_type, json.loads(payload)) for row_id, message_type, payload in rows]
+    
+    async def _run(self, fn, *args):
+        """Run a SQLite call on the bus thread"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+    
+    def _open(self) -> int:
+        """Open the events file and return the current high-water mark"""
+        self._conn = sqlite3.connect(self.path, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout)}")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS book_events ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "origin TEXT NOT NULL, "
+            "book_id INTEGER NOT NULL, "
+            "type TEXT NOT NULL, "
+            "data TEXT NOT NULL, "
+            "created_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_book_events_book_id_id ON book_events (book_id, id)")
+        row = self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM book_events").fetchone()
+        return row[0]
+    
+    def _insert(self, book_id: int, message_type: str, payload: str) -> int:
+        cursor = self._conn.execute(
+            "INSERT INTO book_events (origin, book_id, type, data, created_at) VALUES (?, ?, ?, ?, ?)",
+            (self.origin, book_id, message_type, payload, time.time())
+        )
+        return cursor.lastrowid
+    
+    def _fetch(self, after_id: int) -> list:
+        return self._conn.execute(
+            "SELECT id, origin, book_id, type, data FROM book_events WHERE id > ? ORDER BY id LIMIT 1000",
+            (after_id,)
+        ).fetchall()
+    
+    def _fetch_book(self, book_id: int, after_id: int) -> tuple:
+        oldest, newest = self._conn.execute("SELECT MIN(id), MAX(id) FROM book_events").fetchone()
+        rows = self._conn.execute(
+            "SELECT id, type, data FROM book_events WHERE book_id = ? AND id > ? ORDER BY id",
+            (book_id, after_id)
+        ).fetchall()
+        return oldest, newest, rows
+    
+    def _prune(self):
+        self._conn.execute("DELETE FROM book_events WHERE created_at < ?", (time.time() - self.retention,))
+    
+    async def _poll_loop(self):
+        """Deliver events written by other workers"""
+        last_prune = time.monotonic()
+        while True:
+            try:
+                rows = await self._run(self._fetch, self._last_id)
+                for row_id, origin, book_id, message_type, payload in rows:
+                    self._last_id = row_id
+                    if origin != self.origin:
+                        self._dispatch(BookEvent(book_id, row_id, message_type, json.loads(payload)))
+                
+                if time.monotonic() - last_prune > 60:
+                    await self._run(self._prune)
+                    last_prune = time.monotonic()
+                
+                if len(rows) < 1000:
+                    await asyncio.sleep(self.poll_interval)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Event bus poll failed: {e}")
+                await asyncio.sleep(self.poll_interval)
+
+
+def create_event_bus(backend: str = settings.event_bus_backend) -> BookEventBus:
+    """
+    Create the event bus for the configured backend
+    
+    Args:
+        backend: "memory" for a single worker, "sqlite" for multiple workers
+    
+    Returns:
+        Event bus instance
+    """
+    if backend == "sqlite":
+        return SQLiteEventBus(
+            settings.event_bus_path,
+            poll_interval=settings.event_bus_poll_interval,
+            retention=settings.event_bus_retention
+        )
+    if backend != "memory":
+        logger.warning(f"Unknown event bus backend '{backend}', using in-process delivery")
+    return InProcessEventBus()
+
+
+# Global instance
+event_bus = create_event_bus(settings.event_bus_backend)
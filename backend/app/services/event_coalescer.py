@@ -0,0 +1,91 @@
+"""
+Coalescing of superseded book events before they reach clients
+"""
+import asyncio
+from typing import Callable, Dict, Hashable, List, Optional
+from app.services.event_bus import BookEvent
+
+
+def coalesce_key(event: BookEvent) -> Optional[Hashable]:
+    """
+    Key under which a later event supersedes an earlier one
+    
+    Returns:
+        Key for status-like events, or None for events that must always
+        be delivered
+    """
+    if event.type == 'agent_status':
+        return ('agent_status', event.data.get('agent_name'))
+    if event.type == 'chapter_progress':
+        return ('chapter_progress', event.data.get('chapter_id'))
+    return None
+
+
+def coalesce_events(events: List[BookEvent]) -> List[BookEvent]:
+    """
+    Drop events superseded by a later event with the same key
+    
+    Events without a key act as barriers: status updates are never moved
+    across them, so clients see the same order of state changes.
+    """
+    result: List[BookEvent] = []
+    pending: Dict[Hashable, BookEvent] = {}
+    for event in events:
+        key = coalesce_key(event)
+        if key is None:
+            result.extend(pending.values())
+            pending.clear()
+            result.append(event)
+        else:
+            pending.pop(key, None)
+            pending[key] = event
+    result.extend(pending.values())
+    return result
+
+
+class EventCoalescer:
+    """
+    Holds status-like events for a short window per book and delivers only
+    the latest one per key (e.g. per agent)
+    """
+    
+    def __init__(self, deliver: Callable[[BookEvent], None], window: float = 0.05):
+        self.deliver = deliver
+        self.window = window
+        self._pending: Dict[int, Dict[Hashable, BookEvent]] = {}
+        self._timers: Dict[int, asyncio.TimerHandle] = {}
+    
+    def push(self, event: BookEvent):
+        """Deliver an event now, or hold it until the book's window closes"""
+        key = coalesce_key(event)
+        if key is None or self.window <= 0:
+            # Pending status updates go first to keep the order of state changes
+            self.flush(event.book_id)
+            self.deliver(event)
+            return
+        
+        pending = self._pending.setdefault(event.book_id, {})
+        current = pending.get(key)
+        if current is not None and current.seq > event.seq:
+            # Late delivery from another worker: already superseded
+            return
+        pending.pop(key, None)
+        pending[key] = event
+        
+        if event.book_id not in self._timers:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                self.flush(event.book_id)
+                return
+            self._timers[event.book_id] = loop.call_later(self.window, self.flush, event.book_id)
+    
+    def flush(self, book_id: int):
+        """Deliver a book's held events"""
+        timer = self._timers.pop(book_id, None)
+        if timer is not None:
+            timer.cancel()
+        pending = self._pending.pop(book_id, None)
+        if pending:
+            for event in pending.values():
+                self.deliver(event)
@@ -0,0 +1,82 @@
+"""
+Bounded per-book event history for late-joining and reconnecting clients
+"""
+import bisect
+from collections import deque
+from typing import Deque, Dict, List, Optional
+from app.core.config import settings
+from app.services.event_bus import BookEvent, event_bus
+
+
+class EventLog:
+    """
+    Keeps the most recent events of every book in a ring buffer
+    
+    Also tracks the latest agent_status per agent so a compact state
+    snapshot can be built without replaying history.
+    """
+    
+    def __init__(self, max_events: int = 500):
+        self.max_events = max_events
+        self._events: Dict[int, Deque[BookEvent]] = {}
+        # Highest sequence number no longer (or never) held in the buffer
+        self._floor: Dict[int, int] = {}
+        self._agents: Dict[int, Dict[str, dict]] = {}
+    
+    def record(self, event: BookEvent):
+        """Event bus handler: add an event to its book's buffer"""
+        events = self._events.get(event.book_id)
+        if events is None:
+            events = self._events[event.book_id] = deque()
+            self._floor[event.book_id] = event.seq - 1
+        
+        if events and event.seq < events[-1].seq:
+            # Late delivery from another worker: keep the buffer ordered
+            items = list(events)
+            bisect.insort(items, event, key=lambda e: e.seq)
+            events.clear()
+            events.extend(items)
+        else:
+            events.append(event)
+        
+        if len(events) > self.max_events:
+            self._floor[event.book_id] = events.popleft().seq
+        
+        if event.type == 'agent_status' and event.data.get('agent_name'):
+            self._agents.setdefault(event.book_id, {})[event.data['agent_name']] = event.data
+    
+    def last_seq(self, book_id: int) -> int:
+        """Sequence number of the latest event for a book, 0 if none"""
+        events = self._events.get(book_id)
+        return events[-1].seq if events else 0
+    
+    def since(self, book_id: int, seq: int) -> Optional[List[BookEvent]]:
+        """
+        Events for a book after `seq`
+        
+        Returns:
+            Events in order, or None if some of them are no longer buffered
+            (or `seq` does not belong to this stream) and the client needs
+            a snapshot instead
+        """
+        events = self._events.get(book_id)
+        if not events:
+            return None
+        if seq < self._floor[book_id] or seq > events[-1].seq:
+            return None
+        return [event for event in events if event.seq > seq]
+    
+    def agent_statuses(self, book_id: int) -> List[dict]:
+        """Latest status reported by each agent for a book"""
+        return list(self._agents.get(book_id, {}).values())
+    
+    def forget(self, book_id: int):
+        """Drop all history for a book"""
+        self._events.pop(book_id, None)
+        self._floor.pop(book_id, None)
+        self._agents.pop(book_id, None)
+
+
+# Global instance
+event_log = EventLog(max_events=settings.event_log_size)
+event_bus.subscribe(event_log.record)
@@ -0,0 +1,158 @@
+"""
+Typed in-process event bus for book generation progress
+"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Type
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class GenerationEvent:
+    """Base class for events emitted while generating a book"""
+    book_id: Optional[int]
+    stage: str
+    agent_name: str
+    chapter_id: Optional[int] = None
+    task: Optional[str] = None
+    timestamp: float = field(default_factory=time.time)
+
+
+@dataclass
+class StageStarted(GenerationEvent):
+    """An agent started working on a stage"""
+
+
+@dataclass
+class StageFinished(GenerationEvent):
+    """
+    An agent finished a stage, successfully unless `error` is set
+    
+    `details` carries stage-specific measurements, e.g. the mode a stage ran
+    in and its LLM token usage.
+    """
+    duration: float = 0.0
+    error: Optional[str] = None
+    details: Dict[str, Any] = field(default_factory=dict)
+    
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass
+class StageSkipped(GenerationEvent):
+    """A stage was not needed and did not run"""
+    reason: Optional[str] = None
+    tokens_saved: int = 0
+
+
+Subscriber = Callable[[GenerationEvent], Awaitable[None]]
+
+
+class _Subscription:
+    """A subscriber with its own queue and worker task"""
+    
+    def __init__(self, handler: Subscriber, event_types: Tuple[Type[GenerationEvent], ...], max_queue_size: int):
+        self.handler = handler
+        self.event_types = event_types
+        self.max_queue_size = max_queue_size
+        self.queue: Optional[asyncio.Queue] = None
+        self.task: Optional[asyncio.Task] = None
+    
+    def ensure_started(self, loop: asyncio.AbstractEventLoop):
+        """Start the worker on the running loop (again, if the loop changed)"""
+        if self.task is not None and not self.task.done() and self.task.get_loop() is loop:
+            return
+        self.queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self.task = loop.create_task(self._worker())
+    
+    async def _worker(self):
+        """Handle queued events one at a time"""
+        while True:
+            event = await self.queue.get()
+            try:
+                await self.handler(event)
+            except Exception as e:
+                logger.error(f"Generation event subscriber {self.handler.__name__} failed: {e}", exc_info=True)
+            finally:
+                self.queue.task_done()
+
+
+class GenerationEventBus:
+    """
+    Delivers generation events to async subscribers
+    
+    publish() never awaits: each subscriber drains its own bounded queue in
+    its own task, so subscribers run concurrently and a slow one (e.g. a
+    database write) cannot stall generation or the other subscribers. When
+    a subscriber's queue is full, new events for it are dropped.
+    """
+    
+    def __init__(self, max_queue_size: int = 1000):
+        self.max_queue_size = max_queue_size
+        self._subscriptions: List[_Subscription] = []
+    
+    def subscribe(self, handler: Subscriber, *event_types: Type[GenerationEvent]):
+        """
+        Register an async handler
+        
+        Args:
+            handler: Coroutine function called with each event
+            *event_types: Event classes to receive; all events if omitted
+        """
+        self._subscriptions.append(
+            _Subscription(handler, event_types or (GenerationEvent,), self.max_queue_size)
+        )
+    
+    def publish(self, event: GenerationEvent):
+        """Queue an event for every matching subscriber without waiting"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            logger.debug(f"No event loop running, dropping {type(event).__name__}")
+            return
+        
+        for subscription in self._subscriptions:
+            if not isinstance(event, subscription.event_types):
+                continue
+            subscription.ensure_started(loop)
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                logger.warning(
+                    f"Generation event subscriber {subscription.handler.__name__} is behind, "
+                    f"dropping {type(event).__name__}"
+                )
+    
+    async def drain(self):
+        """Wait until every subscriber has handled the events queued so far"""
+        loop = asyncio.get_running_loop()
+        for subscription in self._subscriptions:
+            if subscription.task is not None and subscription.task.get_loop() is loop:
+                await subscription.queue.join()
+    
+    async def stop(self, timeout: float = 5.0):
+        """Deliver pending events (up to `timeout` seconds) and stop the workers"""
+        try:
+            await asyncio.wait_for(self.drain(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Generation event subscribers did not finish before shutdown")
+        
+        loop = asyncio.get_running_loop()
+        for subscription in self._subscriptions:
+            task = subscription.task
+            if task is not None and not task.done() and task.get_loop() is loop:
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+            subscription.task = None
+
+
+# Global instance
+generation_events = GenerationEventBus()
@@ -0,0 +1,134 @@
+"""
+Subscribers recording generation stage timings and agent activity
+"""
+from typing import Dict
+from sqlalchemy.orm import Session
+from app.core.db_writer import db_writer
+from app.models.agent_log import AgentLog
+from app.services.generation_events import GenerationEvent, StageFinished, StageSkipped, generation_events
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class StageMetrics:
+    """Aggregates stage durations per stage name"""
+    
+    def __init__(self):
+        self._stats: Dict[str, dict] = {}
+    
+    async def record(self, event: GenerationEvent):
+        """Event bus subscriber for StageFinished events"""
+        if not isinstance(event, StageFinished):
+            return
+        # Stages that run in several modes are tracked per mode, e.g. "editing:operations"
+        mode = event.details.get('mode')
+        stats = self._stats.setdefault(f"{event.stage}:{mode}" if mode else event.stage, {
+            'count': 0, 'errors': 0, 'total_seconds': 0.0, 'max_seconds': 0.0, 'last_seconds': 0.0
+        })
+        stats['count'] += 1
+        if not event.ok:
+            stats['errors'] += 1
+        stats['total_seconds'] += event.duration
+        stats['max_seconds'] = max(stats['max_seconds'], event.duration)
+        stats['last_seconds'] = event.duration
+        for key in ('prompt_tokens', 'cached_tokens', 'output_tokens', 'context_tokens'):
+            if key in event.details:
+                stats[key] = stats.get(key, 0) + event.details[key]
+        if event.details.get('fallback'):
+            stats['fallbacks'] = stats.get('fallbacks', 0) + 1
+    
+    def snapshot(self) -> Dict[str, dict]:
+        """
+        Current statistics
+        
+        Returns:
+            Per stage: count, errors, total/avg/max/last duration in seconds,
+            and prompt/cached/output/context token totals for stages that report them
+        """
+        return {
+            stage: {**stats, 'avg_seconds': stats['total_seconds'] / stats['count']}
+            for stage, stats in self._stats.items()
+        }
+
+
+class SkipMetrics:
+    """Per book: how often each stage that can be skipped ran or was skipped"""
+    
+    # Stages the quality gate may skip
+    GATED_STAGES = ('content', 'editing')
+    
+    def __init__(self):
+        self._books: Dict[int, Dict[str, dict]] = {}
+    
+    async def record(self, event: GenerationEvent):
+        """Event bus subscriber for StageFinished and StageSkipped events"""
+        if event.book_id is None or event.stage not in self.GATED_STAGES:
+            return
+        stats = self._books.setdefault(event.book_id, {}).setdefault(event.stage, {
+            'ran': 0, 'skipped': 0, 'tokens_saved': 0
+        })
+        if isinstance(event, StageSkipped):
+            stats['skipped'] += 1
+            stats['tokens_saved'] += event.tokens_saved
+        elif isinstance(event, StageFinished):
+            stats['ran'] += 1
+    
+    def snapshot(self, book_id: int) -> dict:
+        """
+        Statistics for a book
+        
+        Returns:
+            Per stage: ran, skipped, skip_rate, tokens_saved; plus the total
+            estimated tokens saved
+        """
+        stages = {
+            stage: {**stats, 'skip_rate': round(stats['skipped'] / (stats['ran'] + stats['skipped']), 3)}
+            for stage, stats in self._books.get(book_id, {}).items()
+        }
+        return {
+            'book_id': book_id,
+            'stages': stages,
+            'tokens_saved': sum(stats['tokens_saved'] for stats in stages.values()),
+        }
+    
+    def forget(self, book_id: int):
+        """Drop a book's statistics"""
+        self._books.pop(book_id, None)
+
+
+async def persist_agent_log(event: GenerationEvent):
+    """Event bus subscriber: store one AgentLog row per finished or skipped stage"""
+    if event.book_id is None:
+        return
+    if isinstance(event, StageSkipped):
+        output = {'status': 'skipped', 'reason': event.reason, 'tokens_saved': event.tokens_saved}
+    elif isinstance(event, StageFinished):
+        output = {
+            'status': 'complete' if event.ok else 'failed',
+            'duration_ms': round(event.duration * 1000, 1),
+            'error': event.error,
+            **event.details,
+        }
+    else:
+        return
+    await db_writer.submit(_insert_agent_log, AgentLog(
+        book_id=event.book_id,
+        chapter_id=event.chapter_id,
+        agent_name=event.agent_name,
+        action=event.stage,
+        input_data={'task': event.task},
+        output_data=output
+    ))
+
+
+def _insert_agent_log(session: Session, log: AgentLog):
+    session.add(log)
+
+
+# Global instance
+stage_metrics = StageMetrics()
+skip_metrics = SkipMetrics()
+generation_events.subscribe(stage_metrics.record, StageFinished)
+generation_events.subscribe(skip_metrics.record, StageFinished, StageSkipped)
+generation_events.subscribe(persist_agent_log, StageFinished, StageSkipped)
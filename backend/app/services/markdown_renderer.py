@@ -0,0 +1,106 @@
+"""
+Markdown to HTML rendering with a per-chapter cache of rendered fragments
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+import markdown
+from app.core.config import settings
+
+# Headings, lists and emphasis are core markdown; these add code blocks and tables
+MARKDOWN_EXTENSIONS = ["fenced_code", "tables", "sane_lists"]
+
+
+def content_hash(text: Optional[str]) -> Optional[str]:
+    """Hash identifying a chapter's markdown, None for empty content"""
+    if not text:
+        return None
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def render_markdown_html(text: str) -> str:
+    """
+    Render markdown to an HTML fragment
+    
+    Args:
+        text: Markdown source
+    
+    Returns:
+        HTML fragment (no surrounding document); void elements are
+        self-closed so the same fragment also works in XHTML (EPUB)
+    """
+    return markdown.markdown(text, extensions=MARKDOWN_EXTENSIONS, output_format="xhtml")
+
+
+class RenderedHTMLCache:
+    """
+    LRU cache of rendered chapter HTML, bounded by total size
+    
+    Entries are stored per chapter together with the hash of the markdown
+    they were rendered from, so a fragment is only returned for the exact
+    text it was made from. Thread-safe: rendering runs in worker threads.
+    """
+    
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[int, Tuple[str, str]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+    
+    def get(self, chapter_id: int, text_hash: Optional[str]) -> Optional[str]:
+        """Cached HTML for a chapter if it was rendered from `text_hash`"""
+        if text_hash is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(chapter_id)
+            if entry is None or entry[0] != text_hash:
+                return None
+            self._entries.move_to_end(chapter_id)
+            return entry[1]
+    
+    def render(self, chapter_id: int, text: str, text_hash: Optional[str] = None) -> str:
+        """
+        Render a chapter's markdown and cache the result
+        
+        Args:
+            chapter_id: Chapter ID
+            text: Markdown source
+            text_hash: content_hash(text), if already known
+        
+        Returns:
+            HTML fragment
+        """
+        text_hash = text_hash or content_hash(text)
+        cached = self.get(chapter_id, text_hash)
+        if cached is not None:
+            return cached
+        
+        html = render_markdown_html(text)
+        with self._lock:
+            self._discard(chapter_id)
+            self._entries[chapter_id] = (text_hash, html)
+            self._size += len(html)
+            while self._size > self.max_bytes and len(self._entries) > 1:
+                self._size -= len(self._entries.popitem(last=False)[1][1])
+        return html
+    
+    def invalidate(self, chapter_id: int):
+        """Forget a chapter's fragment after its text changed"""
+        with self._lock:
+            self._discard(chapter_id)
+    
+    def clear(self):
+        """Drop every cached fragment"""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+    
+    def _discard(self, chapter_id: int):
+        entry = self._entries.pop(chapter_id, None)
+        if entry is not None:
+            self._size -= len(entry[1])
+
+
+# Global instance
+html_cache = RenderedHTMLCache(max_bytes=settings.html_cache_max_bytes)
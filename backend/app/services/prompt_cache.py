@@ -0,0 +1,204 @@
+"""
+Prompt cache - sends stable prompt preambles once per book
+
+Every stage of every chapter starts with the same preamble: the agent's
+system message and the book brief (concept, genre, tone, audience and, for
+research-heavy books, a digest of the research). The preamble goes to
+Gemini as a system instruction, and when it is long enough for Gemini
+context caching it is stored provider-side once per book and referenced by
+later calls, which are then billed only for their own prompt plus the
+discounted cached tokens.
+"""
+import asyncio
+import datetime
+import hashlib
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence
+import google.generativeai as genai
+from google.generativeai import caching
+from app.core.config import settings
+from app.services.context_packer import ContextSource, context_packer, count_tokens
+import logging
+
+logger = logging.getLogger(__name__)
+
+MODEL_NAME = "gemini-2.0-flash"
+# Caches this close to expiry are not handed out (a call may take this long)
+EXPIRY_MARGIN_SECONDS = 30
+# Tokens of the preamble budget the book concept may use; research gets the rest
+PREAMBLE_CONCEPT_TOKENS = 2000
+
+
+def research_digest(documents: Sequence[dict]) -> str:
+    """One line per research document: title and snippet"""
+    lines = []
+    for document in documents:
+        title = (document.get('metadata') or {}).get('title')
+        text = " ".join((document.get('text') or '').split())
+        if text:
+            lines.append(f"- {title}: {text}" if title else f"- {text}")
+    return "\n".join(lines)
+
+
+def book_preamble(book_config: dict, research: Sequence[dict] = ()) -> str:
+    """
+    The part of every generation prompt that only depends on the book
+    
+    Must not vary between chapters or stages, or it cannot be cached.
+    The research digest is only included when it takes the preamble to
+    Gemini's caching minimum: cached, it is billed at a discount and saves
+    later calls from re-sending research; below the minimum it would be
+    sent in full with every call, and chapter prompts already carry the
+    research relevant to them. So books with little research get the short
+    brief, sent inline.
+    
+    Args:
+        book_config: Book fields (book_idea, description, genre, tone, target_audience)
+        research: The book's research documents ({'text', 'metadata'}), in a stable order
+    
+    Returns:
+        Book brief for the system instruction
+    """
+    packed = context_packer.pack("preamble", [
+        ContextSource("concept", book_config.get('description') or '', priority=0, max_tokens=PREAMBLE_CONCEPT_TOKENS),
+        ContextSource("research", research_digest(research), priority=1),
+    ])
+    brief = f"""You are writing chapters of this book.
+Book: {book_config.get('book_idea')}
+Genre: {book_config.get('genre')}
+Tone: {book_config.get('tone')}
+Target Audience: {book_config.get('target_audience') or 'General readers'}
+
+Book concept:
+{packed.get('concept', 'No concept provided.')}"""
+
+    if not packed.get('research') or not settings.prompt_cache_enabled:
+        return brief
+    preamble = f"{brief}\n\nResearch digest:\n{packed.get('research')}"
+    return preamble if count_tokens(preamble) >= settings.prompt_cache_min_tokens else brief
+
+
+@dataclass
+class _CacheEntry:
+    cache: object  # caching.CachedContent
+    expires_at: float
+    tokens: int
+    uses: int = 0
+
+
+class PromptCache:
+    """
+    Provider-side caches of prompt preambles, per book
+    
+    Caches live for `ttl` seconds. Expired entries are dropped when the
+    book is next used, and a book's caches are deleted with the book (and
+    all of them at shutdown) so storage is not billed until they expire.
+    If Gemini refuses to cache a preamble it is sent as a plain system
+    instruction from then on.
+    """
+    
+    def __init__(self, ttl: float = 600, min_tokens: int = 4096, enabled: bool = True, model_name: str = MODEL_NAME):
+        self.ttl = ttl
+        self.min_tokens = min_tokens
+        self.enabled = enabled
+        self.model_name = model_name
+        self._books: Dict[int, Dict[str, _CacheEntry]] = {}
+        self._uncacheable = set()
+        # Creating a cache is a network round trip; only calls for the same
+        # book wait for each other
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._stats = {'created': 0, 'reused': 0, 'uncached': 0, 'errors': 0, 'deleted': 0}
+    
+    async def model_for(self, book_id: Optional[int], preamble: str):
+        """
+        A model that sends `preamble` ahead of every prompt
+        
+        Args:
+            book_id: Book the call is for (None: never cached)
+            preamble: Stable system instruction
+        
+        Returns:
+            GenerativeModel using a cached preamble when possible, otherwise
+            one with the preamble as system instruction
+        """
+        if not preamble:
+            return genai.GenerativeModel(self.model_name)
+        
+        key = hashlib.sha256(preamble.encode("utf-8")).hexdigest()
+        if not self.enabled or book_id is None or key in self._uncacheable \
+                or count_tokens(preamble) < self.min_tokens:
+            self._stats['uncached'] += 1
+            return genai.GenerativeModel(self.model_name, system_instruction=preamble)
+        
+        async with self._locks.setdefault(book_id, asyncio.Lock()):
+            entries = self._books.setdefault(book_id, {})
+            now = time.monotonic()
+            for stale in [k for k, entry in entries.items() if entry.expires_at - EXPIRY_MARGIN_SECONDS <= now]:
+                del entries[stale]
+            
+            entry = entries.get(key)
+            if entry is None:
+                try:
+                    cache = await asyncio.to_thread(
+                        caching.CachedContent.create,
+                        model=f"models/{self.model_name}",
+                        display_name=f"book-{book_id}-{key[:12]}",
+                        system_instruction=preamble,
+                        ttl=datetime.timedelta(seconds=self.ttl),
+                    )
+                except Exception as e:
+                    logger.warning(f"Could not cache preamble for book {book_id}, sending it inline: {e}")
+                    self._uncacheable.add(key)
+                    self._stats['errors'] += 1
+                    return genai.GenerativeModel(self.model_name, system_instruction=preamble)
+                entry = entries[key] = _CacheEntry(cache, now + self.ttl, count_tokens(preamble))
+                self._stats['created'] += 1
+            else:
+                self._stats['reused'] += 1
+            entry.uses += 1
+        
+        return genai.GenerativeModel.from_cached_content(cached_content=entry.cache)
+    
+    async def release(self, book_id: int):
+        """Delete a book's caches"""
+        async with self._locks.setdefault(book_id, asyncio.Lock()):
+            entries = self._books.pop(book_id, {})
+        for entry in entries.values():
+            try:
+                await asyncio.to_thread(entry.cache.delete)
+                self._stats['deleted'] += 1
+            except Exception as e:
+                logger.warning(f"Could not delete prompt cache for book {book_id}: {e}")
+    
+    async def close(self):
+        """Delete every cache (shutdown)"""
+        for book_id in list(self._books):
+            await self.release(book_id)
+    
+    def snapshot(self) -> dict:
+        """
+        Cache statistics since startup
+        
+        Returns:
+            created/reused/uncached/errors/deleted counts and the live caches per book
+        """
+        now = time.monotonic()
+        return {
+            **self._stats,
+            'books': {
+                book_id: [
+                    {'tokens': entry.tokens, 'uses': entry.uses, 'expires_in': round(entry.expires_at - now)}
+                    for entry in entries.values()
+                ]
+                for book_id, entries in self._books.items() if entries
+            },
+        }
+
+
+# Global instance
+prompt_cache = PromptCache(
+    ttl=settings.prompt_cache_ttl,
+    min_tokens=settings.prompt_cache_min_tokens,
+    enabled=settings.prompt_cache_enabled,
+)
@@ -4,7 +4,7 @@ RAG (Retrieval-Augmented Generation) service using Chroma vector database
 import chromadb
 from chromadb.config import Settings
 from sentence_transformers import SentenceTransformer
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import logging
 
 logger = logging.getLogger(__name__)
@@ -30,7 +30,7 @@ class RAGService:
             collection = self.client.create_collection(name=collection_name)
         return collection
     
-    def add_documents(self, book_id: int, documents: List[str], metadata: List[Dict[str, Any]]):
+    def add_documents(self, book_id: int, documents: List[str], metadata: List[Dict[str, Any]], id_prefix: str = "doc"):
         """
         Add documents to the vector store
         
@@ -38,6 +38,7 @@ class RAGService:
             book_id: Book ID
             documents: List of document chunks (text)
             metadata: List of metadata dicts for each document
+            id_prefix: Prefix for document IDs, must be unique per batch
         """
         try:
             collection = self.get_or_create_collection(book_id)
@@ -46,7 +47,7 @@ class RAGService:
             embeddings = self.embedding_model.encode(documents).tolist()
             
             # Create IDs
-            doc_ids = [f"doc_{book_id}_{i}" for i in range(len(documents))]
+            doc_ids = [f"{id_prefix}_{book_id}_{i}" for i in range(len(documents))]
             
             # Add to collection
             collection.add(
@@ -61,15 +62,49 @@ class RAGService:
             logger.error(f"Error adding documents: {e}")
             raise
     
-    def search_relevant_context(self, book_id: int, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+    def replace_chapter_documents(self, book_id: int, chapter_id: int, documents: List[str], metadata: List[Dict[str, Any]]):
+        """
+        Replace the research stored for one chapter
+        
+        Document IDs are derived from the chapter and the position in the
+        batch, so re-running research would collide with (or leave behind
+        part of) the previous batch; the chapter's documents are deleted
+        before the new batch is added.
+        
+        Args:
+            book_id: Book ID
+            chapter_id: Chapter ID, 0 for book-wide research
+            documents: List of document chunks (text)
+            metadata: List of metadata dicts for each document
+        """
+        try:
+            collection = self.get_or_create_collection(book_id)
+            collection.delete(where={'chapter_id': chapter_id})
+        except Exception as e:
+            logger.error(f"Error deleting documents for chapter {chapter_id}: {e}")
+            raise
+        
+        self.add_documents(book_id, documents, metadata, id_prefix=f"ch{chapter_id}" if chapter_id else "doc")
+    
+    def search_relevant_context(
+        self,
+        book_id: int,
+        query: str,
+        top_k: int = 5,
+        chapter_id: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
         """
         Search for relevant context
         
+        When a chapter ID is given, documents researched for that chapter are
+        returned first and the remaining slots are filled from the whole book.
+        
         Args:
             book_id: Book ID
             query: Search query
             top_k: Number of results to return
-            
+            chapter_id: Optional chapter ID to scope retrieval to
+        
         Returns:
             List of relevant documents with metadata
         """
@@ -79,29 +114,73 @@ class RAGService:
             # Generate query embedding
             query_embedding = self.embedding_model.encode([query]).tolist()[0]
             
-            # Search
-            results = collection.query(
-                query_embeddings=[query_embedding],
-                n_results=top_k
-            )
+            context = []
+            if chapter_id is not None:
+                context = self._query(collection, query_embedding, top_k, where={'chapter_id': chapter_id})
             
-            # Format results
-            documents = results['documents'][0] if results['documents'] else []
-            metadatas = results['metadatas'][0] if results['metadatas'] else []
+            if len(context) < top_k:
+                seen = {item['text'] for item in context}
+                for item in self._query(collection, query_embedding, top_k):
+                    if item['text'] not in seen:
+                        context.append(item)
+                        seen.add(item['text'])
             
-            context = [
-                {
-                    'text': doc,
-                    'metadata': meta
-                }
-                for doc, meta in zip(documents, metadatas)
-            ]
-            
-            return context
+            return context[:top_k]
         except Exception as e:
             logger.error(f"Error searching context: {e}")
             return []
     
+    def _query(self, collection, query_embedding: List[float], top_k: int, where: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Run a single similarity query and format the results"""
+        try:
+            results = collection.query(
+                query_embeddings=[query_embedding],
+                n_results=top_k,
+                where=where
+            )
+        except Exception as e:
+            logger.warning(f"Query with filter {where} failed: {e}")
+            return []
+        
+        # Format results
+        documents = results['documents'][0] if results['documents'] else []
+        metadatas = results['metadatas'][0] if results['metadatas'] else []
+        
+        return [
+            {
+                'text': doc,
+                'metadata': meta
+            }
+            for doc, meta in zip(documents, metadatas)
+        ]
+    
+    def book_documents(self, book_id: int) -> List[Dict[str, Any]]:
+        """
+        All documents stored for a book, in a stable order
+        
+        Book-wide research first, then each chapter's in chapter ID order,
+        each batch in the order it was added.
+        
+        Args:
+            book_id: Book ID
+        
+        Returns:
+            List of documents with metadata
+        """
+        try:
+            results = self.get_or_create_collection(book_id).get(include=['documents', 'metadatas'])
+        except Exception as e:
+            logger.error(f"Error reading documents: {e}")
+            return []
+        
+        def order(item):
+            doc_id, _, meta = item
+            prefix, _, index = doc_id.rpartition("_")
+            return ((meta or {}).get('chapter_id') or 0, prefix, int(index) if index.isdigit() else 0, doc_id)
+        
+        items = sorted(zip(results['ids'], results['documents'] or [], results['metadatas'] or []), key=order)
+        return [{'text': doc, 'metadata': meta} for _, doc, meta in items]
+    
     def delete_book_documents(self, book_id: int):
         """Delete all documents for a book"""
         try:
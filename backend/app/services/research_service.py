@@ -4,7 +4,9 @@ Research service for web scraping and content extraction
 from duckduckgo_search import DDGS
 from bs4 import BeautifulSoup
 import requests
-from typing import List, Dict
+from typing import List, Dict, Optional
+from app.core.config import settings
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
@@ -13,11 +15,13 @@ logger = logging.getLogger(__name__)
 class ResearchService:
     """Service for web research and content extraction"""
     
-    def __init__(self):
+    def __init__(self, max_concurrency: int = 4):
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         })
+        # Shared limit for concurrent searches across every caller
+        self._rate_limit = asyncio.Semaphore(max_concurrency)
     
     def search_web(self, query: str, max_results: int = 10) -> List[Dict]:
         """
@@ -44,6 +48,90 @@ class ResearchService:
             logger.error(f"Error searching web: {e}")
             return []
     
+    async def search_web_async(self, query: str, max_results: int = 10) -> List[Dict]:
+        """
+        Search the web without blocking the event loop
+        
+        Runs `search_web` in a worker thread under the shared rate limit.
+        
+        Args:
+            query: Search query
+            max_results: Maximum number of results
+            
+        Returns:
+            List of search results with title, url, and snippet
+        """
+        async with self._rate_limit:
+            return await asyncio.to_thread(self.search_web, query, max_results)
+    
+    def build_chapter_queries(self, book_idea: str, title: Optional[str], outline: Optional[str], max_queries: int = 2) -> List[str]:
+        """
+        Derive search queries for a chapter from its title and outline
+        
+        Args:
+            book_idea: Book title or idea, used to keep queries on topic
+            title: Chapter title
+            outline: Chapter outline/description
+            max_queries: Maximum number of queries to return
+            
+        Returns:
+            List of search queries
+        """
+        queries = []
+        
+        if title:
+            # Drop generic "Chapter N:" prefixes
+            clean_title = title.split(':', 1)[1].strip() if title.lower().startswith('chapter') and ':' in title else title.strip()
+            if clean_title and clean_title.lower() != 'to be determined':
+                queries.append(f"{book_idea} {clean_title}")
+        
+        if outline:
+            # Use the leading sentences of the outline as focused queries
+            for sentence in outline.split('.'):
+                sentence = sentence.strip()
+                if len(sentence.split()) >= 4:
+                    queries.append(sentence[:200])
+                if len(queries) >= max_queries:
+                    break
+        
+        if not queries:
+            queries.append(book_idea)
+        
+        return queries[:max_queries]
+    
+    async def research_chapters(self, book_idea: str, chapters: List[Dict], max_results: int = 5) -> Dict[int, List[Dict]]:
+        """
+        Run per-chapter research concurrently
+        
+        Args:
+            book_idea: Book title or idea
+            chapters: List of dicts with 'id', 'title' and 'outline'
+            max_results: Maximum number of results per query
+            
+        Returns:
+            Mapping of chapter id to de-duplicated search results
+        """
+        jobs = []
+        for chapter in chapters:
+            for query in self.build_chapter_queries(book_idea, chapter.get('title'), chapter.get('outline')):
+                jobs.append((chapter['id'], query))
+        
+        results = await asyncio.gather(
+            *(self.search_web_async(query, max_results) for _, query in jobs)
+        )
+        
+        by_chapter: Dict[int, List[Dict]] = {chapter['id']: [] for chapter in chapters}
+        seen_urls: Dict[int, set] = {chapter['id']: set() for chapter in chapters}
+        for (chapter_id, _), chapter_results in zip(jobs, results):
+            for result in chapter_results:
+                url = result.get('url', '')
+                if url and url in seen_urls[chapter_id]:
+                    continue
+                seen_urls[chapter_id].add(url)
+                by_chapter[chapter_id].append(result)
+        
+        return by_chapter
+    
     def extract_content(self, url: str) -> str:
         """
         Extract text content from a URL
@@ -111,5 +199,5 @@ class ResearchService:
 
 
 # Global instance
-research_service = ResearchService()
+research_service = ResearchService(max_concurrency=settings.research_concurrency)
 
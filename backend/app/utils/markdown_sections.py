@@ -0,0 +1,129 @@
+"""
+Splitting markdown chapters into heading-delimited sections
+"""
+import re
+from dataclasses import dataclass
+from typing import List, Optional
+
+HEADING = re.compile(r"(#{1,6})\s+(.*?)\s*#*\s*$")
+CODE_FENCE = re.compile(r" {0,3}(?:```|~~~)")
+
+
+@dataclass
+class Section:
+    """
+    A heading and the text up to the next heading of the same or higher level
+    
+    `text` is the exact slice of the chapter, heading line included, so
+    joining the sections of a chapter gives back the chapter.
+    """
+    title: Optional[str]  # None for text before the first heading
+    level: int  # 0 for text before the first heading
+    text: str
+    
+    @property
+    def words(self) -> int:
+        return len(self.text.split())
+
+
+def split_sections(content: str, max_level: int = 2) -> List[Section]:
+    """
+    Split a chapter on headings of level 1 to `max_level`
+    
+    Headings inside fenced code do not split. Deeper headings stay inside
+    their section.
+    
+    Args:
+        content: Chapter markdown
+        max_level: Deepest heading level that starts a section
+    
+    Returns:
+        Sections in order; ''.join(s.text for s in sections) == content
+    """
+    sections: List[Section] = []
+    title: Optional[str] = None
+    level = 0
+    start = 0
+    position = 0
+    in_code = False
+    
+    for line in content.splitlines(keepends=True):
+        if CODE_FENCE.match(line):
+            in_code = not in_code
+        elif not in_code:
+            heading = HEADING.match(line)
+            if heading and len(heading.group(1)) <= max_level:
+                if position > start:
+                    sections.append(Section(title, level, content[start:position]))
+                title, level, start = heading.group(2), len(heading.group(1)), position
+        position += len(line)
+    
+    if position > start or not sections:
+        sections.append(Section(title, level, content[start:]))
+    return sections
+
+
+def split_paragraphs(text: str) -> List[str]:
+    """
+    Split text after blank lines outside fenced code
+    
+    Returns:
+        Pieces that join back to `text`, each ending with its blank line(s)
+    """
+    pieces: List[str] = []
+    start = 0
+    position = 0
+    in_code = False
+    previous_blank = False
+    
+    for line in text.splitlines(keepends=True):
+        blank = not line.strip()
+        if previous_blank and not blank and not in_code and position > start:
+            pieces.append(text[start:position])
+            start = position
+        if CODE_FENCE.match(line):
+            in_code = not in_code
+        previous_blank = blank
+        position += len(line)
+    
+    if position > start or not pieces:
+        pieces.append(text[start:])
+    return pieces
+
+
+def chunk_markdown(content: str, max_words: int, max_level: int = 2) -> List[str]:
+    """
+    Split a chapter into consecutive chunks of at most about `max_words`
+    
+    Whole sections are packed together while they fit; a section longer
+    than `max_words` is split between paragraphs (a single paragraph longer
+    than that stays whole).
+    
+    Args:
+        content: Chapter markdown
+        max_words: Target chunk size in words
+        max_level: Deepest heading level that starts a section
+    
+    Returns:
+        Chunks in order; ''.join(chunks) == content
+    """
+    pieces: List[str] = []
+    for section in split_sections(content, max_level):
+        if section.words > max_words:
+            pieces.extend(split_paragraphs(section.text))
+        else:
+            pieces.append(section.text)
+    
+    chunks: List[str] = []
+    current: List[str] = []
+    current_words = 0
+    for piece in pieces:
+        words = len(piece.split())
+        if current and current_words + words > max_words:
+            chunks.append("".join(current))
+            current, current_words = [], 0
+        current.append(piece)
+        current_words += words
+    if current:
+        chunks.append("".join(current))
+    return chunks
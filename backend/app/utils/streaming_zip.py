@@ -0,0 +1,140 @@
+"""
+Zip archives produced incrementally for streaming responses
+"""
+import io
+import zipfile
+from typing import Tuple, Union
+
+# Fixed timestamp so identical content produces identical archives
+ZIP_EPOCH: Tuple[int, int, int, int, int, int] = (1980, 1, 1, 0, 0, 0)
+
+
+class _EntryBuffer:
+    """
+    Write target for zipfile that only holds bytes not yet handed out
+    
+    zipfile seeks back into the entry it just wrote to fill in sizes and
+    CRC. Bytes are only taken between entries, so those seeks always land
+    in the buffer and zipfile can treat the stream as seekable (regular
+    local headers, no data descriptors). A non-seekable buffer makes
+    zipfile append data descriptors instead, so bytes can also be taken
+    in the middle of an entry.
+    """
+    
+    def __init__(self, seekable: bool = True):
+        self._buffer = io.BytesIO()
+        self._offset = 0
+        self._seekable = seekable
+    
+    def write(self, data: bytes) -> int:
+        return self._buffer.write(data)
+    
+    def tell(self) -> int:
+        return self._offset + self._buffer.tell()
+    
+    def seek(self, position: int, whence: int = io.SEEK_SET) -> int:
+        if not self._seekable:
+            raise OSError("Stream is not seekable")
+        if whence == io.SEEK_END:
+            self._buffer.seek(0, io.SEEK_END)
+        elif whence == io.SEEK_CUR:
+            self._buffer.seek(position, io.SEEK_CUR)
+        else:
+            if position < self._offset:
+                raise OSError("Cannot seek into data that was already streamed")
+            self._buffer.seek(position - self._offset)
+        return self.tell()
+    
+    def flush(self):
+        pass
+    
+    def take(self) -> bytes:
+        """Return buffered bytes and start a new buffer"""
+        data = self._buffer.getvalue()
+        self._offset += len(data)
+        self._buffer = io.BytesIO()
+        return data
+
+
+class StreamingZip:
+    """
+    Builds a zip archive one entry at a time
+    
+    Each write returns the bytes of the finished entry, so callers can send
+    them right away; only one entry is ever held in memory. With
+    `streamed=True` entries can also be written piece by piece (see
+    open()), at the cost of a data descriptor after each entry.
+    """
+    
+    def __init__(self, compression: int = zipfile.ZIP_DEFLATED, streamed: bool = False):
+        self.compression = compression
+        self._buffer = _EntryBuffer(seekable=not streamed)
+        self._zip = zipfile.ZipFile(self._buffer, mode="w", compression=compression)
+    
+    def _info(self, name: str, compress: bool) -> zipfile.ZipInfo:
+        info = zipfile.ZipInfo(name, date_time=ZIP_EPOCH)
+        info.compress_type = self.compression if compress else zipfile.ZIP_STORED
+        info.external_attr = 0o644 << 16
+        return info
+    
+    def write(self, name: str, data: Union[str, bytes], compress: bool = True) -> bytes:
+        """
+        Add an entry
+        
+        Args:
+            name: Path inside the archive
+            data: Entry content (str is encoded as UTF-8)
+            compress: False to store the entry uncompressed
+        
+        Returns:
+            Archive bytes produced by this entry
+        """
+        self._zip.writestr(self._info(name, compress), data)
+        return self._buffer.take()
+    
+    def open(self, name: str, compress: bool = True) -> "ZipEntryWriter":
+        """
+        Start an entry whose content is written in pieces
+        
+        Only available on streamed archives; no other entry may be written
+        until the returned writer is closed.
+        
+        Args:
+            name: Path inside the archive
+            compress: False to store the entry uncompressed
+        
+        Returns:
+            Writer for the entry
+        """
+        if self._buffer._seekable:
+            raise ValueError("Entries can only be written in pieces on a streamed archive")
+        return ZipEntryWriter(self._zip.open(self._info(name, compress), mode="w"), self._buffer)
+    
+    def close(self) -> bytes:
+        """Finish the archive and return the central directory bytes"""
+        self._zip.close()
+        return self._buffer.take()
+
+
+class ZipEntryWriter:
+    """An open entry of a streamed archive"""
+    
+    def __init__(self, handle, buffer: _EntryBuffer):
+        self._handle = handle
+        self._buffer = buffer
+    
+    def write(self, data: Union[str, bytes]) -> bytes:
+        """
+        Append content to the entry
+        
+        Returns:
+            Archive bytes ready to send (may be empty while the compressor
+            is still buffering)
+        """
+        self._handle.write(data.encode("utf-8") if isinstance(data, str) else data)
+        return self._buffer.take()
+    
+    def close(self) -> bytes:
+        """Finish the entry and return its remaining bytes"""
+        self._handle.close()
+        return self._buffer.take()
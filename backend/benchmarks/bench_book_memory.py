@@ -0,0 +1,85 @@
+"""
+Benchmark the earlier-chapters context as a book grows
+
+Generates a 40-chapter book (2.5k words per chapter, with defined terms and
+numeric facts) and compares the tokens a chapter prompt would carry about
+earlier chapters when pasting them in full versus packing their memories.
+Pasted context grows with every chapter (quadratic over the book); the
+packed memory stays within book_memory_tokens. Also times extracting a
+chapter's memory, which runs once per completed chapter. Run from backend/:
+
+    python -m benchmarks.bench_book_memory
+"""
+import os
+import random
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+from app.services.context_packer import count_tokens  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.models import book, chapter, source, agent_log, chapter_memory  # noqa: E402,F401
+from app.models.chapter_memory import ChapterMemory  # noqa: E402
+from app.services.book_memory import extract_chapter_memory, pack_book_memory  # noqa: E402
+
+CHAPTERS = 40
+WORDS_PER_CHAPTER = 2500
+REPORT_AT = (1, 2, 5, 10, 20, 40)
+
+random.seed(17)
+VOCABULARY = [
+    "".join(random.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(random.randint(2, 10)))
+    for _ in range(3000)
+]
+
+
+def sentence(extra: str = "") -> str:
+    words = random.choices(VOCABULARY, k=random.randint(8, 18))
+    if extra:
+        words.insert(random.randint(1, len(words) - 1), extra)
+    return " ".join(words).capitalize() + "."
+
+
+def make_chapter(number: int) -> str:
+    parts = [f"# Chapter {number}"]
+    for section in range(5):
+        parts.append(f"## {' '.join(random.choices(VOCABULARY, k=3)).title()}")
+        for paragraph in range(WORDS_PER_CHAPTER // 5 // 130):
+            sentences = [sentence() for _ in range(9)]
+            if paragraph == 0:
+                sentences[1] = sentence(f"**{random.choice(VOCABULARY).title()}**")
+            if paragraph == 1:
+                sentences[2] = sentence(f"{random.randint(2, 98)} percent in {random.randint(1900, 2024)}")
+            parts.append(" ".join(sentences))
+    return "\n\n".join(parts)
+
+
+def main():
+    chapters = [make_chapter(number) for number in range(1, CHAPTERS + 1)]
+    
+    start = time.perf_counter()
+    memories = []
+    for number, content in enumerate(chapters, start=1):
+        digest = extract_chapter_memory(content, settings.book_memory_summary_tokens)
+        memories.append(ChapterMemory(
+            chapter_number=number, title=f"Chapter {number}",
+            summary=digest.summary, terms=digest.terms, facts=digest.facts
+        ))
+    extract_ms = (time.perf_counter() - start) / CHAPTERS * 1000
+    
+    print(f"book: {CHAPTERS} chapters of ~{WORDS_PER_CHAPTER} words, budget {settings.book_memory_tokens} tokens")
+    print(f"{'chapter':>8} {'pasted':>10} {'memory':>8}")
+    pasted_total = memory_total = 0
+    for number in range(1, CHAPTERS + 1):
+        pasted = sum(count_tokens(content) for content in chapters[:number - 1])
+        packed = count_tokens(pack_book_memory(memories[:number - 1], settings.book_memory_tokens))
+        pasted_total += pasted
+        memory_total += packed
+        if number in REPORT_AT:
+            print(f"{number:>8} {pasted:>10} {packed:>8}")
+    print(f"{'total':>8} {pasted_total:>10} {memory_total:>8}")
+    print(f"memory extraction: {extract_ms:.2f} ms per chapter")
+
+
+if __name__ == "__main__":
+    main()
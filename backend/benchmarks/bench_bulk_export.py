@@ -0,0 +1,113 @@
+"""
+Benchmark exporting many books at once
+
+Seeds 40 books of 10 x 3k-word chapters and exports all of them as
+markdown three ways: one export per book (what clients did before, one
+get_exportable_book + render_markdown per book), the bulk archive with
+an empty artifact store, and the bulk archive again once every export
+is stored. Reports SQL statements, Python peak memory (tracemalloc) and
+total time. Run from backend/:
+
+    python -m benchmarks.bench_bulk_export
+"""
+import asyncio
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+_workdir = tempfile.mkdtemp(prefix='bookforge_bench_')
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_workdir, 'bench.db')}"
+os.environ["EXPORT_CACHE_PATH"] = os.path.join(_workdir, "export_cache")
+
+from sqlalchemy import event  # noqa: E402
+from app.core.database import AsyncSessionLocal, SessionLocal, async_engine, init_db  # noqa: E402
+from app.models import book, chapter, source, agent_log, chapter_memory  # noqa: E402,F401
+from app.models.book import Book  # noqa: E402
+from app.models.chapter import Chapter  # noqa: E402
+from app.api.routes.export import get_exportable_book  # noqa: E402
+from app.services.book_export import render_markdown  # noqa: E402
+from app.services.bulk_export import bulk_exports  # noqa: E402
+from app.services.markdown_renderer import content_hash  # noqa: E402
+
+BOOKS = 40
+CHAPTERS = 10
+WORDS = 3000
+
+random.seed(5)
+VOCABULARY = [
+    "".join(random.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(random.randint(2, 10)))
+    for _ in range(3000)
+]
+
+
+def make_chapter(number: int) -> str:
+    paragraphs = [f"# Chapter {number}"]
+    for _ in range(WORDS // 100):
+        paragraphs.append(" ".join(random.choices(VOCABULARY, k=100)) + ".")
+    return "\n\n".join(paragraphs)
+
+
+def seed() -> list:
+    db = SessionLocal()
+    book_ids = []
+    for n in range(BOOKS):
+        b = Book(book_idea=f"Bulk benchmark {n}", genre="technical", chapters_count=CHAPTERS,
+                 words_per_chapter=WORDS, tone="professional")
+        db.add(b)
+        db.flush()
+        chapters = [make_chapter(i) for i in range(1, CHAPTERS + 1)]
+        db.add_all([
+            Chapter(book_id=b.id, chapter_number=i, title=f"Chapter {i}", content_markdown=content,
+                    content_hash=content_hash(content), status="complete")
+            for i, content in enumerate(chapters, start=1)
+        ])
+        book_ids.append(b.id)
+    db.commit()
+    db.close()
+    return book_ids
+
+
+async def per_book(book_ids: list):
+    """One export request per book"""
+    for book_id in book_ids:
+        async with AsyncSessionLocal() as db:
+            book, chapters = await get_exportable_book(db, book_id)
+        async for chunk in render_markdown(book, chapters):
+            yield chunk
+
+
+async def measure(label: str, produce, statements: list):
+    statements.clear()
+    size = 0
+    tracemalloc.start()
+    start = time.perf_counter()
+    async for chunk in produce():
+        size += len(chunk)
+        del chunk
+    total = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<22} size={size / 1024 / 1024:>6.2f} MB  queries={len(statements):>4}  "
+          f"peak={peak / 1024 / 1024:>6.2f} MB  total={total * 1000:>7.1f} ms")
+
+
+async def main():
+    init_db()
+    book_ids = seed()
+    
+    statements = []
+    event.listen(async_engine.sync_engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    
+    await measure("per-book requests", lambda: per_book(book_ids), statements)
+    await measure("bulk (cold store)", lambda: bulk_exports.create(book_ids, ["markdown"]).stream(), statements)
+    await measure("bulk (stored)", lambda: bulk_exports.create(book_ids, ["markdown"]).stream(), statements)
+    
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,95 @@
+"""
+Benchmark chapter lookup and status aggregation with and without indexes
+
+Seeds 100k books and measures (book_id, chapter_number) lookups and the
+status endpoint query before and after the composite indexes. Run from
+backend/:
+
+    python -m benchmarks.bench_chapter_indexes
+"""
+import os
+import random
+import tempfile
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bookforge_bench_'), 'bench.db')}"
+
+from sqlalchemy import func, insert, select, text  # noqa: E402
+from app.core.database import engine, init_db  # noqa: E402
+from app.models import book, chapter, source, agent_log, chapter_memory  # noqa: E402,F401
+from app.models.book import Book  # noqa: E402
+from app.models.chapter import Chapter  # noqa: E402
+
+BOOKS = 100_000
+CHAPTERS_PER_BOOK = 10
+SAMPLES = 200
+STATUSES = ["pending", "generating", "complete", "failed"]
+
+
+def seed():
+    with engine.begin() as conn:
+        conn.execute(insert(Book), [
+            {"id": i, "book_idea": f"Book {i}", "genre": "technical", "chapters_count": CHAPTERS_PER_BOOK,
+             "words_per_chapter": 2500, "tone": "professional", "status": "generating"}
+            for i in range(1, BOOKS + 1)
+        ])
+        batch = []
+        for book_id in range(1, BOOKS + 1):
+            for number in range(1, CHAPTERS_PER_BOOK + 1):
+                batch.append({"book_id": book_id, "chapter_number": number, "title": f"Chapter {number}",
+                              "status": random.choice(STATUSES), "word_count": 0})
+            if len(batch) >= 50_000:
+                conn.execute(insert(Chapter), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(Chapter), batch)
+
+
+def timed(fn) -> float:
+    """Average milliseconds per call over SAMPLES random books"""
+    book_ids = [random.randint(1, BOOKS) for _ in range(SAMPLES)]
+    with engine.connect() as conn:
+        start = time.perf_counter()
+        for book_id in book_ids:
+            fn(conn, book_id)
+        return (time.perf_counter() - start) * 1000 / SAMPLES
+
+
+def lookup(conn, book_id):
+    conn.execute(
+        select(Chapter.id).where(Chapter.book_id == book_id, Chapter.chapter_number == CHAPTERS_PER_BOOK // 2)
+    ).first()
+
+
+def status_in_python(conn, book_id):
+    statuses = conn.execute(select(Chapter.status).where(Chapter.book_id == book_id)).scalars().all()
+    return len(statuses), sum(1 for s in statuses if s == "complete")
+
+
+def status_group_by(conn, book_id):
+    counts = dict(conn.execute(
+        select(Chapter.status, func.count()).where(Chapter.book_id == book_id).group_by(Chapter.status)
+    ).all())
+    return sum(counts.values()), counts.get("complete", 0)
+
+
+if __name__ == "__main__":
+    init_db()
+    start = time.perf_counter()
+    seed()
+    print(f"seeded {BOOKS} books / {BOOKS * CHAPTERS_PER_BOOK} chapters in {time.perf_counter() - start:.1f}s")
+
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_chapters_book_id_chapter_number"))
+        conn.execute(text("DROP INDEX ix_chapters_book_id_status"))
+    before = (timed(lookup), timed(status_in_python))
+
+    with engine.begin() as conn:
+        for index in Chapter.__table__.indexes:
+            index.create(conn, checkfirst=True)
+    after = (timed(lookup), timed(status_group_by))
+
+    print(f"{'':<20}{'before':>12}{'after':>12}")
+    print(f"{'chapter lookup':<20}{before[0]:>10.3f}ms{after[0]:>10.3f}ms")
+    print(f"{'status aggregation':<20}{before[1]:>10.3f}ms{after[1]:>10.3f}ms")
@@ -0,0 +1,90 @@
+"""
+Benchmark database size and read latency of compressed chapter content
+
+Writes the same synthetic corpus into a plain Text column and a
+CompressedText column, then compares file size and per-chapter read time.
+Run from backend/:
+
+    python -m benchmarks.bench_content_compression
+"""
+import os
+import random
+import tempfile
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+from sqlalchemy import Column, Integer, MetaData, Table, Text, create_engine, select, text  # noqa: E402
+from app.core.types import CompressedText, zstandard  # noqa: E402
+
+BOOKS = 20
+CHAPTERS = 30
+WORDS_PER_CHAPTER = 5000
+READS = 300
+
+random.seed(42)
+VOCABULARY = [
+    "".join(random.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(random.randint(2, 10)))
+    for _ in range(5000)
+]
+WEIGHTS = [1 / (rank + 1) for rank in range(len(VOCABULARY))]  # Zipf-like word frequencies
+
+
+def make_chapter(number: int) -> str:
+    """Build a markdown chapter with headings, paragraphs and lists"""
+    parts = [f"# Chapter {number}\n"]
+    words = 0
+    while words < WORDS_PER_CHAPTER:
+        if random.random() < 0.1:
+            parts.append(f"## {' '.join(random.choices(VOCABULARY, WEIGHTS, k=4)).title()}\n")
+        if random.random() < 0.2:
+            items = [f"- {' '.join(random.choices(VOCABULARY, WEIGHTS, k=8))}" for _ in range(4)]
+            parts.append("\n".join(items) + "\n")
+            words += 32
+        sentence_count = random.randint(3, 7)
+        sentences = [
+            " ".join(random.choices(VOCABULARY, WEIGHTS, k=random.randint(8, 20))).capitalize() + "."
+            for _ in range(sentence_count)
+        ]
+        paragraph = " ".join(sentences)
+        parts.append(paragraph + "\n")
+        words += len(paragraph.split())
+    return "\n".join(parts)
+
+
+def run(label: str, column_type, corpus: list, directory: str):
+    path = os.path.join(directory, f"{label}.db")
+    engine = create_engine(f"sqlite:///{path}")
+    metadata = MetaData()
+    table = Table("chapters", metadata, Column("id", Integer, primary_key=True), Column("content_markdown", column_type))
+    metadata.create_all(engine)
+
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        conn.execute(table.insert(), [{"id": i + 1, "content_markdown": body} for i, body in enumerate(corpus)])
+    write_s = time.perf_counter() - start
+
+    with engine.connect() as conn:
+        conn.execute(text("VACUUM"))
+    size_mb = os.path.getsize(path) / 1024 / 1024
+
+    ids = [random.randint(1, len(corpus)) for _ in range(READS)]
+    with engine.connect() as conn:
+        start = time.perf_counter()
+        for row_id in ids:
+            conn.execute(select(table.c.content_markdown).where(table.c.id == row_id)).scalar_one()
+        read_ms = (time.perf_counter() - start) * 1000 / READS
+
+    engine.dispose()
+    print(f"{label:<12} size={size_mb:>8.2f} MB  write={write_s:>6.2f}s  read={read_ms:>6.3f} ms/chapter")
+
+
+if __name__ == "__main__":
+    corpus = [make_chapter(n % CHAPTERS + 1) for n in range(BOOKS * CHAPTERS)]
+    total_mb = sum(len(body.encode()) for body in corpus) / 1024 / 1024
+    print(f"corpus: {len(corpus)} chapters, {total_mb:.1f} MB of markdown "
+          f"(codec: {'zstd' if zstandard else 'zlib'})")
+
+    directory = tempfile.mkdtemp(prefix="bookforge_bench_")
+    run("plain", Text, corpus, directory)
+    run("compressed", CompressedText, corpus, directory)
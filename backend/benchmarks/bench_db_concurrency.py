@@ -0,0 +1,134 @@
+"""
+Benchmark read/write throughput under parallel chapter generation
+
+Compares a default SQLite engine with the tuned engine from create_db_engine
+plus the single-writer queue. Run from backend/:
+
+    python -m benchmarks.bench_db_concurrency
+"""
+import asyncio
+import os
+import tempfile
+import threading
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+_tmp_dir = tempfile.mkdtemp(prefix="bookforge_bench_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir, 'tuned.db')}"
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from app.core.database import Base, engine as tuned_engine, SessionLocal  # noqa: E402
+from app.core.db_writer import db_writer  # noqa: E402
+from app.models import book, chapter, source, agent_log, chapter_memory  # noqa: E402,F401
+from app.models.book import Book  # noqa: E402
+from app.models.chapter import Chapter  # noqa: E402
+
+CHAPTERS = 30
+WRITERS = 8
+READERS = 8
+DURATION = 5.0
+CONTENT = "lorem ipsum dolor sit amet " * 2000
+
+
+def seed(session_factory) -> list:
+    """Create one book with CHAPTERS chapters and return chapter ids"""
+    db = session_factory()
+    b = Book(book_idea="Benchmark book", genre="technical", chapters_count=CHAPTERS, words_per_chapter=2500, tone="professional")
+    db.add(b)
+    db.flush()
+    chapters = [Chapter(book_id=b.id, chapter_number=i, title=f"Chapter {i}") for i in range(1, CHAPTERS + 1)]
+    db.add_all(chapters)
+    db.commit()
+    ids = [c.id for c in chapters]
+    db.close()
+    return ids
+
+
+def read_loop(session_factory, book_id: int, stop: threading.Event, counts: dict):
+    """Poll the status endpoint's query until stopped"""
+    while not stop.is_set():
+        db = session_factory()
+        try:
+            db.query(Chapter.status).filter(Chapter.book_id == book_id).all()
+            counts["reads"] += 1
+        except Exception:
+            counts["read_errors"] += 1
+        finally:
+            db.close()
+
+
+def direct_write_loop(session_factory, chapter_ids: list, stop: threading.Event, counts: dict):
+    """Each writer commits through its own session, like the old background tasks"""
+    i = 0
+    while not stop.is_set():
+        db = session_factory()
+        try:
+            db.query(Chapter).filter(Chapter.id == chapter_ids[i % len(chapter_ids)]).update(
+                {"status": "generating", "content_markdown": CONTENT}, synchronize_session=False
+            )
+            db.commit()
+            counts["writes"] += 1
+        except Exception:
+            counts["write_errors"] += 1
+        finally:
+            db.close()
+        i += 1
+
+
+async def queued_write_loop(chapter_ids: list, stop: threading.Event, counts: dict, offset: int):
+    """Writers submit through the shared single-writer queue"""
+    i = offset
+    while not stop.is_set():
+        try:
+            await db_writer.update(Chapter, chapter_ids[i % len(chapter_ids)], status="generating", content_markdown=CONTENT)
+            counts["writes"] += 1
+        except Exception:
+            counts["write_errors"] += 1
+        i += 1
+
+
+def run(label: str, session_factory, queued: bool):
+    chapter_ids = seed(session_factory)
+    counts = {"reads": 0, "writes": 0, "read_errors": 0, "write_errors": 0}
+    stop = threading.Event()
+    readers = [threading.Thread(target=read_loop, args=(session_factory, 1, stop, counts)) for _ in range(READERS)]
+    for t in readers:
+        t.start()
+
+    if queued:
+        async def main():
+            tasks = [asyncio.create_task(queued_write_loop(chapter_ids, stop, counts, n)) for n in range(WRITERS)]
+            await asyncio.sleep(DURATION)
+            stop.set()
+            await asyncio.gather(*tasks)
+        asyncio.run(main())
+    else:
+        writers = [threading.Thread(target=direct_write_loop, args=(session_factory, chapter_ids, stop, counts)) for _ in range(WRITERS)]
+        for t in writers:
+            t.start()
+        time.sleep(DURATION)
+        stop.set()
+        for t in writers:
+            t.join()
+
+    for t in readers:
+        t.join()
+
+    print(
+        f"{label:<28} reads/s={counts['reads'] / DURATION:>9.1f} writes/s={counts['writes'] / DURATION:>8.1f} "
+        f"read_errors={counts['read_errors']} write_errors={counts['write_errors']}"
+    )
+
+
+if __name__ == "__main__":
+    default_engine = create_engine(
+        f"sqlite:///{os.path.join(_tmp_dir, 'default.db')}",
+        connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(bind=default_engine)
+    Base.metadata.create_all(bind=tuned_engine)
+
+    run("default engine", sessionmaker(bind=default_engine), queued=False)
+    run("tuned engine + writer queue", SessionLocal, queued=True)
+    db_writer.stop()
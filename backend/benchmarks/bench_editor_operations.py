@@ -0,0 +1,66 @@
+"""
+Benchmark the editor's output size in rewrite and operations mode
+
+Makes light copy edits (one every ~250 words) to a 10k-word chapter and
+compares what the editor has to generate: the whole edited chapter
+(rewrite mode) or a JSON list of find/replace edits (operations mode).
+Output tokens dominate editor latency and cost. Also times parsing and
+applying the edits locally and checks the result equals the rewrite.
+Live latency and token usage per mode are reported under "editing:rewrite"
+and "editing:operations" at GET /health/stages. Run from backend/:
+
+    python -m benchmarks.bench_editor_operations
+"""
+import json
+import os
+import random
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+from app.agents.edit_operations import apply_edit_operations, parse_edit_operations  # noqa: E402
+from app.agents.quality_gate import estimate_tokens  # noqa: E402
+
+WORDS = 10000
+EDIT_EVERY = 250
+RUNS = 50
+
+random.seed(13)
+VOCABULARY = [
+    "".join(random.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(random.randint(2, 10)))
+    for _ in range(3000)
+]
+
+
+def make_edits(words: list) -> tuple:
+    """Original chapter, edited chapter and the edits as the editor would return them"""
+    edited = list(words)
+    edits = []
+    for index in range(EDIT_EVERY // 2, len(words) - 3, EDIT_EVERY):
+        edited[index] = random.choice(VOCABULARY)
+        # Surrounding words make each "find" unique
+        edits.append({
+            "find": " ".join(words[index - 3:index + 4]),
+            "replace": " ".join(edited[index - 3:index + 4]),
+        })
+    return " ".join(words), " ".join(edited), json.dumps(edits)
+
+
+def main():
+    original, edited, response = make_edits(random.choices(VOCABULARY, k=WORDS))
+    
+    start = time.perf_counter()
+    for _ in range(RUNS):
+        result = apply_edit_operations(original, parse_edit_operations(response))
+    elapsed = (time.perf_counter() - start) / RUNS
+    assert result == edited, "applied edits differ from the rewritten chapter"
+    
+    edits = len(json.loads(response))
+    print(f"chapter: {WORDS} words, {edits} edits")
+    print(f"rewrite mode      output ~{estimate_tokens(edited):>6} tokens")
+    print(f"operations mode   output ~{estimate_tokens(response):>6} tokens  "
+          f"({estimate_tokens(response) / estimate_tokens(edited):.0%}), applied locally in {elapsed * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
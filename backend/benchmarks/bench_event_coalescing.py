@@ -0,0 +1,102 @@
+"""
+Benchmark coalescing and wire encodings for high-frequency progress events
+
+Publishes a burst of agent_status / chapter_progress events (several agents
+reporting every millisecond, as with streamed generation) plus occasional
+chapter updates, and reports how many messages and bytes one client
+receives with and without coalescing, as JSON and msgpack, raw and with
+permessage-deflate (a shared zlib stream flushed per message, as the
+WebSocket extension does with context takeover). Run from backend/:
+
+    python -m benchmarks.bench_event_coalescing
+"""
+import asyncio
+import os
+import time
+import zlib
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+from app.services.connection_manager import encode_message, msgpack  # noqa: E402
+from app.services.event_bus import BookEvent  # noqa: E402
+from app.services.event_coalescer import EventCoalescer  # noqa: E402
+
+BOOK_ID = 1
+AGENTS = ["research_agent", "writing_agent", "editing_agent", "formatting_agent"]
+TICKS = 2000
+CHAPTERS = 10
+WINDOW = 0.05
+
+
+def generate_events():
+    """Events of one generation run, one batch per millisecond tick"""
+    seq = 0
+    per_chapter = TICKS // CHAPTERS
+    for tick in range(TICKS):
+        batch = []
+        chapter_id = tick // per_chapter + 1
+        for agent in AGENTS:
+            seq += 1
+            batch.append(BookEvent(BOOK_ID, seq, "agent_status", {
+                "agent_name": agent, "status": "active",
+                "current_task": f"Chapter {chapter_id}: {tick * 37 % 5000} words"
+            }))
+        seq += 1
+        batch.append(BookEvent(BOOK_ID, seq, "chapter_progress", {
+            "chapter_id": chapter_id, "status": "generating",
+            "progress_percent": (tick % per_chapter) * 100 // per_chapter
+        }))
+        if tick % per_chapter == per_chapter - 1:
+            seq += 1
+            batch.append(BookEvent(BOOK_ID, seq, "chapter_update", {
+                "chapter_number": chapter_id, "status": "complete"
+            }))
+        yield batch
+
+
+async def collect(window: float) -> list:
+    """Messages a client receives with the given coalescing window"""
+    received = []
+    coalescer = EventCoalescer(lambda event: received.append(event.to_message()), window=window)
+    for batch in generate_events():
+        for event in batch:
+            coalescer.push(event)
+        await asyncio.sleep(0.001)
+    await asyncio.sleep(window * 2)
+    return received
+
+
+def wire_bytes(messages: list, encoding: str, deflate: bool) -> int:
+    """Bytes on the wire for a message sequence"""
+    compressor = zlib.compressobj(wbits=-15) if deflate else None
+    total = 0
+    for message in messages:
+        payload = encode_message(message, encoding)
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        if compressor is not None:
+            payload = compressor.compress(payload) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        total += len(payload)
+    return total
+
+
+async def main():
+    encodings = ["json"] + (["msgpack"] if msgpack is not None else [])
+    if msgpack is None:
+        print("msgpack not installed: skipping msgpack rows")
+    
+    for label, window in (("no coalescing", 0), (f"coalesce {WINDOW * 1000:.0f}ms", WINDOW)):
+        start = time.perf_counter()
+        messages = await collect(window)
+        elapsed = time.perf_counter() - start
+        chapters = sum(1 for m in messages if m["type"] == "chapter_update")
+        print(f"{label:<15} messages={len(messages):>6} chapter_updates={chapters:>3} ({elapsed:.2f}s run)")
+        for encoding in encodings:
+            for deflate in (False, True):
+                size = wire_bytes(messages, encoding, deflate)
+                name = encoding + ("+deflate" if deflate else "")
+                print(f"    {name:<16} {size / 1024:>9.1f} KiB")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
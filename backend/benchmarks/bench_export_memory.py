@@ -0,0 +1,159 @@
+"""
+Benchmark peak memory of book exports
+
+Seeds a 30 x 10k-word book and exports it as markdown and HTML twice:
+the previous way (load every chapter, build the document with +=) and
+through the streaming generators used by the export routes. Reports
+Python peak memory (tracemalloc), time to first chunk and total time,
+and checks both produce identical output. The EPUB export is measured
+streaming only. The rendered-HTML cache is limited to one chapter so it
+does not count towards the streaming peak. Run from backend/:
+
+    python -m benchmarks.bench_export_memory
+"""
+import asyncio
+import hashlib
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bookforge_bench_'), 'bench.db')}"
+
+from sqlalchemy import select  # noqa: E402
+from sqlalchemy.orm import undefer  # noqa: E402
+from app.core.database import AsyncSessionLocal, SessionLocal, async_engine, init_db  # noqa: E402
+from app.models import book, chapter, source, agent_log, chapter_memory  # noqa: E402,F401
+from app.models.book import Book  # noqa: E402
+from app.models.chapter import Chapter  # noqa: E402
+from app.api.routes.export import get_exportable_book  # noqa: E402
+from app.services.book_export import HTML_HEADER, render_epub, render_html, render_markdown  # noqa: E402
+from app.services.markdown_renderer import html_cache, render_markdown_html  # noqa: E402
+
+CHAPTERS = 30
+WORDS = 10000
+
+random.seed(7)
+VOCABULARY = [
+    "".join(random.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(random.randint(2, 10)))
+    for _ in range(3000)
+]
+
+
+def make_chapter(number: int) -> str:
+    """Markdown chapter of WORDS words in short paragraphs"""
+    paragraphs = [f"# Chapter {number}"]
+    for _ in range(WORDS // 100):
+        paragraphs.append(" ".join(random.choices(VOCABULARY, k=100)) + ".")
+    return "\n\n".join(paragraphs)
+
+
+def seed() -> int:
+    db = SessionLocal()
+    b = Book(book_idea="Export benchmark", genre="technical", chapters_count=CHAPTERS,
+             words_per_chapter=WORDS, tone="professional")
+    db.add(b)
+    db.flush()
+    db.add_all([
+        Chapter(book_id=b.id, chapter_number=i, title=f"Chapter {i}", content_markdown=make_chapter(i), status="complete")
+        for i in range(1, CHAPTERS + 1)
+    ])
+    db.commit()
+    book_id = b.id
+    db.close()
+    return book_id
+
+
+async def load_book(book_id: int) -> tuple:
+    async with AsyncSessionLocal() as db:
+        return await get_exportable_book(db, book_id)
+
+
+async def baseline_markdown(book: Book) -> str:
+    """Previous implementation: every chapter in memory, document built with +="""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Chapter).options(undefer(Chapter.content_markdown))
+            .where(Chapter.book_id == book.id, Chapter.status == "complete")
+            .order_by(Chapter.chapter_number)
+        )
+        chapters = result.scalars().all()
+    markdown = f"# {book.title or book.book_idea}\n\n"
+    markdown += f"**Genre:** {book.genre}\n\n"
+    markdown += f"**Description:** {book.description or ''}\n\n"
+    markdown += "---\n\n"
+    for ch in chapters:
+        markdown += f"## {ch.title}\n\n"
+        if ch.content_markdown:
+            markdown += f"{ch.content_markdown}\n\n"
+        markdown += "---\n\n"
+    return markdown
+
+
+async def baseline_html(book: Book) -> str:
+    """Buffered HTML export: every chapter in memory, document built with +="""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Chapter).options(undefer(Chapter.content_markdown))
+            .where(Chapter.book_id == book.id, Chapter.status == "complete")
+            .order_by(Chapter.chapter_number)
+        )
+        chapters = result.scalars().all()
+    html = HTML_HEADER.format(title=book.book_idea, genre=book.genre, description=book.description or '')
+    for ch in chapters:
+        html += f"<h2>{ch.title}</h2>\n"
+        if ch.content_markdown:
+            html += f"<div>{render_markdown_html(ch.content_markdown)}</div>\n"
+        html += "<hr>\n"
+    html += "</body></html>"
+    return html
+
+
+async def measure(label: str, produce) -> str:
+    """Run an export, discarding chunks as a socket would; return the output digest"""
+    digest = hashlib.sha256()
+    size = 0
+    tracemalloc.start()
+    start = time.perf_counter()
+    first = None
+    async for chunk in produce():
+        if first is None:
+            first = time.perf_counter() - start
+        data = chunk.encode("utf-8") if isinstance(chunk, str) else chunk
+        digest.update(data)
+        size += len(data)
+        del chunk, data
+    total = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<20} size={size / 1024 / 1024:>6.2f} MB  peak={peak / 1024 / 1024:>7.2f} MB  "
+          f"first chunk={first * 1000:>7.1f} ms  total={total * 1000:>7.1f} ms")
+    return digest.hexdigest()
+
+
+async def main():
+    init_db()
+    book_id = seed()
+    html_cache.max_bytes = 0
+    book, chapters = await load_book(book_id)
+    
+    async def once(build):
+        yield await build(book)
+    
+    for name, baseline, streaming in (
+        ("markdown", baseline_markdown, lambda b: render_markdown(b, chapters)),
+        ("html", baseline_html, lambda b: render_html(b, chapters)),
+    ):
+        before = await measure(f"{name} (buffered)", lambda: once(baseline))
+        after = await measure(f"{name} (streaming)", lambda: streaming(book))
+        assert before == after, f"{name} export output changed"
+    
+    await measure("epub (streaming)", lambda: render_epub(book, chapters))
+    
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,96 @@
+"""
+Benchmark FormatAgent throughput
+
+A 10k-word chapter mixing headings, lists and code is formatted with the
+previous implementation (a line pass plus four whole-document re.sub
+passes) and the single-pass formatter. Output is checked against the
+golden corpus by tests/test_format_agent.py. Run from backend/:
+
+    python -m benchmarks.bench_format_agent
+"""
+import random
+import re
+import time
+
+from app.agents.format_agent import FormatAgent
+
+WORDS = 10000
+RUNS = 20
+
+random.seed(3)
+VOCABULARY = [
+    "".join(random.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(random.randint(2, 10)))
+    for _ in range(3000)
+]
+
+
+def baseline_format(content: str) -> str:
+    """Previous implementation"""
+    lines = content.split('\n')
+    formatted_lines = []
+    
+    for line in lines:
+        if line.strip() == '':
+            if formatted_lines and formatted_lines[-1].strip() != '':
+                formatted_lines.append(line)
+            continue
+        
+        if line.startswith('#'):
+            if formatted_lines and formatted_lines[-1].strip() != '':
+                formatted_lines.append('')
+            formatted_lines.append(line)
+        else:
+            formatted_lines.append(line)
+    
+    content = '\n'.join(formatted_lines)
+    content = re.sub(r' +\n', '\n', content)
+    content = re.sub(r'\n(\d+\.)', r'\n\n\1', content)
+    content = re.sub(r'\n(-|\*)', r'\n\n\1', content)
+    content = re.sub(r'\n{3,}', '\n\n', content)
+    return content.strip()
+
+
+def make_chapter() -> str:
+    parts = ["# Chapter"]
+    total = 0
+    while total < WORDS:
+        kind = random.random()
+        if kind < 0.1:
+            parts.append(f"## {' '.join(random.choices(VOCABULARY, k=4))}  ")
+        elif kind < 0.25:
+            parts.append("\n".join(f"{i}. {' '.join(random.choices(VOCABULARY, k=8))}" for i in range(1, 6)))
+            total += 40
+        elif kind < 0.3:
+            parts.append("```\n" + "\n".join(" ".join(random.choices(VOCABULARY, k=5)) for _ in range(6)) + "\n```")
+        else:
+            parts.append("\n".join(" ".join(random.choices(VOCABULARY, k=12)) + " " for _ in range(5)))
+            total += 60
+    return "\n\n\n".join(parts)
+
+
+def measure(label: str, format_text, text: str):
+    start = time.perf_counter()
+    for _ in range(RUNS):
+        format_text(text)
+    elapsed = (time.perf_counter() - start) / RUNS
+    print(f"{label:<22} {elapsed * 1000:>7.2f} ms/chapter  {len(text) / elapsed / 1024 / 1024:>7.1f} MB/s")
+
+
+def main():
+    chapter = make_chapter()
+    print(f"chapter: {len(chapter) / 1024:.0f} KB")
+    measure("previous (5 passes)", baseline_format, chapter)
+    measure("single pass", FormatAgent.format_chapter, chapter)
+    
+    # Token-sized pieces, as an LLM stream delivers them
+    chunks = [chapter[i:i + 16] for i in range(0, len(chapter), 16)]
+    
+    def streamed(_):
+        formatter = FormatAgent()
+        return "".join(formatter.feed(chunk) for chunk in chunks) + formatter.finish()
+    
+    measure("single pass, streamed", streamed, chapter)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Benchmark HTML export with the rendered-chapter cache cold and warm
+
+Seeds a 30 x 10k-word book of markdown with headings, lists, emphasis,
+code blocks and tables, then times the HTML export generator with an
+empty cache (every chapter loaded and rendered) and again with a warm
+cache (fragments concatenated, no chapter bodies read). Run from backend/:
+
+    python -m benchmarks.bench_html_export_cache
+"""
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bookforge_bench_'), 'bench.db')}"
+
+from sqlalchemy import event  # noqa: E402
+from app.core.database import AsyncSessionLocal, SessionLocal, async_engine, init_db  # noqa: E402
+from app.models import book, chapter, source, agent_log, chapter_memory  # noqa: E402,F401
+from app.models.book import Book  # noqa: E402
+from app.models.chapter import Chapter  # noqa: E402
+from app.api.routes.export import get_exportable_book  # noqa: E402
+from app.services.book_export import render_html  # noqa: E402
+from app.services.markdown_renderer import content_hash, html_cache  # noqa: E402
+
+CHAPTERS = 30
+WORDS = 10000
+RUNS = 5
+
+random.seed(11)
+VOCABULARY = [
+    "".join(random.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(random.randint(2, 10)))
+    for _ in range(3000)
+]
+
+
+def words(count: int) -> str:
+    return " ".join(random.choices(VOCABULARY, k=count))
+
+
+def make_chapter(number: int) -> str:
+    """Markdown chapter mixing the constructs the renderer handles"""
+    parts = [f"# Chapter {number}"]
+    total = 0
+    while total < WORDS:
+        kind = random.random()
+        if kind < 0.1:
+            parts.append(f"## {words(4).title()}")
+        elif kind < 0.2:
+            parts.append("\n".join(f"- {words(8)} **{words(2)}**" for _ in range(5)))
+            total += 50
+        elif kind < 0.25:
+            parts.append("```python\n" + "\n".join(f"{w} = compute({w!r})" for w in random.choices(VOCABULARY, k=6)) + "\n```")
+        elif kind < 0.3:
+            rows = [f"| {words(1)} | {words(1)} | {random.randint(1, 999)} |" for _ in range(5)]
+            parts.append("| Term | Meaning | Value |\n|---|---|---|\n" + "\n".join(rows))
+            total += 15
+        else:
+            parts.append(f"{words(40)} *{words(3)}* {words(40)} `{words(1)}`.")
+            total += 84
+    return "\n\n".join(parts)
+
+
+def seed() -> int:
+    db = SessionLocal()
+    b = Book(book_idea="HTML cache benchmark", genre="technical", chapters_count=CHAPTERS,
+             words_per_chapter=WORDS, tone="professional")
+    db.add(b)
+    db.flush()
+    for i in range(1, CHAPTERS + 1):
+        body = make_chapter(i)
+        db.add(Chapter(book_id=b.id, chapter_number=i, title=f"Chapter {i}", content_markdown=body,
+                       content_hash=content_hash(body), status="complete"))
+    db.commit()
+    book_id = b.id
+    db.close()
+    return book_id
+
+
+async def export(book: Book, chapters: list) -> tuple:
+    """Run the HTML export, returning (seconds, bytes, chapter bodies read)"""
+    bodies = []
+    
+    def count(conn, cursor, statement, parameters, context, executemany):
+        if "content_markdown" in statement:
+            bodies.append(statement)
+    
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count)
+    start = time.perf_counter()
+    size = 0
+    async for chunk in render_html(book, chapters):
+        size += len(chunk)
+    elapsed = time.perf_counter() - start
+    event.remove(async_engine.sync_engine, "before_cursor_execute", count)
+    return elapsed, size, len(bodies)
+
+
+async def main():
+    init_db()
+    book_id = seed()
+    async with AsyncSessionLocal() as db:
+        b, chapters = await get_exportable_book(db, book_id)
+    
+    cold, warm = [], []
+    for _ in range(RUNS):
+        html_cache.clear()
+        cold.append(await export(b, chapters))
+        warm.append(await export(b, chapters))
+    
+    for label, runs in (("cold", cold), ("warm", warm)):
+        best = min(runs)
+        print(f"{label:<5} best={best[0] * 1000:>8.1f} ms  size={best[1] / 1024 / 1024:.2f} MB  "
+              f"body queries={best[2]}")
+    print(f"speedup: {min(cold)[0] / min(warm)[0]:.0f}x")
+    
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,162 @@
+"""
+Benchmark prompt tokens billed with and without preamble caching
+
+Generates chapters of a research-heavy book (its preamble carries a
+research digest long enough to be cached) through the orchestrator's writing, content and editor stages against a
+local fake Gemini backend that implements system instructions and context
+caching and reports usage the way the API does. Compares sending the
+preamble inline with every call to caching it once per book and agent, and
+checks that caches are reused and released. Cached tokens are billed at
+CACHED_TOKEN_RATE of the normal input price. Run from backend/:
+
+    python -m benchmarks.bench_prompt_cache
+"""
+import asyncio
+import os
+import random
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+import google.generativeai as genai  # noqa: E402
+
+from app.agents.orchestrator import BookGenerationOrchestrator  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.services import prompt_cache as prompt_cache_module  # noqa: E402
+from app.services.context_packer import count_tokens  # noqa: E402
+from app.services.prompt_cache import PromptCache  # noqa: E402
+
+CHAPTERS = 10
+CONCEPT_WORDS = 600
+RESEARCH_DOCUMENTS = 60
+RESEARCH_WORDS = 80
+CACHED_TOKEN_RATE = 0.25
+
+random.seed(3)
+VOCABULARY = [
+    "".join(random.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(random.randint(2, 10)))
+    for _ in range(3000)
+]
+
+
+class FakeUsage:
+    def __init__(self, prompt_tokens: int, cached_tokens: int, output_tokens: int):
+        self.prompt_token_count = prompt_tokens
+        self.cached_content_token_count = cached_tokens
+        self.candidates_token_count = output_tokens
+
+
+class FakeResponse:
+    def __init__(self, text: str, usage: FakeUsage):
+        self.text = text
+        self.usage_metadata = usage
+
+
+class FakeCachedContent:
+    """Provider-side cache: holds a system instruction until deleted"""
+    live = {}
+    created = 0
+    
+    def __init__(self, name: str, system_instruction: str):
+        self.name = name
+        self.system_instruction = system_instruction
+    
+    @classmethod
+    def create(cls, model: str, display_name: str, system_instruction: str, ttl):
+        cls.created += 1
+        cache = cls(f"cachedContents/{cls.created}", system_instruction)
+        cls.live[cache.name] = cache
+        return cache
+    
+    def delete(self):
+        FakeCachedContent.live.pop(self.name, None)
+
+
+class FakeModel:
+    """Bills the system instruction as prompt tokens, cached if it came from a cache"""
+    
+    def __init__(self, model_name: str = "", system_instruction: str = None, cached_content=None):
+        self.system_instruction = system_instruction
+        self.cached_content = cached_content
+    
+    @classmethod
+    def from_cached_content(cls, cached_content):
+        assert cached_content.name in FakeCachedContent.live, "cache used after delete"
+        return cls(cached_content=cached_content)
+    
+    def generate_content(self, prompt: str) -> FakeResponse:
+        instruction = self.cached_content.system_instruction if self.cached_content else self.system_instruction
+        instruction_tokens = count_tokens(instruction or "")
+        text = "# Chapter\n\n## One\n\nText. " * 40 if "JSON array of edits" not in prompt else "[]"
+        return FakeResponse(text, FakeUsage(
+            instruction_tokens + count_tokens(prompt),
+            instruction_tokens if self.cached_content else 0,
+            count_tokens(text),
+        ))
+
+
+def make_text(words: int) -> str:
+    return " ".join(" ".join(random.choices(VOCABULARY, k=12)).capitalize() + "." for _ in range(words // 12))
+
+
+def make_book_config() -> dict:
+    return {
+        'book_idea': 'A field guide',
+        'description': make_text(CONCEPT_WORDS),
+        'genre': 'technical', 'tone': 'professional', 'target_audience': 'engineers', 'words_per_chapter': 1000,
+    }
+
+
+def make_research() -> list:
+    return [
+        {'text': make_text(RESEARCH_WORDS), 'metadata': {'title': f'Source {n}', 'chapter_id': n % CHAPTERS}}
+        for n in range(RESEARCH_DOCUMENTS)
+    ]
+
+
+async def generate_book(cache: PromptCache, preamble: str) -> dict:
+    orchestrator = BookGenerationOrchestrator()
+    orchestrator.prompt_cache = cache
+    totals = {'prompt_tokens': 0, 'cached_tokens': 0}
+    for number in range(1, CHAPTERS + 1):
+        details = {}
+        await orchestrator._simple_llm_call(
+            orchestrator.writing_agent, f"Write chapter {number}.", usage=details, book_id=1, preamble=preamble
+        )
+        await orchestrator._edit_chapter(
+            "# Chapter\n\n## One\n\nText.", 'professional', details, book_id=1, preamble=preamble
+        )
+        for key in totals:
+            totals[key] += details.get(key, 0)
+    return totals
+
+
+def billed(totals: dict) -> float:
+    return totals['prompt_tokens'] - totals['cached_tokens'] * (1 - CACHED_TOKEN_RATE)
+
+
+async def main():
+    genai.GenerativeModel = FakeModel
+    prompt_cache_module.genai.GenerativeModel = FakeModel
+    prompt_cache_module.caching.CachedContent = FakeCachedContent
+    settings.editor_section_words = 0
+    
+    preamble = prompt_cache_module.book_preamble(make_book_config(), make_research())
+    assert "Research digest:" in preamble, "research should take the preamble to the caching minimum"
+    inline = await generate_book(PromptCache(enabled=False), preamble)
+    cache = PromptCache(ttl=600, min_tokens=settings.prompt_cache_min_tokens)
+    cached = await generate_book(cache, preamble)
+    stats = cache.snapshot()
+    await cache.release(1)
+    
+    calls = CHAPTERS * 2
+    print(f"{CHAPTERS} chapters, {calls} calls, book preamble {count_tokens(preamble)} tokens")
+    print(f"inline preamble   prompt tokens {inline['prompt_tokens']:>8}  billed {billed(inline):>10.0f}")
+    print(f"cached preamble   prompt tokens {cached['prompt_tokens']:>8}  billed {billed(cached):>10.0f}  "
+          f"({cached['cached_tokens']} from cache, {billed(cached) / billed(inline):.0%} of inline)")
+    print(f"caches created {stats['created']}, reused {stats['reused']}; live after release: {len(FakeCachedContent.live)}")
+    assert stats['created'] == 2 and stats['reused'] == calls - 2, "each agent's preamble should be cached once"
+    assert not FakeCachedContent.live, "caches should be deleted on release"
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,76 @@
+"""
+Benchmark the quality gate's chapter analysis
+
+Times QualityGate.analyze on a 10k-word chapter and compares the
+vectorized word/sentence/syllable counts with a per-word Python loop
+doing the same counting, checking both agree. The analysis replaces up
+to two LLM calls per chapter, so it only needs to stay well under a
+second. Run from backend/:
+
+    python -m benchmarks.bench_quality_gate
+"""
+import os
+import random
+import re
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+from app.agents.quality_gate import TextStatistics, quality_gate, text_statistics  # noqa: E402
+
+WORDS = 10000
+RUNS = 20
+
+random.seed(9)
+VOCABULARY = [
+    "".join(random.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(random.randint(2, 10)))
+    for _ in range(3000)
+]
+
+WORD = re.compile(r"[A-Za-z0-9'\x80-\U0010ffff]+")
+VOWEL_GROUP = re.compile(r"[aeiouyAEIOUY]+")
+SENTENCE_END = re.compile(r"[.!?]+")
+
+
+def baseline_statistics(text: str) -> TextStatistics:
+    """Same counts, one word at a time"""
+    words = WORD.findall(text)
+    syllables = sum(max(len(VOWEL_GROUP.findall(word)), 1) for word in words)
+    sentences = len(SENTENCE_END.findall(text)) or 1
+    return TextStatistics(len(words), sentences, syllables)
+
+
+def make_chapter() -> str:
+    parts = ["# Chapter"]
+    for section in range(10):
+        parts.append(f"## Section {section}")
+        for _ in range(WORDS // 10 // 100):
+            sentences = [" ".join(random.choices(VOCABULARY, k=random.randint(8, 20))).capitalize() + "."
+                         for _ in range(7)]
+            parts.append(" ".join(sentences))
+        parts.append("\n".join(f"- {' '.join(random.choices(VOCABULARY, k=6))}" for _ in range(4)))
+    return "\n\n".join(parts)
+
+
+def measure(label: str, function, text: str):
+    start = time.perf_counter()
+    for _ in range(RUNS):
+        result = function(text)
+    print(f"{label:<26} {(time.perf_counter() - start) / RUNS * 1000:>7.2f} ms")
+    return result
+
+
+def main():
+    chapter = make_chapter()
+    print(f"chapter: {len(chapter.split())} words")
+    
+    before = measure("statistics (per word)", baseline_statistics, chapter)
+    after = measure("statistics (vectorized)", text_statistics, chapter)
+    assert before == after, f"counts differ: {before} != {after}"
+    
+    report = measure("full analysis", lambda text: quality_gate.analyze(text, WORDS), chapter)
+    print(f"reading ease {report.reading_ease}, content pass: {report.needs_content}, editor pass: {report.needs_editing}")
+
+
+if __name__ == "__main__":
+    main()
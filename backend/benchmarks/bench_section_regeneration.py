@@ -0,0 +1,74 @@
+"""
+Benchmark the cost of revising one section vs regenerating a chapter
+
+For a 2.5k-word chapter with eight sections, counts the tokens sent and
+generated to change one section: regenerating the chapter through the
+writing, content and editor stages versus regenerating just the section
+with its packed neighbours as context. Generated tokens dominate latency,
+so their ratio approximates the latency saving. Live figures are under
+"section_regeneration" at GET /health/stages. Run from backend/:
+
+    python -m benchmarks.bench_section_regeneration
+"""
+import os
+import random
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+from app.services.context_packer import ContextPacker, ContextSource, count_tokens  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.utils.markdown_sections import split_sections  # noqa: E402
+
+WORDS = 2500
+SECTIONS = 8
+# Stage prompt text around the chapter (instructions, titles), in tokens
+PROMPT_OVERHEAD = 150
+
+random.seed(8)
+VOCABULARY = [
+    "".join(random.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(random.randint(2, 10)))
+    for _ in range(3000)
+]
+
+
+def make_chapter() -> str:
+    parts = ["# Chapter"]
+    for section in range(SECTIONS):
+        parts.append(f"## Section {section}")
+        for _ in range(WORDS // SECTIONS // 100):
+            parts.append(" ".join(
+                " ".join(random.choices(VOCABULARY, k=random.randint(8, 16))).capitalize() + "." for _ in range(8)
+            ))
+    return "\n\n".join(parts)
+
+
+def main():
+    chapter = make_chapter()
+    chapter_tokens = count_tokens(chapter)
+    
+    # Full regeneration: writing generates the chapter, content reads and
+    # rewrites it, the editor reads it and returns edits (~5% of the text)
+    full_in = PROMPT_OVERHEAD * 3 + chapter_tokens * 2
+    full_out = chapter_tokens * 2 + chapter_tokens // 20
+    
+    sections = split_sections(chapter)
+    index = len(sections) // 2
+    packer = ContextPacker(settings.context_budgets)
+    packed = packer.pack("section", [
+        ContextSource("previous", sections[index - 1].text, priority=0),
+        ContextSource("next", sections[index + 1].text, priority=0),
+    ])
+    section_tokens = count_tokens(sections[index].text)
+    section_in = PROMPT_OVERHEAD + packed.tokens + section_tokens
+    section_out = section_tokens
+    
+    print(f"chapter: {len(chapter.split())} words ({chapter_tokens} tokens), {len(sections)} sections")
+    print(f"{'':<22} {'input':>8} {'output':>8}")
+    print(f"{'full regeneration':<22} {full_in:>8} {full_out:>8}")
+    print(f"{'one section':<22} {section_in:>8} {section_out:>8}")
+    print(f"section revision: {section_in / full_in:.0%} of input tokens, "
+          f"{section_out / full_out:.0%} of output tokens (~latency)")
+
+
+if __name__ == "__main__":
+    main()
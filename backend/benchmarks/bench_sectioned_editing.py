@@ -0,0 +1,102 @@
+"""
+Benchmark editor latency on a long chapter, whole vs in parallel sections
+
+Runs the editor pass (rewrite mode, where output dominates) on a 10k-word
+chapter against a simulated model whose latency grows with the number of
+tokens it generates, the way a real one does. Editing the chapter whole
+takes one long call; split on headings, the parts are edited concurrently
+and the pass takes about as long as the slowest round of parts. Live
+figures are reported under "editing:rewrite-sections" and
+"editing:operations-sections" at GET /health/stages. Run from backend/:
+
+    python -m benchmarks.bench_sectioned_editing
+"""
+import asyncio
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+import google.generativeai as genai  # noqa: E402
+
+from app.agents import orchestrator  # noqa: E402
+from app.agents.quality_gate import estimate_tokens  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.utils.markdown_sections import chunk_markdown  # noqa: E402
+
+WORDS = 10000
+# Simulated model: fixed time to first token, then per generated token
+FIRST_TOKEN_SECONDS = 0.05
+SECONDS_PER_TOKEN = 0.0001
+
+random.seed(21)
+VOCABULARY = [
+    "".join(random.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(random.randint(2, 10)))
+    for _ in range(3000)
+]
+
+
+class SimulatedResponse:
+    def __init__(self, text: str):
+        self.text = text
+        self.usage_metadata = None
+
+
+class SimulatedModel:
+    """Returns the text it was asked to edit, after a latency for its length"""
+    
+    def __init__(self, *args, **kwargs):
+        pass
+    
+    def generate_content(self, prompt: str) -> SimulatedResponse:
+        text = prompt.split("Chapter to edit:\n", 1)[1].rsplit("Provide the edited version:", 1)[0].strip()
+        time.sleep(FIRST_TOKEN_SECONDS + estimate_tokens(text) * SECONDS_PER_TOKEN)
+        return SimulatedResponse(text)
+
+
+def make_chapter() -> str:
+    parts = ["# Chapter"]
+    for section in range(8):
+        parts.append(f"## Section {section}")
+        for _ in range(WORDS // 8 // 125):
+            parts.append(" ".join(random.choices(VOCABULARY, k=125)) + ".")
+    return "\n\n".join(parts)
+
+
+async def edit(label: str, orchestrator_instance, chapter: str, section_words: int) -> float:
+    settings.editor_section_words = section_words
+    details = {}
+    start = time.perf_counter()
+    await orchestrator_instance._edit_chapter(chapter, "neutral", details)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<36} {elapsed:>6.2f} s  ({details.get('sections', 1)} parts)")
+    return elapsed
+
+
+async def main():
+    genai.GenerativeModel = SimulatedModel
+    settings.editor_mode = "rewrite"
+    instance = orchestrator.BookGenerationOrchestrator()
+    chapter = make_chapter()
+    section_words = settings.editor_section_words
+    parts = chunk_markdown(chapter, section_words)
+    
+    print(f"chapter: {len(chapter.split())} words, {len(parts)} parts of up to "
+          f"{section_words} words, llm_concurrency={settings.llm_concurrency}")
+    whole = await edit("whole chapter", instance, chapter, 0)
+    largest = max(parts, key=len)
+    single = await edit("largest part alone", instance, largest, 0)
+    sectioned = await edit("sections, shared limit", instance, chapter, section_words)
+    
+    # With enough concurrency (and threads) for every part the pass takes one round
+    orchestrator.llm_rate_limit = asyncio.Semaphore(len(parts))
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=len(parts)))
+    unlimited = await edit("sections, one round", instance, chapter, section_words)
+    print(f"speedup: {whole / sectioned:.1f}x with the shared limit, {whole / unlimited:.1f}x in one round "
+          f"({unlimited / single:.1f}x a single part)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,81 @@
+"""
+Benchmark WebSocket fan-out with deliberately slow clients
+
+One fast client, several slow clients and one stalled client watch the same
+book while a generator broadcasts status and chapter updates. Reports the
+broadcast cost seen by the generator, what each client received and which
+clients were evicted. Run from backend/:
+
+    python -m benchmarks.bench_websocket_fanout
+"""
+import asyncio
+import json
+import os
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+from app.services.connection_manager import ConnectionManager  # noqa: E402
+
+BOOK_ID = 1
+STATUS_UPDATES = 2000
+CHAPTER_UPDATES = 30
+
+
+class FakeWebSocket:
+    """Records messages, sleeping `delay` seconds per send (None = never returns)"""
+    
+    def __init__(self, name: str, delay):
+        self.name = name
+        self.delay = delay
+        self.received = []
+        self.close_code = None
+    
+    async def send_text(self, payload: str):
+        if self.delay is None:
+            await asyncio.Event().wait()
+        await asyncio.sleep(self.delay)
+        self.received.append(json.loads(payload))
+    
+    async def close(self, code: int = 1000):
+        self.close_code = code
+
+
+async def main():
+    manager = ConnectionManager(max_queue_size=100, send_timeout=1.0)
+    sockets = [FakeWebSocket("fast", 0), FakeWebSocket("slow-5ms", 0.005),
+               FakeWebSocket("slow-20ms", 0.02), FakeWebSocket("stalled", None)]
+    for ws in sockets:
+        manager.connect(ws, BOOK_ID)
+    
+    def broadcast(message_type: str, data: dict):
+        manager.broadcast(BOOK_ID, message_type, {"type": message_type, "data": data})
+    
+    start = time.perf_counter()
+    worst = 0.0
+    per_chapter = STATUS_UPDATES // CHAPTER_UPDATES
+    for i in range(STATUS_UPDATES):
+        t = time.perf_counter()
+        broadcast("agent_status", {"agent_name": "writing_agent", "status": "active", "current_task": str(i)})
+        if i % per_chapter == per_chapter - 1:
+            broadcast("chapter_update", {"chapter_number": i // per_chapter + 1, "status": "complete"})
+        worst = max(worst, time.perf_counter() - t)
+        await asyncio.sleep(0)  # let writers run, like a generator awaiting LLM calls
+    elapsed = time.perf_counter() - start
+    
+    await asyncio.sleep(2)
+    
+    print(f"broadcast: {STATUS_UPDATES} status + {CHAPTER_UPDATES} chapter updates in {elapsed * 1000:.1f}ms "
+          f"(worst single broadcast {worst * 1e6:.0f}us)")
+    for ws in sockets:
+        chapters = sum(1 for m in ws.received if m["type"] == "chapter_update")
+        statuses = sum(1 for m in ws.received if m["type"] == "agent_status")
+        print(f"{ws.name:<10} status={statuses:>5} chapters={chapters:>3} evicted={ws.close_code is not None}")
+    
+    for connections in list(manager.connections.values()):
+        for connection in list(connections):
+            await manager.disconnect(connection)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -4,11 +4,18 @@ Main FastAPI application
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-from app.core.database import init_db
-from app.api.routes import books, chapters, chat, websocket, export, ideas
+from app.core.database import init_db, async_engine
+from app.core.db_writer import db_writer
+from app.services.event_bus import event_bus
+from app.services.generation_events import generation_events
+from app.services.generation_subscribers import stage_metrics
+from app.services.book_export import export_prebuilder
+from app.services.context_packer import context_packer
+from app.services.prompt_cache import prompt_cache
+from app.api.routes import books, chapters, chat, websocket, events, export, ideas
 from app.core.config import settings
 # Import models to ensure they're registered with SQLAlchemy
-from app.models import book, chapter, source, agent_log
+from app.models import book, chapter, source, agent_log, chapter_memory
 import logging
 
 # Configure logging with structured format option
@@ -28,9 +35,16 @@ async def lifespan(app: FastAPI):
     logger.info("Initializing database...")
     init_db()
     logger.info("Database initialized")
+    await event_bus.start()
     yield
     # Shutdown
     logger.info("Shutting down...")
+    await generation_events.stop()
+    await export_prebuilder.stop()
+    await prompt_cache.close()
+    await event_bus.stop()
+    db_writer.stop()
+    await async_engine.dispose()
 
 
 # Create FastAPI app
@@ -60,6 +74,7 @@ app.include_router(books.router)
 app.include_router(chapters.router)
 app.include_router(chat.router)
 app.include_router(websocket.router)
+app.include_router(events.router)
 app.include_router(export.router)
 app.include_router(ideas.router)
 
@@ -76,6 +91,24 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/health/stages")
+async def stage_timings():
+    """Generation stage durations recorded since startup"""
+    return stage_metrics.snapshot()
+
+
+@app.get("/health/context")
+async def context_sizes():
+    """Prompt context packed per stage since startup, against each stage's budget"""
+    return context_packer.snapshot()
+
+
+@app.get("/health/prompt-cache")
+async def prompt_cache_stats():
+    """Preamble caches created and reused since startup, and the live caches per book"""
+    return prompt_cache.snapshot()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
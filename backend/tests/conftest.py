@@ -0,0 +1,67 @@
+"""
+Test settings: a throwaway database, event store and export cache per run
+
+Settings are read when app modules are first imported, so the environment
+is set here before any test module imports them.
+"""
+import asyncio
+import os
+import tempfile
+import pytest
+
+_tmp = tempfile.mkdtemp(prefix="bookforge_tests_")
+os.environ.setdefault("GEMINI_API_KEY", "test")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'test.db')}"
+os.environ["EVENT_BUS_PATH"] = os.path.join(_tmp, "events.db")
+os.environ["EXPORT_CACHE_PATH"] = os.path.join(_tmp, "export_cache")
+os.environ["CHROMA_DB_PATH"] = os.path.join(_tmp, "chroma_db")
+
+
+@pytest.fixture(scope="session")
+def database():
+    """Create the tables once per run"""
+    from app.models import book, chapter, source, agent_log, chapter_memory  # noqa: F401
+    from app.core.database import init_db
+    init_db()
+
+
+@pytest.fixture
+def run():
+    """Run a coroutine on a fresh event loop, closing the async engine's connections with it"""
+    from app.core.database import async_engine
+    
+    def run(coro):
+        async def main():
+            try:
+                return await coro
+            finally:
+                await async_engine.dispose()
+        return asyncio.run(main())
+    return run
+
+
+@pytest.fixture
+def make_book(database):
+    """Seed a book with completed chapters and return its id"""
+    from app.core.database import SessionLocal
+    from app.models.book import Book
+    from app.models.chapter import Chapter
+    from app.services.markdown_renderer import content_hash
+    
+    def make_book(book_idea: str = "Test book", chapters=(), words_per_chapter: int = 1000) -> int:
+        db = SessionLocal()
+        try:
+            book = Book(book_idea=book_idea, genre="technical", chapters_count=len(chapters),
+                        words_per_chapter=words_per_chapter, tone="professional")
+            db.add(book)
+            db.flush()
+            db.add_all([
+                Chapter(book_id=book.id, chapter_number=number, title=f"Chapter {number}",
+                        content_markdown=content, content_hash=content_hash(content), status="complete")
+                for number, content in enumerate(chapters, start=1)
+            ])
+            db.commit()
+            return book.id
+        finally:
+            db.close()
+    return make_book
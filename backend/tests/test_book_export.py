@@ -0,0 +1,107 @@
+"""
+Exports are rendered from exactly the chapters their version was computed from
+"""
+import pytest
+from app.core.database import AsyncSessionLocal, SessionLocal
+from app.models.book import Book
+from app.models.chapter import Chapter
+from app.services.artifact_store import artifact_store
+from app.services.book_export import (
+    ExportChangedError, build_export, export_version, load_export_chapters, render_html, render_markdown
+)
+from app.services.markdown_renderer import content_hash, html_cache
+
+
+async def _load(book_id: int):
+    async with AsyncSessionLocal() as db:
+        return await db.get(Book, book_id), await load_export_chapters(db, book_id)
+
+
+async def _collect(chunks) -> str:
+    return "".join([chunk async for chunk in chunks])
+
+
+def _edit_chapter(book_id: int, chapter_number: int, content: str):
+    db = SessionLocal()
+    chapter = db.query(Chapter).filter_by(book_id=book_id, chapter_number=chapter_number).one()
+    chapter.content_markdown = content
+    chapter.content_hash = content_hash(content)
+    db.commit()
+    db.close()
+
+
+def _delete_chapter(book_id: int, chapter_number: int):
+    db = SessionLocal()
+    db.query(Chapter).filter_by(book_id=book_id, chapter_number=chapter_number).delete()
+    db.commit()
+    db.close()
+
+
+def test_markdown_export_uses_the_versioned_chapters(make_book, run):
+    book_id = make_book("Export book", ["First body.", "Second body."])
+    
+    async def scenario():
+        book, chapters = await _load(book_id)
+        return await _collect(render_markdown(book, chapters[1:]))
+    
+    markdown = run(scenario())
+    assert "## Chapter 2\n\nSecond body." in markdown
+    assert "First body." not in markdown
+
+
+@pytest.mark.parametrize("fmt", ["markdown", "html"])
+def test_edit_between_reads_is_not_stored_under_the_old_version(make_book, run, fmt):
+    book_id = make_book("Edited book", ["Old first.", "Old second."])
+    
+    async def scenario():
+        book, chapters = await _load(book_id)
+        _edit_chapter(book_id, 2, "New second.")
+        with pytest.raises(ExportChangedError):
+            await build_export(book, chapters, fmt)
+        return artifact_store.get(book_id, "md" if fmt == "markdown" else "html", export_version(book, chapters, fmt))
+    
+    assert run(scenario()) is None
+
+
+@pytest.mark.parametrize("render", [render_markdown, render_html])
+def test_deleted_chapter_is_detected(make_book, run, render):
+    book_id = make_book("Deleted chapter book", ["One.", "Two.", "Three."])
+    
+    async def scenario():
+        book, chapters = await _load(book_id)
+        _delete_chapter(book_id, 2)
+        await _collect(render(book, chapters))
+    
+    with pytest.raises(ExportChangedError):
+        run(scenario())
+
+
+def test_cached_fragments_are_paired_with_their_chapters(make_book, run):
+    book_id = make_book("Cached book", ["*One*", "*Two*", "*Three*"])
+    
+    async def scenario():
+        book, chapters = await _load(book_id)
+        html_cache.render(chapters[0].id, "*One*", chapters[0].content_hash)
+        return await _collect(render_html(book, chapters))
+    
+    html = run(scenario())
+    assert html.index("<em>One</em>") < html.index("<em>Two</em>") < html.index("<em>Three</em>")
+
+
+def test_fragments_are_cached_under_the_hash_of_the_rendered_text(make_book, run):
+    book_id = make_book("Hash book", ["*Body*"])
+    db = SessionLocal()
+    chapter = db.query(Chapter).filter_by(book_id=book_id).one()
+    chapter_id = chapter.id
+    # Hash column out of step with the body (e.g. written by an older version)
+    chapter.content_hash = "0" * 64
+    db.commit()
+    db.close()
+    
+    async def scenario():
+        book, chapters = await _load(book_id)
+        return await _collect(render_html(book, chapters))
+    
+    run(scenario())
+    assert html_cache.get(chapter_id, "0" * 64) is None
+    assert html_cache.get(chapter_id, content_hash("*Body*")) == "<p><em>Body</em></p>"
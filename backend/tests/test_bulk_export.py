@@ -0,0 +1,29 @@
+"""
+Bulk export archive entry names
+"""
+import io
+import zipfile
+from app.services.book_export import safe_filename
+from app.services.bulk_export import BulkExport
+
+
+def test_safe_filename_keeps_a_plain_basename():
+    assert safe_filename("My Book") == "My_Book"
+    assert safe_filename("../../etc/passwd") == "etc_passwd"
+    assert safe_filename("a/b\\c") == "a_b_c"
+    assert safe_filename("Part 1... the end?") == "Part_1._the_end"
+    assert safe_filename("..") == "book"
+    assert safe_filename("") == "book"
+
+
+def test_titles_cannot_escape_the_book_folder(make_book, run):
+    book_id = make_book("../../evil/..\\name", ["# One\n\nText."])
+    export = BulkExport([book_id], ["markdown", "html"])
+    
+    async def collect():
+        return b"".join([chunk async for chunk in export.stream()])
+    
+    archive = zipfile.ZipFile(io.BytesIO(run(collect())))
+    names = [name for name in archive.namelist() if name != "manifest.json"]
+    assert names == [f"book-{book_id}/evil_._name.md", f"book-{book_id}/evil_._name.html"]
+    assert export.status == "complete"
@@ -0,0 +1,53 @@
+"""
+Chapter edits keep the book memory up to date
+
+Storing the memory is secondary to saving the chapter: an edit is stored
+and reported as done even when its memory cannot be updated.
+"""
+import pytest
+from sqlalchemy import select
+
+chapters = pytest.importorskip("app.api.routes.chapters")
+
+from app.core.database import AsyncSessionLocal  # noqa: E402
+from app.models.chapter import Chapter  # noqa: E402
+from app.models.chapter_memory import ChapterMemory  # noqa: E402
+from app.schemas.chapter_schema import ChapterUpdate  # noqa: E402
+
+EDITED = "# Chapter 1\n\nThe Lighthouse Keeper lit the lamp at dusk."
+
+
+async def _edit_first_chapter(book_id: int):
+    """Edit chapter 1 through the route; returns (response, stored content, memories)"""
+    async with AsyncSessionLocal() as db:
+        chapter_id = (await db.execute(
+            select(Chapter.id).where(Chapter.book_id == book_id, Chapter.chapter_number == 1)
+        )).scalar_one()
+        response = await chapters.update_chapter(book_id, chapter_id, ChapterUpdate(content_markdown=EDITED), db)
+    
+    async with AsyncSessionLocal() as db:
+        content = (await db.execute(select(Chapter.content_markdown).where(Chapter.id == chapter_id))).scalar_one()
+        memories = (await db.execute(
+            select(ChapterMemory).where(ChapterMemory.chapter_id == chapter_id)
+        )).scalars().all()
+    return response, content, memories
+
+
+def test_edit_updates_chapter_memory(make_book, run):
+    book_id = make_book("Memory book", ["# Chapter 1\n\nDraft."])
+    response, content, memories = run(_edit_first_chapter(book_id))
+    assert response == {"message": "Chapter updated"}
+    assert content == EDITED
+    assert [memory.chapter_number for memory in memories] == [1]
+
+
+def test_edit_is_saved_when_memory_update_fails(make_book, run, monkeypatch):
+    async def fail(*args, **kwargs):
+        raise RuntimeError("memory store unavailable")
+    
+    monkeypatch.setattr(chapters.book_memory, "update", fail)
+    book_id = make_book("Memory failure book", ["# Chapter 1\n\nDraft."])
+    response, content, memories = run(_edit_first_chapter(book_id))
+    assert response == {"message": "Chapter updated"}
+    assert content == EDITED
+    assert memories == []
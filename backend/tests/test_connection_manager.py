@@ -0,0 +1,111 @@
+"""
+WebSocket fan-out with slow clients
+
+Fast clients must receive every message, a client that stops reading is
+evicted (once), and broadcasting never waits for any socket.
+"""
+import asyncio
+import json
+from app.services.connection_manager import SLOW_CONSUMER_CLOSE_CODE, ConnectionManager
+
+BOOK_ID = 1
+STATUS_UPDATES = 200
+CHAPTER_UPDATES = 20
+
+
+class FakeWebSocket:
+    """Records messages, sleeping `delay` seconds per send (None = never returns)"""
+    
+    def __init__(self, delay):
+        self.delay = delay
+        self.received = []
+        self.close_codes = []
+    
+    async def send_text(self, payload: str):
+        if self.delay is None:
+            await asyncio.Event().wait()
+        await asyncio.sleep(self.delay)
+        self.received.append(json.loads(payload))
+    
+    async def close(self, code: int = 1000):
+        self.close_codes.append(code)
+
+
+async def _fan_out(manager: ConnectionManager, sockets: list) -> list:
+    """Broadcast status and chapter updates; returns every message sent, in order"""
+    for websocket in sockets:
+        manager.connect(websocket, BOOK_ID)
+    
+    sent = []
+    per_chapter = STATUS_UPDATES // CHAPTER_UPDATES
+    for i in range(STATUS_UPDATES):
+        messages = [("agent_status", {"agent_name": "writing_agent", "current_task": str(i)})]
+        if i % per_chapter == per_chapter - 1:
+            messages.append(("chapter_update", {"chapter_number": i // per_chapter + 1}))
+        for message_type, data in messages:
+            message = {"type": message_type, "data": data}
+            assert manager.broadcast(BOOK_ID, message_type, message) is None
+            sent.append(message)
+        # Let writers run, like a generator awaiting LLM calls
+        await asyncio.sleep(0.001)
+    
+    await asyncio.sleep(0.2)
+    return sent
+
+
+async def _close_all(manager: ConnectionManager):
+    for connections in list(manager.connections.values()):
+        for connection in list(connections):
+            await manager.disconnect(connection)
+
+
+def test_fast_clients_get_everything_and_stalled_client_is_evicted():
+    async def scenario():
+        manager = ConnectionManager(max_queue_size=10, send_timeout=10.0)
+        fast = [FakeWebSocket(0), FakeWebSocket(0)]
+        stalled = FakeWebSocket(None)
+        sent = await _fan_out(manager, fast + [stalled])
+        connected = len(manager.connections.get(BOOK_ID, ()))
+        await _close_all(manager)
+        return sent, fast, stalled, connected
+    
+    sent, fast, stalled, connected = asyncio.run(scenario())
+    for websocket in fast:
+        assert websocket.received == sent
+        assert websocket.close_codes == []
+    assert stalled.received == []
+    assert stalled.close_codes == [SLOW_CONSUMER_CLOSE_CODE]
+    assert connected == len(fast)
+
+
+def test_broadcast_does_not_wait_for_sockets():
+    async def scenario():
+        manager = ConnectionManager(max_queue_size=1000, send_timeout=10.0)
+        stalled = [FakeWebSocket(None) for _ in range(3)]
+        for websocket in stalled:
+            manager.connect(websocket, BOOK_ID)
+        # No await between broadcasts: they must all return without the
+        # event loop running a single send
+        for i in range(200):
+            manager.broadcast(BOOK_ID, "chapter_update", {"type": "chapter_update", "data": {"n": i}})
+        queued = [len(connection._pending) for connection in manager.connections[BOOK_ID]]
+        await _close_all(manager)
+        return queued
+    
+    assert asyncio.run(scenario()) == [200, 200, 200]
+
+
+def test_overflowing_client_is_evicted_once():
+    async def scenario():
+        manager = ConnectionManager(max_queue_size=5, send_timeout=10.0)
+        stalled = FakeWebSocket(None)
+        manager.connect(stalled, BOOK_ID)
+        # Every broadcast after the queue fills would have scheduled another eviction
+        for i in range(50):
+            manager.broadcast(BOOK_ID, "chapter_update", {"type": "chapter_update", "data": {"n": i}})
+        await asyncio.sleep(0.05)
+        await _close_all(manager)
+        return stalled
+    
+    stalled = asyncio.run(scenario())
+    assert stalled.close_codes == [SLOW_CONSUMER_CLOSE_CODE]
@@ -0,0 +1,38 @@
+"""
+Engine construction for the configured database URL
+"""
+import asyncio
+import pytest
+from app.core.database import create_async_db_engine, create_db_engine
+
+MEMORY_URLS = ["sqlite://", "sqlite:///:memory:", "sqlite:///file:books?mode=memory&cache=shared&uri=true"]
+
+
+@pytest.mark.parametrize("database_url", MEMORY_URLS)
+def test_in_memory_sqlite_is_rejected(database_url):
+    # The writer thread and the async engine would each get their own empty database
+    with pytest.raises(ValueError, match="In-memory"):
+        create_db_engine(database_url)
+    with pytest.raises(ValueError, match="In-memory"):
+        create_async_db_engine(database_url)
+
+
+def test_file_sqlite_is_shared_between_engines(tmp_path):
+    database_url = f"sqlite:///{tmp_path / 'shared.db'}"
+    engine = create_db_engine(database_url)
+    try:
+        with engine.begin() as connection:
+            connection.exec_driver_sql("CREATE TABLE notes (body TEXT)")
+            connection.exec_driver_sql("INSERT INTO notes VALUES ('written by the sync engine')")
+    finally:
+        engine.dispose()
+    
+    async def read():
+        async_engine = create_async_db_engine(database_url)
+        try:
+            async with async_engine.connect() as connection:
+                return (await connection.exec_driver_sql("SELECT body FROM notes")).scalar_one()
+        finally:
+            await async_engine.dispose()
+    
+    assert asyncio.run(read()) == "written by the sync engine"
@@ -0,0 +1,58 @@
+"""
+SQLite event bus replay for reconnecting clients
+"""
+import asyncio
+import pytest
+from app.services.event_bus import BookEventBus, InProcessEventBus, SQLiteEventBus
+
+
+def _with_bus(path, scenario):
+    async def run():
+        bus = SQLiteEventBus(str(path), poll_interval=0.01)
+        await bus.start()
+        try:
+            return await scenario(bus)
+        finally:
+            await bus.stop()
+    return asyncio.run(run())
+
+
+def test_replay_returns_events_after_cursor(tmp_path):
+    async def scenario(bus):
+        first = await bus.publish(1, 'book_status', {'status': 'generating'})
+        await bus.publish(2, 'book_status', {'status': 'generating'})
+        second = await bus.publish(1, 'chapter_status', {'chapter_number': 1})
+        return first, second, await bus.replay(1, first.seq), await bus.replay(1, second.seq)
+    
+    first, second, after_first, after_last = _with_bus(tmp_path / "events.db", scenario)
+    assert [event.seq for event in after_first] == [second.seq]
+    assert after_last == []
+
+
+def test_replay_of_stale_cursor_needs_snapshot(tmp_path):
+    async def scenario(bus):
+        event = await bus.publish(1, 'book_status', {'status': 'generating'})
+        # A cursor from before the events file was reset is ahead of every stored id
+        return await bus.replay(1, event.seq + 500)
+    
+    assert _with_bus(tmp_path / "events.db", scenario) is None
+
+
+def test_replay_of_pruned_events_needs_snapshot(tmp_path):
+    async def scenario(bus):
+        for _ in range(3):
+            await bus.publish(1, 'book_status', {'status': 'generating'})
+        bus.retention = -1
+        await bus._run(bus._prune)
+        return await bus.replay(1, 1)
+    
+    assert _with_bus(tmp_path / "events.db", scenario) is None
+
+
+def test_backend_without_publish_cannot_be_created():
+    class SilentEventBus(BookEventBus):
+        pass
+    
+    with pytest.raises(TypeError, match="publish"):
+        SilentEventBus()
+    assert isinstance(InProcessEventBus(), BookEventBus)
@@ -0,0 +1,64 @@
+"""
+FormatAgent output against the golden corpus
+
+Every format_corpus/<name>.md must format to <name>.expected.md, both in
+one call and when fed in random chunks as a stream would deliver it.
+"""
+import glob
+import os
+import random
+import pytest
+from app.agents.format_agent import FormatAgent
+
+CORPUS = os.path.join(os.path.dirname(__file__), "format_corpus")
+CASES = sorted(
+    os.path.basename(path)[:-3]
+    for path in glob.glob(os.path.join(CORPUS, "*.md"))
+    if not path.endswith(".expected.md")
+)
+
+
+def _read_case(name: str):
+    with open(os.path.join(CORPUS, f"{name}.md")) as file:
+        source = file.read()
+    with open(os.path.join(CORPUS, f"{name}.expected.md")) as file:
+        expected = file.read().removesuffix("\n")
+    return source, expected
+
+
+def _feed_in_chunks(formatter: FormatAgent, text: str, rng: random.Random) -> str:
+    """Format text delivered in random pieces of 1-64 characters"""
+    out = []
+    position = 0
+    while position < len(text):
+        size = rng.randint(1, 64)
+        out.append(formatter.feed(text[position:position + size]))
+        position += size
+    out.append(formatter.finish())
+    return "".join(out)
+
+
+def test_corpus_is_not_empty():
+    assert CASES
+
+
+@pytest.mark.parametrize("name", CASES)
+def test_format_chapter_matches_golden_file(name):
+    source, expected = _read_case(name)
+    assert FormatAgent.format_chapter(source) == expected
+
+
+@pytest.mark.parametrize("name", CASES)
+def test_streamed_output_matches_golden_file(name):
+    source, expected = _read_case(name)
+    rng = random.Random(name)
+    for _ in range(20):
+        assert _feed_in_chunks(FormatAgent(), source, rng) == expected
+
+
+def test_formatter_is_reusable_after_finish():
+    formatter = FormatAgent()
+    rng = random.Random(3)
+    cases = [_read_case(name) for name in CASES]
+    for source, expected in cases + cases:
+        assert _feed_in_chunks(formatter, source, rng) == expected
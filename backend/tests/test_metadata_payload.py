@@ -0,0 +1,61 @@
+"""
+Query count and payload size of the metadata endpoints
+
+The book, status and table-of-contents endpoints must not read chapter
+bodies, and their query count must not grow with the number of chapters.
+"""
+import json
+import pytest
+from sqlalchemy import event
+
+books = pytest.importorskip("app.api.routes.books")
+chapters = pytest.importorskip("app.api.routes.chapters")
+
+from app.core.database import AsyncSessionLocal, async_engine  # noqa: E402
+
+CHAPTERS = 30
+WORDS = 10000
+
+# endpoint -> (max queries, max response bytes)
+BUDGETS = {
+    "get_book": (2, 16 * 1024),
+    "get_book_status": (2, 4 * 1024),
+    "get_chapters": (1, 64 * 1024),
+}
+
+
+@pytest.fixture
+def book_id(make_book):
+    return make_book("Payload book", [" ".join(["word"] * WORDS)] * CHAPTERS, words_per_chapter=WORDS)
+
+
+async def _call(handler, book_id: int):
+    """Call a route handler; returns (SQL statements issued, JSON payload)"""
+    statements = []
+    
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        async with AsyncSessionLocal() as db:
+            response = await handler(book_id, db)
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+    
+    if isinstance(response, list):
+        return statements, json.dumps([item.model_dump(mode="json") for item in response])
+    return statements, response.model_dump_json()
+
+
+@pytest.mark.parametrize("name, handler", [
+    ("get_book", books.get_book),
+    ("get_book_status", books.get_book_status),
+    ("get_chapters", chapters.get_chapters),
+])
+def test_metadata_endpoint_stays_within_budget(book_id, run, name, handler):
+    statements, payload = run(_call(handler, book_id))
+    max_queries, max_bytes = BUDGETS[name]
+    assert len(statements) <= max_queries, statements
+    assert len(payload) <= max_bytes
+    assert not any("content_markdown" in statement for statement in statements), "chapter bodies were read"
@@ -0,0 +1,89 @@
+"""
+Alembic revisions against databases created before them
+
+Revisions run on a throwaway SQLite database holding a chapters table in
+its pre-revision shape.
+"""
+import importlib.util
+import os
+import pytest
+import sqlalchemy as sa
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from app.core.types import CODEC_RAW, CODEC_ZLIB, CODEC_ZSTD, decompress_text
+
+VERSIONS = os.path.join(os.path.dirname(__file__), "..", "alembic", "versions")
+
+# First letters that are also codec tags, short (stored raw) and long (compressed)
+CONTENTS = [
+    "research shows the tide turns twice a day.",
+    "sea levels rose.",
+    "zinc is a metal.",
+    "research shows " + "the tide turns twice a day. " * 40,
+    "sea levels rose " + "again and again. " * 40,
+    "zebras " + "run across the plain. " * 40,
+    "Plain text ünïcode.",
+]
+
+
+def _load(name: str):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(VERSIONS, f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _run(engine, operation):
+    with engine.begin() as connection:
+        with Operations.context(MigrationContext.configure(connection)):
+            operation()
+
+
+def _stored(engine) -> list:
+    with engine.connect() as connection:
+        return [row[0] for row in connection.execute(sa.text("SELECT content_markdown FROM chapters ORDER BY id"))]
+
+
+@pytest.fixture
+def legacy_engine(tmp_path):
+    """Database whose chapters were written as plain text"""
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as connection:
+        connection.execute(sa.text("CREATE TABLE chapters (id INTEGER PRIMARY KEY, content_markdown TEXT)"))
+        connection.execute(
+            sa.text("INSERT INTO chapters (content_markdown) VALUES (:content)"),
+            [{"content": content} for content in CONTENTS] + [{"content": None}],
+        )
+    yield engine
+    engine.dispose()
+
+
+def test_compress_migration_round_trips_text(legacy_engine):
+    migration = _load("0002_compress_chapter_content")
+    
+    _run(legacy_engine, migration.upgrade)
+    stored = _stored(legacy_engine)
+    assert all(isinstance(value, bytes) for value in stored[:-1])
+    assert stored[0][:1] == CODEC_RAW and stored[3][:1] in (CODEC_ZLIB, CODEC_ZSTD)
+    assert [decompress_text(value) for value in stored[:-1]] == CONTENTS
+    assert stored[-1] is None
+    
+    # Running it again leaves compressed rows alone
+    _run(legacy_engine, migration.upgrade)
+    assert _stored(legacy_engine) == stored
+    
+    _run(legacy_engine, migration.downgrade)
+    assert _stored(legacy_engine) == CONTENTS + [None]
+
+
+def test_column_swap_compresses_every_text_row(legacy_engine):
+    """The path taken on databases that need a binary column"""
+    migration = _load("0002_compress_chapter_content")
+    
+    _run(legacy_engine, lambda: migration._swap(migration.compress_text, sa.LargeBinary))
+    stored = _stored(legacy_engine)
+    assert [decompress_text(value) for value in stored[:-1]] == CONTENTS
+    assert stored[-1] is None
+    
+    _run(legacy_engine, lambda: migration._swap(migration.decompress_text, sa.Text))
+    assert _stored(legacy_engine) == CONTENTS + [None]
@@ -0,0 +1,203 @@
+"""
+Book preambles are cached once per book and billed as cached tokens
+
+Runs against a local fake of the Gemini API that implements system
+instructions and context caching and reports usage the way the API does.
+"""
+import asyncio
+import threading
+import pytest
+
+pytest.importorskip("google.generativeai")
+
+from app.core.config import settings  # noqa: E402
+from app.services import prompt_cache as prompt_cache_module  # noqa: E402
+from app.services.context_packer import count_tokens  # noqa: E402
+from app.services.prompt_cache import PromptCache, book_preamble  # noqa: E402
+
+CHAPTERS = 10
+AGENTS = ("You are a writer.", "You are an editor.")
+# Cached input tokens are billed at this share of the normal price
+CACHED_TOKEN_RATE = 0.25
+
+
+class FakeUsage:
+    def __init__(self, prompt_tokens: int, cached_tokens: int, output_tokens: int):
+        self.prompt_token_count = prompt_tokens
+        self.cached_content_token_count = cached_tokens
+        self.candidates_token_count = output_tokens
+
+
+class FakeResponse:
+    def __init__(self, text: str, usage: FakeUsage):
+        self.text = text
+        self.usage_metadata = usage
+
+
+class FakeCachedContent:
+    """Provider-side cache: holds a system instruction until deleted"""
+    live = {}
+    created = 0
+    
+    def __init__(self, name: str, system_instruction: str):
+        self.name = name
+        self.system_instruction = system_instruction
+    
+    @classmethod
+    def create(cls, model: str, display_name: str, system_instruction: str, ttl):
+        cls.created += 1
+        cache = cls(f"cachedContents/{cls.created}", system_instruction)
+        cls.live[cache.name] = cache
+        return cache
+    
+    def delete(self):
+        FakeCachedContent.live.pop(self.name, None)
+
+
+class FakeModel:
+    """Bills the system instruction as prompt tokens, cached if it came from a cache"""
+    
+    def __init__(self, model_name: str = "", system_instruction: str = None, cached_content=None):
+        self.system_instruction = system_instruction
+        self.cached_content = cached_content
+    
+    @classmethod
+    def from_cached_content(cls, cached_content):
+        assert cached_content.name in FakeCachedContent.live, "cache used after delete"
+        return cls(cached_content=cached_content)
+    
+    def generate_content(self, prompt: str) -> FakeResponse:
+        instruction = self.cached_content.system_instruction if self.cached_content else self.system_instruction
+        instruction_tokens = count_tokens(instruction or "")
+        return FakeResponse("Text.", FakeUsage(
+            instruction_tokens + count_tokens(prompt),
+            instruction_tokens if self.cached_content else 0,
+            2,
+        ))
+
+
+@pytest.fixture(autouse=True)
+def fake_gemini(monkeypatch):
+    monkeypatch.setattr(prompt_cache_module.genai, "GenerativeModel", FakeModel)
+    monkeypatch.setattr(prompt_cache_module.caching, "CachedContent", FakeCachedContent)
+    FakeCachedContent.live = {}
+    FakeCachedContent.created = 0
+
+
+def _text(words: int, seed: int) -> str:
+    sentence = " ".join(f"term{seed}x{n}" for n in range(12)).capitalize() + "."
+    return " ".join(sentence.replace("x", f"x{i}y") for i in range(words // 12))
+
+
+def _book_config() -> dict:
+    return {
+        'book_idea': 'A field guide', 'description': _text(600, 0),
+        'genre': 'technical', 'tone': 'professional', 'target_audience': 'engineers',
+    }
+
+
+def _research(documents: int) -> list:
+    return [
+        {'text': _text(80, n + 1), 'metadata': {'title': f'Source {n}', 'chapter_id': n % CHAPTERS}}
+        for n in range(documents)
+    ]
+
+
+async def _generate_book(cache: PromptCache, preamble: str) -> dict:
+    """One call per agent per chapter; returns summed usage"""
+    totals = {'prompt_tokens': 0, 'cached_tokens': 0}
+    for number in range(1, CHAPTERS + 1):
+        for system_message in AGENTS:
+            model = await cache.model_for(1, f"{system_message}\n\n{preamble}")
+            usage = model.generate_content(f"Write chapter {number}.").usage_metadata
+            totals['prompt_tokens'] += usage.prompt_token_count
+            totals['cached_tokens'] += usage.cached_content_token_count
+    return totals
+
+
+def _billed(totals: dict) -> float:
+    return totals['prompt_tokens'] - totals['cached_tokens'] * (1 - CACHED_TOKEN_RATE)
+
+
+def test_research_heavy_preamble_is_cached_and_reused():
+    preamble = book_preamble(_book_config(), _research(60))
+    assert "Research digest:" in preamble
+    assert count_tokens(preamble) >= settings.prompt_cache_min_tokens
+    
+    async def scenario():
+        inline = await _generate_book(PromptCache(enabled=False), preamble)
+        cache = PromptCache(ttl=600, min_tokens=settings.prompt_cache_min_tokens)
+        cached = await _generate_book(cache, preamble)
+        stats = cache.snapshot()
+        await cache.release(1)
+        return inline, cached, stats
+    
+    inline, cached, stats = asyncio.run(scenario())
+    calls = CHAPTERS * len(AGENTS)
+    assert stats['created'] == len(AGENTS)
+    assert stats['reused'] == calls - len(AGENTS)
+    assert not FakeCachedContent.live, "caches should be deleted on release"
+    assert inline['cached_tokens'] == 0
+    assert cached['prompt_tokens'] == inline['prompt_tokens']
+    assert cached['cached_tokens'] > 0.9 * cached['prompt_tokens']
+    assert _billed(cached) < 0.35 * _billed(inline)
+
+
+def test_short_preamble_is_sent_inline_without_research():
+    preamble = book_preamble(_book_config(), _research(3))
+    assert "Research digest:" not in preamble
+    
+    async def scenario():
+        cache = PromptCache(ttl=600, min_tokens=settings.prompt_cache_min_tokens)
+        totals = await _generate_book(cache, preamble)
+        return totals, cache.snapshot()
+    
+    totals, stats = asyncio.run(scenario())
+    assert stats['created'] == 0 and stats['uncached'] == CHAPTERS * len(AGENTS)
+    assert totals['cached_tokens'] == 0
+
+
+def test_creating_a_cache_does_not_block_other_books():
+    first_book_creating = threading.Event()
+    release_first_book = threading.Event()
+    create = FakeCachedContent.create.__func__
+    
+    def slow_for_book_one(cls, model, display_name, system_instruction, ttl):
+        if display_name.startswith("book-1-"):
+            first_book_creating.set()
+            release_first_book.wait(5)
+        return create(cls, model, display_name, system_instruction, ttl)
+    
+    async def scenario():
+        cache = PromptCache(ttl=600, min_tokens=10)
+        FakeCachedContent.create = classmethod(slow_for_book_one)
+        try:
+            first = asyncio.create_task(cache.model_for(1, _text(120, 1)))
+            await asyncio.to_thread(first_book_creating.wait, 5)
+            # Book 2 gets its cache while book 1's creation is still in flight
+            await asyncio.wait_for(cache.model_for(2, _text(120, 2)), timeout=2)
+            assert not first.done()
+            release_first_book.set()
+            await first
+        finally:
+            FakeCachedContent.create = classmethod(create)
+        return cache.snapshot()
+    
+    assert asyncio.run(scenario())['created'] == 2
+
+
+def test_preamble_research_is_read_off_the_event_loop(monkeypatch):
+    chapters = pytest.importorskip("app.api.routes.chapters")
+    from app.models.book import Book
+    
+    readers = []
+    
+    def book_documents(book_id):
+        readers.append(threading.current_thread())
+        return _research(60)
+    
+    monkeypatch.setattr(chapters.rag_service, "book_documents", book_documents)
+    book = Book(id=1, **_book_config())
+    preamble = asyncio.run(chapters._book_preamble(book))
+    assert preamble == book_preamble(_book_config(), _research(60))
+    assert readers and threading.main_thread() not in readers
@@ -0,0 +1,100 @@
+"""
+Re-running research replaces a chapter's documents
+
+Runs against an in-memory stand-in for a Chroma collection that, like
+Chroma, rejects IDs that are already stored.
+"""
+import asyncio
+import threading
+import pytest
+
+rag_module = pytest.importorskip("app.services.rag_service")
+
+BOOK_ID = 1
+
+
+class FakeEncoder:
+    def encode(self, documents):
+        return FakeEmbeddings([[float(len(doc))] for doc in documents])
+
+
+class FakeEmbeddings(list):
+    def tolist(self):
+        return list(self)
+
+
+class FakeCollection:
+    def __init__(self):
+        self.rows = {}
+    
+    def add(self, documents, embeddings, metadatas, ids):
+        duplicates = [doc_id for doc_id in ids if doc_id in self.rows]
+        if duplicates:
+            raise ValueError(f"IDs already exist: {duplicates}")
+        for doc_id, doc, meta in zip(ids, documents, metadatas):
+            self.rows[doc_id] = (doc, meta)
+    
+    def delete(self, where):
+        (key, value), = where.items()
+        for doc_id in [doc_id for doc_id, (_, meta) in self.rows.items() if meta.get(key) == value]:
+            del self.rows[doc_id]
+    
+    def get(self, include):
+        return {
+            'ids': list(self.rows),
+            'documents': [doc for doc, _ in self.rows.values()],
+            'metadatas': [meta for _, meta in self.rows.values()],
+        }
+
+
+@pytest.fixture
+def rag(monkeypatch):
+    service = rag_module.rag_service
+    collection = FakeCollection()
+    monkeypatch.setattr(service, "embedding_model", FakeEncoder())
+    monkeypatch.setattr(service, "get_or_create_collection", lambda book_id: collection)
+    return service
+
+
+def _store(rag, chapter_id: int, texts: list):
+    rag.replace_chapter_documents(
+        BOOK_ID, chapter_id, texts,
+        [{'title': text, 'chapter_id': chapter_id} for text in texts]
+    )
+
+
+def _texts(rag) -> list:
+    return [(doc['metadata']['chapter_id'], doc['text']) for doc in rag.book_documents(BOOK_ID)]
+
+
+def test_rerunning_chapter_research_replaces_its_documents(rag):
+    _store(rag, 0, ["book a", "book b"])
+    _store(rag, 3, ["old a", "old b", "old c"])
+    _store(rag, 4, ["other a"])
+    
+    _store(rag, 3, ["new a", "new b"])
+    _store(rag, 0, ["book c"])
+    
+    assert _texts(rag) == [(0, "book c"), (3, "new a"), (3, "new b"), (4, "other a")]
+
+
+def test_chapter_research_is_stored_off_the_event_loop(monkeypatch):
+    research_agent = pytest.importorskip("app.agents.research_agent")
+    writers = []
+    
+    async def research_chapters(topic, chapters, max_results):
+        return {chapter['id']: [{'title': 'Source', 'snippet': f"About {chapter['title']}"}] for chapter in chapters}
+    
+    def replace_chapter_documents(book_id, chapter_id, documents, metadata):
+        writers.append((threading.current_thread(), chapter_id, documents))
+    
+    monkeypatch.setattr(research_agent.research_service, "research_chapters", research_chapters)
+    monkeypatch.setattr(research_agent.rag_service, "replace_chapter_documents", replace_chapter_documents)
+    chapters = [{'id': 3, 'title': 'Tides', 'outline': ''}, {'id': 4, 'title': 'Winds', 'outline': ''}]
+    summary = asyncio.run(research_agent.perform_chapter_research(BOOK_ID, "Weather", chapters))
+    
+    assert summary == {'chapters_researched': 2, 'sources_found': 2}
+    assert [(chapter_id, documents) for _, chapter_id, documents in writers] == [
+        (3, ["About Tides"]), (4, ["About Winds"])
+    ]
+    assert threading.main_thread() not in {thread for thread, _, _ in writers}
@@ -0,0 +1,61 @@
+"""
+Terminology pass over separately edited chapter parts
+"""
+from app.agents.terminology import unify_terminology
+
+
+def test_case_variants_across_parts_are_unified():
+    parts = [
+        "JavaScript runs in the browser. JavaScript is everywhere.",
+        "Most Javascript code is bundled.",
+    ]
+    unified, replacements, flagged = unify_terminology(parts)
+    assert unified[1] == "Most JavaScript code is bundled."
+    assert replacements == {"javascript": "JavaScript"}
+    assert flagged == []
+
+
+def test_variants_within_one_part_are_left_alone():
+    parts = ["Javascript or JavaScript, JavaScript.", "JavaScript again."]
+    unified, replacements, _ = unify_terminology(parts)
+    assert unified == parts
+    assert replacements == {}
+
+
+def test_hyphenated_and_closed_forms_are_reported_not_merged():
+    parts = ["She will re-sign the contract.", "He may resign from the board."]
+    unified, replacements, flagged = unify_terminology(parts)
+    assert unified == parts
+    assert replacements == {}
+    assert flagged == ["re-sign / resign"]
+
+
+def test_allowlisted_compounds_are_merged():
+    parts = ["Send an email. Check your email.", "Reply by e-mail."]
+    unified, replacements, _ = unify_terminology(parts)
+    assert unified[1] == "Reply by email."
+    assert replacements == {"e-mail": "email"}
+
+
+def test_code_links_and_urls_are_not_rewritten():
+    parts = [
+        "Use email for support. Every email is read.",
+        "Write `e-mail` in code, see [the e-mail guide](https://ex.com/e-mail), "
+        "<https://ex.com/e-mail> or https://ex.com/e-mail/faq.\n\n"
+        "```\nsend_e-mail()\n```\n"
+        "[ref]: https://ex.com/e-mail\n",
+    ]
+    unified, replacements, _ = unify_terminology(parts)
+    assert "[the email guide](https://ex.com/e-mail)" in unified[1]
+    assert "`e-mail`" in unified[1]
+    assert "<https://ex.com/e-mail>" in unified[1]
+    assert "https://ex.com/e-mail/faq" in unified[1]
+    assert "send_e-mail()" in unified[1]
+    assert "[ref]: https://ex.com/e-mail" in unified[1]
+    assert replacements == {"e-mail": "email"}
+
+
+def test_sentence_capitalization_is_kept():
+    parts = ["Email is fast. Use email.", "E-mail arrives later."]
+    unified, _, _ = unify_terminology(parts)
+    assert unified[1] == "Email arrives later."
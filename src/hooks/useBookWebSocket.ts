@@ -6,6 +6,7 @@ import { useEffect, useState, useCallback, useRef } from 'react';
 export interface WebSocketMessage {
   type: string;
   data: any;
+  seq?: number;
 }
 
 export interface AgentStatus {
@@ -34,12 +35,15 @@ export function useBookWebSocket(bookId: number | null): UseBookWebSocketReturn
   
   const wsRef = useRef<WebSocket | null>(null);
   const reconnectTimeoutRef = useRef<number>();
+  // Last event sequence number seen, so reconnects resume instead of starting over
+  const lastSeqRef = useRef<number | null>(null);
 
   const connect = useCallback(() => {
     if (!bookId) return;
 
     try {
-      const ws = new WebSocket(`ws://localhost:8000/ws/books/${bookId}`);
+      const since = lastSeqRef.current !== null ? `?since=${lastSeqRef.current}` : '';
+      const ws = new WebSocket(`ws://localhost:8000/ws/books/${bookId}${since}`);
       
       ws.onopen = () => {
         setIsConnected(true);
@@ -50,7 +54,21 @@ export function useBookWebSocket(bookId: number | null): UseBookWebSocketReturn
         try {
           const message: WebSocketMessage = JSON.parse(event.data);
           
+          if (typeof message.seq === 'number') {
+            lastSeqRef.current = message.seq;
+          }
+          
           switch (message.type) {
+            case 'snapshot':
+              setAgentStatuses(
+                (message.data.agents || []).map((agent: AgentStatus) => ({
+                  agent_name: agent.agent_name,
+                  status: agent.status,
+                  current_task: agent.current_task,
+                }))
+              );
+              break;
+              
             case 'agent_status':
               setAgentStatuses((prev) => {
                 const updated = [...prev];
@@ -124,6 +142,7 @@ export function useBookWebSocket(bookId: number | null): UseBookWebSocketReturn
   }, [bookId]);
 
   useEffect(() => {
+    lastSeqRef.current = null;
     connect();
     
     return () => {